@@ -1,84 +1,146 @@
-from flask import Blueprint, render_template, jsonify, flash, redirect, url_for, request
-from sqlalchemy import select, func
+from functools import lru_cache
 
-from models import engine, crop_master, district, yielddata
+from flask import Blueprint, render_template, jsonify, flash, redirect, url_for, request, session
+from sqlalchemy import bindparam, select, func
+
+from models import read_engine, crop_master, district, yielddata
 from services.yield_service import (
     get_trend_data,
     get_crop_comparison,
     get_district_analysis,
     get_analysis_summary,
 )
-from services.auth_service import ROLE_ADMIN, ROLE_OFFICER
-from utils.security import login_required, role_required
+from services.query_executor import fetch_all, fetch_first, fetch_scalar, run_queries
+from services.forecast_service import (
+    DEFAULT_CONFIDENCE,
+    DEFAULT_HORIZON,
+    METRICS as FORECAST_METRICS,
+    MODEL_LINEAR,
+    MODELS as FORECAST_MODELS,
+    get_forecasts,
+    refit_forecasts,
+)
+from services.ranking_service import (
+    FILTERS as RANKING_FILTERS,
+    METRICS as RANKING_METRICS,
+    PARTITIONS as RANKING_PARTITIONS,
+    RANK_ENTITIES,
+    TIE_FUNCTIONS,
+    get_rankings,
+)
+from services.pivot_service import FILTERS as PIVOT_FILTERS, get_pivot
+from services.quantile_service import DEFAULT_QUANTILES, GROUP_BY_COLUMNS, get_yield_quantiles
+from services.anomaly_service import DEFAULT_THRESHOLDS, METHOD_ROBUST_Z, find_yield_outliers, rank_outliers
+from services.geography_service import GEOGRAPHY_LEVELS, get_geography_rollup
+from services.auth_service import ROLE_ADMIN, ROLE_FARMER, ROLE_OFFICER
+from utils.db_routing import read_scope
+from utils.json_provider import columnar
+from utils.security import login_required, role_required, get_current_user_id
+from utils.single_flight import single_flight
 
 analysis = Blueprint("analysis", __name__)
 
 
+def _analysis_page_results(crop_id, district_id):
+    statements = _analysis_page_statements(bool(crop_id), bool(district_id))
+    params = {"crop_id": crop_id, "district_id": district_id}
+    return run_queries(
+        read_engine,
+        {
+            "crops": fetch_all(statements["crops"]),
+            "districts": fetch_all(statements["districts"]),
+            "total_production": fetch_scalar(statements["total_production"], params),
+            "total_area": fetch_scalar(statements["total_area"], params),
+            "trend_rows": fetch_all(statements["trend_rows"], params),
+            "comparison_rows": fetch_all(statements["comparison_rows"], params),
+            "top_crop_row": fetch_first(statements["top_crop_row"], params),
+        },
+    )
+
+
+def _shared(function, *args, **kwargs):
+    """Run ``function`` once for identical concurrent requests (see :mod:`utils.single_flight`)."""
+    return single_flight.call(function, *args, scope=read_scope(), **kwargs)
+
+
+def _ranked_outliers(farmer_id, method, threshold):
+    return rank_outliers(find_yield_outliers(farmer_id, method=method, threshold=threshold))
+
+
+def analysis_json(payload):
+    """JSON response; ``?shape=columnar`` sends lists of rows as ``{"columns", "data"}``."""
+    if request.args.get("shape") == "columnar":
+        payload = columnar(payload)
+    return jsonify(payload)
+
+
+@lru_cache(maxsize=None)
+def _analysis_page_statements(by_crop, by_district):
+    """Dashboard statements for one filter shape; values bind as ``crop_id``/``district_id``."""
+    filters = []
+    if by_crop:
+        filters.append(yielddata.c.cropid == bindparam("crop_id"))
+    if by_district:
+        filters.append(yielddata.c.districtid == bindparam("district_id"))
+
+    top_crop_query = (
+        select(
+            crop_master.c.CropName.label("crop_name"),
+            func.sum(yielddata.c.production).label("total_production"),
+        )
+        .join(crop_master, yielddata.c.cropid == crop_master.c.CropId)
+        .group_by(crop_master.c.CropName)
+        .order_by(func.sum(yielddata.c.production).desc())
+        .limit(1)
+    )
+    return {
+        "crops": select(crop_master).order_by(crop_master.c.CropName),
+        "districts": select(district).order_by(district.c.districtname),
+        "total_production": select(func.sum(yielddata.c.production)).where(*filters),
+        "total_area": select(func.sum(yielddata.c.areaharvested)).where(*filters),
+        "trend_rows": (
+            select(
+                yielddata.c.year.label("year"),
+                func.sum(yielddata.c.production).label("total_production"),
+            )
+            .where(*filters)
+            .group_by(yielddata.c.year)
+            .order_by(yielddata.c.year)
+        ),
+        "comparison_rows": (
+            select(
+                crop_master.c.CropName.label("crop_name"),
+                func.sum(yielddata.c.production).label("total_production"),
+            )
+            .join(crop_master, yielddata.c.cropid == crop_master.c.CropId)
+            .where(*filters)
+            .group_by(crop_master.c.CropName)
+            .order_by(crop_master.c.CropName)
+        ),
+        "top_crop_row": top_crop_query.where(*filters),
+    }
+
+
 @analysis.route("/analysis")
 @login_required
 @role_required(ROLE_ADMIN, ROLE_OFFICER)
 def analysis_page():
     try:
-        with engine.connect() as conn:
-            crops = conn.execute(select(crop_master).order_by(crop_master.c.CropName)).mappings().all()
-            districts = conn.execute(select(district).order_by(district.c.districtname)).mappings().all()
-
-            selected_crop_id = request.args.get("crop_id", type=int)
-            selected_district_id = request.args.get("district_id", type=int)
-
-            filters = []
-            if selected_crop_id:
-                filters.append(yielddata.c.cropid == selected_crop_id)
-            if selected_district_id:
-                filters.append(yielddata.c.districtid == selected_district_id)
-
-            total_production_query = select(func.sum(yielddata.c.production))
-            total_area_query = select(func.sum(yielddata.c.areaharvested))
-            trend_query = (
-                select(
-                    yielddata.c.year.label("year"),
-                    func.sum(yielddata.c.production).label("total_production"),
-                )
-                .group_by(yielddata.c.year)
-                .order_by(yielddata.c.year)
-            )
-            comparison_query = (
-                select(
-                    crop_master.c.CropName.label("crop_name"),
-                    func.sum(yielddata.c.production).label("total_production"),
-                )
-                .join(crop_master, yielddata.c.cropid == crop_master.c.CropId)
-                .group_by(crop_master.c.CropName)
-                .order_by(crop_master.c.CropName)
-            )
-            top_crop_query = (
-                select(
-                    crop_master.c.CropName.label("crop_name"),
-                    func.sum(yielddata.c.production).label("total_production"),
-                )
-                .join(crop_master, yielddata.c.cropid == crop_master.c.CropId)
-                .group_by(crop_master.c.CropName)
-                .order_by(func.sum(yielddata.c.production).desc())
-                .limit(1)
-            )
-
-            for clause in filters:
-                total_production_query = total_production_query.where(clause)
-                total_area_query = total_area_query.where(clause)
-                trend_query = trend_query.where(clause)
-                comparison_query = comparison_query.where(clause)
-                top_crop_query = top_crop_query.where(clause)
-
-            total_production = conn.execute(total_production_query).scalar() or 0
-            total_area = conn.execute(total_area_query).scalar() or 0
-            average_yield = (total_production / total_area) if total_area else 0
+        selected_crop_id = request.args.get("crop_id", type=int)
+        selected_district_id = request.args.get("district_id", type=int)
 
-            trend_rows = conn.execute(trend_query).mappings().all()
-            comparison_rows = conn.execute(comparison_query).mappings().all()
-            top_crop_row = conn.execute(top_crop_query).mappings().first() or {
-                "crop_name": "N/A",
-                "total_production": 0,
-            }
+        results = _shared(_analysis_page_results, selected_crop_id, selected_district_id)
+        crops = results["crops"]
+        districts = results["districts"]
+        total_production = results["total_production"] or 0
+        total_area = results["total_area"] or 0
+        average_yield = (total_production / total_area) if total_area else 0
+        trend_rows = results["trend_rows"]
+        comparison_rows = results["comparison_rows"]
+        top_crop_row = results["top_crop_row"] or {
+            "crop_name": "N/A",
+            "total_production": 0,
+        }
 
         summary = {
             "total_production": float(total_production),
@@ -115,7 +177,7 @@ def analysis_page():
 @role_required(ROLE_ADMIN, ROLE_OFFICER)
 def trend_analysis(crop_id):
     try:
-        return jsonify(get_trend_data(crop_id))
+        return analysis_json(get_trend_data(crop_id))
     except Exception as exc:
         return jsonify({"error": f"Unable to generate trend analysis: {exc}"}), 500
 
@@ -125,7 +187,7 @@ def trend_analysis(crop_id):
 @role_required(ROLE_ADMIN, ROLE_OFFICER)
 def crop_comparison():
     try:
-        return jsonify(get_crop_comparison())
+        return analysis_json(get_crop_comparison())
     except Exception as exc:
         return jsonify({"error": f"Unable to generate crop comparison: {exc}"}), 500
 
@@ -135,7 +197,7 @@ def crop_comparison():
 @role_required(ROLE_ADMIN, ROLE_OFFICER)
 def district_analysis(district_id):
     try:
-        return jsonify(get_district_analysis(district_id))
+        return analysis_json(get_district_analysis(district_id))
     except Exception as exc:
         return jsonify({"error": f"Unable to generate district analysis: {exc}"}), 500
 
@@ -146,6 +208,197 @@ def district_analysis(district_id):
 def analysis_summary():
     """Return aggregate blocks used for TU analysis explanation and charts/tables."""
     try:
-        return jsonify(get_analysis_summary())
+        return analysis_json(get_analysis_summary())
     except Exception as exc:
         return jsonify({"error": f"Unable to generate analysis summary: {exc}"}), 500
+
+
+@analysis.route("/analysis/geography")
+@login_required
+@role_required(ROLE_ADMIN, ROLE_OFFICER)
+def geography_rollup():
+    """Return the national production tree down to ``depth`` levels (province, district, municipality)."""
+    depth = request.args.get("depth", default=2, type=int)
+    try:
+        return analysis_json(_shared(get_geography_rollup, depth=depth))
+    except Exception as exc:
+        return jsonify({"error": f"Unable to generate geography rollup: {exc}"}), 500
+
+
+@analysis.route("/analysis/geography/<string:level>/<int:area_id>")
+@login_required
+@role_required(ROLE_ADMIN, ROLE_OFFICER)
+def geography_subtree(level, area_id):
+    """Return the subtree below a single province or district for drill-down."""
+    if level not in GEOGRAPHY_LEVELS[:-1]:
+        return jsonify({"error": f"Unsupported geography level: {level}"}), 400
+
+    depth = request.args.get("depth", default=1, type=int)
+    try:
+        return analysis_json(_shared(get_geography_rollup, level, area_id, depth=depth))
+    except Exception as exc:
+        return jsonify({"error": f"Unable to generate geography subtree: {exc}"}), 500
+
+
+@analysis.route("/analysis/outliers")
+@login_required
+@role_required(ROLE_ADMIN, ROLE_OFFICER, ROLE_FARMER)
+def yield_outliers():
+    """Flag suspicious yield records within their (crop, district, season) group.
+
+    Farmers are always scoped to their own records; officers and admins may pass
+    ``farmer_id`` to do the same for one farmer.
+    """
+    method = request.args.get("method", METHOD_ROBUST_Z)
+    if method not in DEFAULT_THRESHOLDS:
+        return jsonify({"error": f"Unsupported method: {method}", "available": list(DEFAULT_THRESHOLDS)}), 400
+    threshold = request.args.get("threshold", default=DEFAULT_THRESHOLDS[method], type=float)
+    limit = max(1, min(request.args.get("limit", default=500, type=int), 5000))
+    if session.get("role") == ROLE_FARMER:
+        farmer_id = get_current_user_id()
+    else:
+        farmer_id = request.args.get("farmer_id", type=int)
+
+    try:
+        outliers = _shared(_ranked_outliers, farmer_id, method, threshold)
+    except Exception as exc:
+        return jsonify({"error": f"Unable to detect outliers: {exc}"}), 500
+    return analysis_json(
+        {
+            "method": method,
+            "threshold": threshold,
+            "farmer_id": farmer_id,
+            "count": len(outliers),
+            "outliers": outliers[:limit],
+        }
+    )
+
+
+@analysis.route("/analysis/forecasts")
+@login_required
+@role_required(ROLE_ADMIN, ROLE_OFFICER)
+def forecast_list():
+    """Stored next-season forecasts per (crop, district) with prediction intervals."""
+    metric = request.args.get("metric", "production")
+    model = request.args.get("model", MODEL_LINEAR)
+    if metric not in FORECAST_METRICS:
+        return jsonify({"error": f"Unsupported metric: {metric}", "available": list(FORECAST_METRICS)}), 400
+    if model not in FORECAST_MODELS:
+        return jsonify({"error": f"Unsupported model: {model}", "available": list(FORECAST_MODELS)}), 400
+
+    try:
+        forecasts = _shared(
+            get_forecasts,
+            crop_id=request.args.get("crop_id", type=int),
+            district_id=request.args.get("district_id", type=int),
+            metric=metric,
+            model=model,
+        )
+    except Exception as exc:
+        return jsonify({"error": f"Unable to load forecasts: {exc}"}), 500
+    return analysis_json({"metric": metric, "model": model, "count": len(forecasts), "forecasts": forecasts})
+
+
+@analysis.route("/analysis/forecasts/refit", methods=["POST"])
+@login_required
+@role_required(ROLE_ADMIN)
+def refit_yield_forecasts():
+    """Refit every crop/district series and replace the stored forecasts."""
+    horizon = max(1, min(request.args.get("horizon", default=DEFAULT_HORIZON, type=int), 10))
+    confidence = request.args.get("confidence", default=DEFAULT_CONFIDENCE, type=float)
+    if not 0 < confidence < 1:
+        return jsonify({"error": "confidence must be between 0 and 1"}), 400
+
+    try:
+        stored = refit_forecasts(horizon=horizon, confidence=confidence)
+    except Exception as exc:
+        return jsonify({"error": f"Unable to refit forecasts: {exc}"}), 500
+    return jsonify({"horizon": horizon, "confidence": confidence, "stored": stored})
+
+
+@analysis.route("/analysis/quantiles")
+@login_required
+@role_required(ROLE_ADMIN, ROLE_OFFICER)
+def yield_quantiles():
+    """Yield percentiles merged from stored sketches, e.g. ``?group_by=crop&province_id=3&q=0.1,0.5,0.9``."""
+    group_by = request.args.get("group_by") or None
+    if group_by is not None and group_by not in GROUP_BY_COLUMNS:
+        return jsonify({"error": f"Unsupported group_by: {group_by}", "available": list(GROUP_BY_COLUMNS)}), 400
+    try:
+        quantiles = tuple(float(value) for value in request.args.get("q", "").split(",") if value.strip()) or DEFAULT_QUANTILES
+    except ValueError:
+        return jsonify({"error": "q must be a comma-separated list of numbers"}), 400
+    if len(quantiles) > 20 or not all(0 <= value <= 1 for value in quantiles):
+        return jsonify({"error": "q takes up to 20 values between 0 and 1"}), 400
+
+    try:
+        groups = _shared(
+            get_yield_quantiles,
+            quantiles=quantiles,
+            group_by=group_by,
+            crop_id=request.args.get("crop_id", type=int),
+            district_id=request.args.get("district_id", type=int),
+            province_id=request.args.get("province_id", type=int),
+            year_from=request.args.get("year_from", type=int),
+            year_to=request.args.get("year_to", type=int),
+        )
+    except Exception as exc:
+        return jsonify({"error": f"Unable to compute yield quantiles: {exc}"}), 500
+    return analysis_json({"group_by": group_by, "quantiles": list(quantiles), "groups": groups})
+
+
+@analysis.route("/analysis/rankings")
+@login_required
+@role_required(ROLE_ADMIN, ROLE_OFFICER)
+def rankings():
+    """Top-K farmers, municipalities, crops or districts, e.g. the best 5 municipalities per district.
+
+    ``?entity=municipality&metric=yield_per_hectare&partition=district&k=5&crop_id=1``
+    """
+    entity = request.args.get("entity", "crop")
+    metric = request.args.get("metric", "production")
+    partition = request.args.get("partition") or None
+    ties = request.args.get("ties", "rank")
+    for name, value, allowed in (
+        ("entity", entity, RANK_ENTITIES),
+        ("metric", metric, tuple(RANKING_METRICS)),
+        ("ties", ties, tuple(TIE_FUNCTIONS)),
+    ):
+        if value not in allowed:
+            return jsonify({"error": f"Unsupported {name}: {value}", "available": list(allowed)}), 400
+    if partition is not None and (partition not in RANKING_PARTITIONS or partition == entity):
+        available = [name for name in RANKING_PARTITIONS if name != entity]
+        return jsonify({"error": f"Unsupported partition: {partition}", "available": available}), 400
+
+    top_k = request.args.get("k", default=10, type=int)
+    filters = {name: request.args.get(name, type=int) for name in RANKING_FILTERS}
+    try:
+        return analysis_json(_shared(get_rankings, entity, metric, partition, top_k, ties, filters))
+    except Exception as exc:
+        return jsonify({"error": f"Unable to compute rankings: {exc}"}), 500
+
+
+def _name_list(arg):
+    return [name.strip() for name in request.args.get(arg, "").split(",") if name.strip()]
+
+
+@analysis.route("/analysis/pivot")
+@login_required
+@role_required(ROLE_ADMIN, ROLE_OFFICER)
+def pivot():
+    """Cross-tab any dimensions in one call, e.g. ``?rows=province,crop&columns=year&measures=production&totals=1``."""
+    try:
+        return analysis_json(
+            _shared(
+                get_pivot,
+                rows=_name_list("rows"),
+                columns=_name_list("columns"),
+                measures=_name_list("measures") or ["production"],
+                filters={name: request.args.get(name, type=int) for name in PIVOT_FILTERS},
+                totals=request.args.get("totals", "").lower() in {"1", "true", "yes"},
+            )
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    except Exception as exc:
+        return jsonify({"error": f"Unable to build pivot: {exc}"}), 500
@@ -0,0 +1,164 @@
+import json
+
+from flask import Blueprint, Response, current_app, g, jsonify, request
+
+from models import read_engine, yield_full_report
+from services.change_feed_service import FEED_ENTITIES, get_changes
+from services.auth_service import ROLE_ADMIN, ROLE_FARMER, generate_api_token, get_user_by_login, verify_password
+from services.export_service import REPORT_FILTERS, build_full_report_query
+from services.yield_write_service import bulk_upsert_yields
+from utils.cursors import decode_cursor, encode_cursor
+from utils.security import api_token_required
+
+api = Blueprint("api", __name__, url_prefix="/api")
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+STREAM_BATCH_ROWS = 1000
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def _decode_after_id(cursor):
+    position = decode_cursor(cursor)
+    try:
+        return int(position["after"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Invalid cursor.") from None
+
+
+def _api_owner_id():
+    """Farmers only ever read their own records."""
+    return g.api_user["id"] if g.api_user["role"] == ROLE_FARMER else None
+
+
+@api.route("/token", methods=["POST"])
+def issue_token():
+    """Exchange a username/email and password for a bearer token."""
+    payload = request.get_json(silent=True) or {}
+    login_value = str(payload.get("login", "")).strip()
+    password = str(payload.get("password", ""))
+    user = get_user_by_login(login_value) if login_value else None
+    if not user or not verify_password(password, user.get("password_hash")):
+        return jsonify({"error": "Invalid credentials."}), 401
+    return jsonify(
+        {
+            "token": generate_api_token(user["id"]),
+            "token_type": "Bearer",
+            "expires_in": current_app.config["API_TOKEN_MAX_AGE_SECONDS"],
+        }
+    )
+
+
+@api.route("/yields/bulk", methods=["POST"])
+@api_token_required(ROLE_FARMER, ROLE_ADMIN)
+def bulk_upsert_yield_records():
+    """Create or update many yield records in one transaction.
+
+    Body: a JSON array of records (or ``{"records": [...]}``) using the form
+    field names plus an optional ``client_key``. Without a key, the record's
+    crop/district/municipality/season/year act as the natural key.
+    """
+    payload = request.get_json(silent=True)
+    items = payload.get("records") if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Expected a non-empty JSON array of records."}), 400
+    max_items = current_app.config["API_BULK_MAX_ITEMS"]
+    if len(items) > max_items:
+        return jsonify({"error": f"At most {max_items} records per request."}), 413
+
+    try:
+        results = bulk_upsert_yields(items, g.api_user["id"])
+    except Exception as exc:
+        return jsonify({"error": f"Unable to save records: {exc}"}), 500
+
+    summary = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return jsonify({"results": results, "summary": summary})
+
+
+@api.route("/yields")
+@api_token_required()
+def list_yield_records():
+    """Stream report rows as NDJSON, one page per request.
+
+    Filters match the full report (``year``, ``crop_id``, ``district_id``,
+    ``season_id``); ``fields`` is a comma-separated column list pushed into the
+    SELECT. Rows are ordered by ``yieldid`` and paged with an opaque keyset
+    ``cursor``. The last line is ``{"_page": {"count": n, "next_cursor": ...}}``;
+    ``next_cursor`` is null once the result set is exhausted.
+    """
+    available = yield_full_report.c
+    requested = [name.strip() for name in request.args.get("fields", "").split(",") if name.strip()]
+    unknown = [name for name in requested if name not in available]
+    if unknown:
+        return jsonify({"error": f"Unknown fields: {', '.join(unknown)}", "available": list(available.keys())}), 400
+    fields = requested or list(available.keys())
+
+    config = current_app.config
+    limit = request.args.get("limit", default=config["API_PAGE_DEFAULT_LIMIT"], type=int)
+    limit = max(1, min(limit, config["API_PAGE_MAX_LIMIT"]))
+    try:
+        after_id = _decode_after_id(request.args["cursor"]) if request.args.get("cursor") else None
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    columns = list(fields)
+    if "yieldid" not in fields:
+        columns.append("yieldid")
+    query, params = build_full_report_query(
+        owner_id=_api_owner_id(),
+        columns=columns,
+        after_id=after_id,
+        limit=limit,
+        **{name: request.args.get(name, type=int) for name in REPORT_FILTERS},
+    )
+
+    def stream():
+        count = 0
+        last_id = None
+        buffer = []
+        size = 0
+        with read_engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=STREAM_BATCH_ROWS).execute(query, params)
+            for row in result.mappings():
+                count += 1
+                last_id = row["yieldid"]
+                line = json.dumps({name: row[name] for name in fields}, default=str) + "\n"
+                buffer.append(line)
+                size += len(line)
+                if size >= STREAM_CHUNK_BYTES:
+                    yield "".join(buffer)
+                    buffer = []
+                    size = 0
+        next_cursor = encode_cursor({"after": last_id}) if count == limit else None
+        buffer.append(json.dumps({"_page": {"count": count, "next_cursor": next_cursor}}) + "\n")
+        yield "".join(buffer)
+
+    return Response(stream(), mimetype=NDJSON_MIMETYPE)
+
+
+@api.route("/changes")
+@api_token_required()
+def change_feed():
+    """Inserts/updates and deletes since a watermark, ordered by (timestamp, id).
+
+    Start with ``since=<ISO timestamp>`` (or nothing for a full replay), then
+    pass the returned ``cursor`` back; repeat while ``has_more`` is true.
+    """
+    entity = request.args.get("entity", "yield")
+    if entity not in FEED_ENTITIES:
+        return jsonify({"error": f"Unknown entity: {entity}", "available": list(FEED_ENTITIES)}), 400
+    config = current_app.config
+    limit = request.args.get("limit", default=config["API_PAGE_DEFAULT_LIMIT"], type=int)
+    limit = max(1, min(limit, config["API_PAGE_MAX_LIMIT"]))
+    try:
+        feed = get_changes(
+            entity,
+            cursor=request.args.get("cursor"),
+            since=request.args.get("since"),
+            limit=limit,
+            owner_id=_api_owner_id(),
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify(feed)
@@ -1,15 +1,67 @@
+import json
 import logging
-from flask import Flask, render_template
+import os
+
+import click
+
+from jinja2 import FileSystemBytecodeCache
+from flask import Flask, g, jsonify, render_template, request, session
 from config import Config
+from models import init_engines
 
 from routes import main
 from analysis_routes import analysis
 from auth_routes import auth
-from utils.security import ensure_csrf_token, csrf_protect_request, get_current_user
+from asset_routes import assets
+from api_routes import api
+from services.anomaly_service import DEFAULT_THRESHOLDS, METHOD_ROBUST_Z, find_yield_outliers, rank_outliers
+from services.change_feed_service import FEED_ENTITIES, get_changes
+from services.data_quality_service import DEFAULT_CHUNK_SIZE, DEFAULT_TOLERANCE, scan_yield_quality
+from services.forecast_service import DEFAULT_CONFIDENCE, DEFAULT_HORIZON, refit_forecasts
+from services.pivot_service import pivot_cache
+from services.quantile_service import rebuild_all_sketches
+from utils.admission import AdmissionController, AdmissionRejected, hold_until_sent, pool_sized_limits, request_class
+from utils.assets import asset_url
+from utils.compression import CompressionMiddleware
+from utils.fragment_cache import FragmentCacheExtension, fragment_cache
+from utils.json_provider import FastJSONProvider
+from utils.db_routing import (
+    close_request_scope,
+    committed_write,
+    open_request_scope,
+    prefer_primary_for_request,
+    record_write,
+)
+from utils.startup_profile import (
+    LAZY_MODULES,
+    STARTUP_IMPORT_BUDGET_MS,
+    format_report,
+    profile_startup,
+    total_import_ms,
+)
+from utils.security import SAFE_METHODS, ensure_csrf_token, csrf_protect_request, get_current_user
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.json = FastJSONProvider(app, app.config["JSON_BACKEND"])
+    init_engines(app.config)
+
+    jinja_options = dict(app.jinja_options)
+    jinja_options["extensions"] = [*jinja_options.get("extensions", ()), FragmentCacheExtension]
+    bytecode_cache_dir = app.config.get("JINJA_BYTECODE_CACHE_DIR")
+    if bytecode_cache_dir:
+        try:
+            os.makedirs(bytecode_cache_dir, exist_ok=True)
+        except OSError:
+            logging.getLogger(__name__).warning("Jinja bytecode cache disabled: cannot create %s", bytecode_cache_dir)
+        else:
+            jinja_options["bytecode_cache"] = FileSystemBytecodeCache(bytecode_cache_dir)
+    app.jinja_options = jinja_options
+    fragment_cache.max_entries = app.config["FRAGMENT_CACHE_MAX_ENTRIES"]
+    fragment_cache.ttl_seconds = app.config["FRAGMENT_CACHE_TTL_SECONDS"]
+    pivot_cache.max_entries = app.config["PIVOT_CACHE_MAX_ENTRIES"]
+    pivot_cache.ttl_seconds = app.config["PIVOT_CACHE_TTL_SECONDS"]
 
     logging.basicConfig(
         level=logging.INFO,
@@ -26,10 +78,84 @@ def create_app():
             "current_role": active_user.get("role") if active_user else None,
         }
 
+    def is_asset_request():
+        return request.endpoint == "static" or request.blueprint == "assets"
+
     @app.before_request
     def csrf_protect():
+        # The JSON API authenticates with bearer tokens, not the session cookie.
+        if is_asset_request() or request.blueprint == "api":
+            return
         csrf_protect_request()
 
+    admission = AdmissionController(
+        pool_sized_limits(
+            app.config["ADMISSION_LIMITS"],
+            app.config["DB_POOL_SIZE"] + app.config["DB_MAX_OVERFLOW"],
+            background_connections=app.config["EXPORT_WORKERS"],
+            analysis_connections=1 + (app.config["QUERY_FANOUT_WORKERS"] if app.config["PARALLEL_QUERIES"] else 0),
+        ),
+        app.config["ADMISSION_QUEUE_SIZES"],
+        write_reserve=app.config["ADMISSION_WRITE_RESERVE"],
+        queue_timeout=app.config["ADMISSION_QUEUE_TIMEOUT_SECONDS"],
+        retry_after=app.config["ADMISSION_RETRY_AFTER_SECONDS"],
+    )
+    app.extensions["admission"] = admission
+
+    @app.before_request
+    def admission_control():
+        if not app.config["ADMISSION_CONTROL_ENABLED"] or is_asset_request():
+            return None
+        admission_class = request_class(request.endpoint, request.blueprint)
+        if admission_class is None:
+            return None
+        try:
+            g._admission_ticket = admission.admit(admission_class, write=request.method not in SAFE_METHODS)
+        except AdmissionRejected as exc:
+            message = "The server is busy, please retry shortly."
+            if request.accept_mimetypes.accept_html and request.blueprint != "api":
+                response = app.response_class(message, status=503, mimetype="text/plain")
+            else:
+                response = jsonify({"error": message, "class": exc.admission_class})
+                response.status_code = 503
+            response.headers["Retry-After"] = str(exc.retry_after)
+            return response
+        return None
+
+    @app.after_request
+    def release_admission_after_body(response):
+        # Streamed bodies (NDJSON pages, exports) keep their slot until sent.
+        ticket = g.pop("_admission_ticket", None)
+        if ticket is not None:
+            hold_until_sent(response, ticket)
+        return response
+
+    @app.teardown_request
+    def release_admission(_error):
+        ticket = g.pop("_admission_ticket", None)
+        if ticket is not None:
+            ticket.release()
+
+    @app.before_request
+    def route_reads():
+        if is_asset_request():
+            return
+        prefer_primary_for_request(session)
+        read_only = request.method in SAFE_METHODS
+        open_request_scope(app.config["REQUEST_READ_ISOLATION_LEVEL"] if read_only else None)
+
+    @app.teardown_request
+    def release_connections(_error):
+        close_request_scope()
+
+    @app.after_request
+    def start_read_your_writes_window(response):
+        # Only handlers that committed a user write open the window; logins,
+        # form re-renders and export submissions keep reading from replicas.
+        if committed_write() and "user_id" in session:
+            record_write(session, app.config["READ_YOUR_WRITES_SECONDS"])
+        return response
+
     @app.errorhandler(404)
     def handle_404(error):
         return render_template("404.html"), 404
@@ -39,9 +165,107 @@ def create_app():
         return render_template("500.html"), 500
 
 
+    app.add_template_global(asset_url)
+
+    app.register_blueprint(assets)
     app.register_blueprint(auth)
     app.register_blueprint(main)
     app.register_blueprint(analysis)
+    app.register_blueprint(api)
+
+    @app.cli.command("profile-startup")
+    @click.option("--top", default=25, show_default=True, help="Modules to list by self time.")
+    @click.option("--min-ms", default=1.0, show_default=True, help="Hide tree nodes faster than this.")
+    def profile_startup_command(top, min_ms):
+        """Report the create_app import tree and its timing."""
+        report = profile_startup()
+        click.echo(format_report(report["imports"], top=top, min_ms=min_ms))
+        eager = [name for name in LAZY_MODULES if name in report["loaded_modules"]]
+        if eager:
+            click.echo(f"\nWARNING: optional modules imported at startup: {', '.join(eager)}")
+        if total_import_ms(report["imports"]) > STARTUP_IMPORT_BUDGET_MS:
+            click.echo(f"WARNING: startup imports exceed the {STARTUP_IMPORT_BUDGET_MS:.0f} ms budget")
+
+    @app.cli.command("change-feed")
+    @click.option("--entity", type=click.Choice(sorted(FEED_ENTITIES)), default="yield", show_default=True)
+    @click.option("--since", default=None, help="ISO timestamp to start from when there is no saved cursor.")
+    @click.option("--state-file", type=click.Path(dir_okay=False), default=None, help="Read and save the cursor here.")
+    @click.option("--limit", default=1000, show_default=True, help="Rows fetched per page.")
+    def change_feed_command(entity, since, state_file, limit):
+        """Print changes since the saved cursor as NDJSON and save the new cursor."""
+        cursor = None
+        if state_file and os.path.exists(state_file):
+            with open(state_file, encoding="utf-8") as state:
+                cursor = state.read().strip() or None
+
+        while True:
+            page = get_changes(entity, cursor=cursor, since=since, limit=limit)
+            for change in page["changes"]:
+                click.echo(json.dumps(change, default=str))
+            cursor = page["next_cursor"]
+            if state_file:
+                with open(state_file, "w", encoding="utf-8") as state:
+                    state.write(cursor)
+            if not page["has_more"]:
+                break
+
+    @app.cli.command("detect-outliers")
+    @click.option("--method", type=click.Choice(sorted(DEFAULT_THRESHOLDS)), default=METHOD_ROBUST_Z, show_default=True)
+    @click.option("--threshold", type=float, default=None, help="Defaults to 3.5 (robust_z) or 1.5 (iqr).")
+    @click.option("--farmer-id", type=int, default=None, help="Only analyse this farmer's records.")
+    @click.option("--output", type=click.Path(dir_okay=False), default=None, help="Write JSON here instead of stdout.")
+    def detect_outliers_command(method, threshold, farmer_id, output):
+        """Flag yield records that are outliers within their crop/district/season group."""
+        outliers = rank_outliers(find_yield_outliers(farmer_id, method=method, threshold=threshold))
+        payload = json.dumps(outliers, indent=2)
+        if output:
+            with open(output, "w", encoding="utf-8") as report:
+                report.write(payload)
+            click.echo(f"{len(outliers)} outliers written to {output}")
+        else:
+            click.echo(payload)
+
+    @app.cli.command("scan-data-quality")
+    @click.option("--chunk-size", default=DEFAULT_CHUNK_SIZE, show_default=True, help="Rows checked per chunk.")
+    @click.option("--tolerance", default=DEFAULT_TOLERANCE, show_default=True, help="Relative production tolerance.")
+    @click.option("--pause-ms", default=0, show_default=True, help="Sleep between chunks to limit load.")
+    @click.option("--restart", is_flag=True, help="Ignore the checkpoint and rescan from the first row.")
+    def scan_data_quality_command(chunk_size, tolerance, pause_ms, restart):
+        """Stream yielddata through the integrity rules, resuming from the last checkpoint."""
+        output_dir = app.config["DATA_QUALITY_DIR"]
+        state = scan_yield_quality(
+            os.path.join(output_dir, "yield_violations.csv"),
+            os.path.join(output_dir, "yield_scan_checkpoint.json"),
+            chunk_size=chunk_size,
+            tolerance=tolerance,
+            restart=restart,
+            pause_seconds=pause_ms / 1000,
+        )
+        click.echo(f"Scanned {state['rows_scanned']} rows up to yieldid {state['last_yieldid']}.")
+        for rule, count in sorted(state["violations"].items()):
+            click.echo(f"  {rule}: {count}")
+        click.echo(f"Report: {state['report']}")
+
+    @app.cli.command("refit-forecasts")
+    @click.option("--horizon", default=DEFAULT_HORIZON, show_default=True, help="Years ahead to forecast.")
+    @click.option("--confidence", default=DEFAULT_CONFIDENCE, show_default=True, help="Prediction interval level.")
+    def refit_forecasts_command(horizon, confidence):
+        """Refit every crop/district yield series and store the forecasts."""
+        stored = refit_forecasts(horizon=horizon, confidence=confidence)
+        click.echo(f"Stored {stored} forecasts.")
+
+    @app.cli.command("rebuild-yield-sketches")
+    def rebuild_yield_sketches_command():
+        """Recompute every per-(crop, district, year) yield quantile sketch from yielddata."""
+        groups = rebuild_all_sketches()
+        click.echo(f"Rebuilt {groups} yield sketches.")
+
+    if app.config["COMPRESSION_ENABLED"]:
+        app.wsgi_app = CompressionMiddleware(
+            app.wsgi_app,
+            levels=app.config["COMPRESSION_LEVELS"],
+            min_size=app.config["COMPRESSION_MIN_SIZE"],
+        )
 
     return app
 
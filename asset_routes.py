@@ -0,0 +1,38 @@
+import mimetypes
+import os
+
+from flask import Blueprint, abort, request, send_from_directory
+from werkzeug.security import safe_join
+
+from utils.assets import IMMUTABLE_CACHE_CONTROL, MANIFEST_NAME, REVALIDATE_CACHE_CONTROL, dist_folder
+
+
+assets = Blueprint("assets", __name__)
+
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+@assets.route("/assets/<path:filename>")
+def built_asset(filename):
+    """Serve fingerprinted build output, preferring a precompressed variant the client accepts."""
+    folder = dist_folder()
+    path = safe_join(folder, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    accepted = request.accept_encodings
+    for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+        if accepted[encoding] and os.path.isfile(path + suffix):
+            response = send_from_directory(folder, filename + suffix, mimetype=mimetype, max_age=None)
+            response.headers["Content-Encoding"] = encoding
+            break
+    else:
+        response = send_from_directory(folder, filename, mimetype=mimetype, max_age=None)
+
+    if filename == MANIFEST_NAME:
+        response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+    else:
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    response.vary.add("Accept-Encoding")
+    return response
@@ -0,0 +1,86 @@
+"""Measure the per-call Python cost of building and compiling the hot read statements.
+
+For each cached statement builder, "rebuilt" constructs the statement tree on
+every call (the old behaviour, via the builder's ``__wrapped__``), while
+"cached" reuses the template built once per filter shape. Both go through
+SQLAlchemy's compiled cache with the PostgreSQL dialect, as ``conn.execute``
+does, so the difference is the construction and cache-key cost. No database is
+needed.
+
+    python bench_statements.py --calls 2000
+"""
+import argparse
+import timeit
+
+from sqlalchemy.dialects import postgresql
+
+import analysis_routes
+from services import export_service, yield_service
+
+
+CASES = (
+    ("total production (owner)", yield_service._sum_statement, ("production", True)),
+    ("trend data (owner)", yield_service._trend_statement, (True,)),
+    ("district analysis", yield_service._crop_comparison_statement, (False, True)),
+    ("analysis summary", yield_service._analysis_summary_statements, (False,)),
+    ("analysis page (crop+district)", analysis_routes._analysis_page_statements, (True, True)),
+    (
+        "report page (filters+owner)",
+        export_service._full_report_statement,
+        (("year", "crop_id"), True, None, False),
+    ),
+    (
+        "api page (fields+keyset)",
+        export_service._full_report_statement,
+        (("crop_id",), True, ("year", "production", "yieldid"), True),
+    ),
+)
+
+
+def _statements(built):
+    return built.values() if isinstance(built, dict) else (built,)
+
+
+def _compile(statement, dialect, cache):
+    statement._compile_w_cache(
+        dialect,
+        compiled_cache=cache,
+        column_keys=[],
+        for_executemany=False,
+        schema_translate_map=None,
+    )
+
+
+def measure(builder, shape, calls):
+    """Return (rebuilt, cached) microseconds per call."""
+    dialect = postgresql.dialect()
+    cache = {}
+
+    def rebuilt():
+        for statement in _statements(builder.__wrapped__(*shape)):
+            _compile(statement, dialect, cache)
+
+    def cached():
+        for statement in _statements(builder(*shape)):
+            _compile(statement, dialect, cache)
+
+    results = []
+    for call in (rebuilt, cached):
+        call()
+        results.append(min(timeit.repeat(call, number=calls, repeat=3)) / calls * 1e6)
+    return tuple(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000, help="calls per timing run")
+    args = parser.parse_args()
+
+    print(f"{'statement':32} {'rebuilt us':>11} {'cached us':>10} {'speedup':>8}")
+    for name, builder, shape in CASES:
+        rebuilt, cached = measure(builder, shape, args.calls)
+        print(f"{name:32} {rebuilt:11.1f} {cached:10.1f} {rebuilt / cached:7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
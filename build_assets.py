@@ -0,0 +1,143 @@
+"""Build fingerprinted, precompressed static assets into ``static/dist``.
+
+Steps:
+1. Compile Tailwind utilities purged against ``templates/`` (Tailwind v3 CLI) and
+   append ``static/style.css``.
+2. Copy the pinned Chart.js bundle from ``static/vendor`` if it is there
+   (``--fetch-vendor`` downloads it; the repository does not ship it).
+3. Write content-hashed copies plus ``.gz``/``.br`` variants and ``manifest.json``.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import urllib.request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from config import BASE_DIR
+from utils.assets import MANIFEST_NAME
+
+
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+VENDOR_DIR = os.path.join(STATIC_DIR, "vendor")
+
+TAILWIND_INPUT = os.path.join(STATIC_DIR, "src", "tailwind.css")
+TAILWIND_CONFIG = os.path.join(BASE_DIR, "tailwind.config.js")
+TAILWIND_CLI = os.getenv("TAILWIND_CLI", "npx --yes tailwindcss@3")
+
+CHART_JS_VERSION = "4.4.1"
+CHART_JS_FILE = "chart.umd.js"
+CHART_JS_URL = f"https://cdn.jsdelivr.net/npm/chart.js@{CHART_JS_VERSION}/dist/chart.umd.js"
+
+COMPRESSIBLE_SUFFIXES = (".css", ".js", ".svg", ".json")
+
+
+def build_css(output_path):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tailwind_output = os.path.join(tmp_dir, "tailwind.css")
+        command = [
+            *shlex.split(TAILWIND_CLI),
+            "--config", TAILWIND_CONFIG,
+            "--input", TAILWIND_INPUT,
+            "--output", tailwind_output,
+            "--minify",
+        ]
+        subprocess.run(command, check=True, cwd=BASE_DIR)
+
+        with open(output_path, "w", encoding="utf-8") as bundle:
+            with open(tailwind_output, encoding="utf-8") as compiled:
+                bundle.write(compiled.read())
+            with open(os.path.join(STATIC_DIR, "style.css"), encoding="utf-8") as custom:
+                bundle.write("\n")
+                bundle.write(custom.read())
+
+
+def ensure_chart_js(fetch):
+    """Path of the local Chart.js copy, or ``None`` when it is missing and ``fetch`` is off.
+
+    The file is not in the repository: ``--fetch-vendor`` downloads the pinned
+    release into ``static/vendor``, and an offline build skips it so pages keep
+    loading the same pinned release from the CDN.
+    """
+    path = os.path.join(VENDOR_DIR, CHART_JS_FILE)
+    if not os.path.isfile(path):
+        if not fetch:
+            print(
+                f"warning: {path} is missing; templates will load Chart.js {CHART_JS_VERSION} from the CDN. "
+                "Run with --fetch-vendor to serve it from static/dist.",
+                file=sys.stderr,
+            )
+            return None
+        os.makedirs(VENDOR_DIR, exist_ok=True)
+        with urllib.request.urlopen(CHART_JS_URL, timeout=30) as response, open(path, "wb") as target:
+            shutil.copyfileobj(response, target)
+    return path
+
+
+def fingerprint(source_path, logical_name):
+    with open(source_path, "rb") as source:
+        content = source.read()
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    stem, suffix = os.path.splitext(logical_name)
+    hashed_name = f"{stem}.{digest}{suffix}"
+
+    target_path = os.path.join(DIST_DIR, hashed_name)
+    with open(target_path, "wb") as target:
+        target.write(content)
+
+    if suffix in COMPRESSIBLE_SUFFIXES:
+        with open(target_path + ".gz", "wb") as target:
+            target.write(gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(target_path + ".br", "wb") as target:
+                target.write(brotli.compress(content, quality=11))
+
+    return hashed_name
+
+
+def build(fetch_vendor=False, skip_css=False):
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+
+    manifest = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if not skip_css:
+            css_path = os.path.join(tmp_dir, "app.css")
+            build_css(css_path)
+            manifest["app.css"] = fingerprint(css_path, "app.css")
+        chart_js = ensure_chart_js(fetch_vendor)
+        if chart_js is not None:
+            manifest[CHART_JS_FILE] = fingerprint(chart_js, CHART_JS_FILE)
+
+    with open(os.path.join(DIST_DIR, MANIFEST_NAME), "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fetch-vendor", action="store_true", help="download missing vendored libraries")
+    parser.add_argument("--skip-css", action="store_true", help="only fingerprint vendored files")
+    args = parser.parse_args(argv)
+
+    manifest = build(fetch_vendor=args.fetch_vendor, skip_css=args.skip_css)
+    for logical_name, hashed_name in sorted(manifest.items()):
+        print(f"{logical_name} -> {hashed_name}")
+    if brotli is None:
+        print("brotli not installed; only gzip variants were written", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,11 @@ def init_database():
         "ALTER TABLE yielddata ADD COLUMN IF NOT EXISTS updated_by INTEGER NULL",
         "ALTER TABLE yielddata ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now()",
         "ALTER TABLE yielddata ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT now()",
+        "ALTER TABLE yielddata ADD COLUMN IF NOT EXISTS client_key VARCHAR(100) NULL",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_yielddata_created_by_client_key ON yielddata (created_by, client_key)",
+        "CREATE INDEX IF NOT EXISTS ix_yielddata_updated_at_yieldid ON yielddata (updated_at, yieldid)",
+        "CREATE INDEX IF NOT EXISTS ix_yielddata_duplicate_key ON yielddata (cropid, year, municipalityid, seasonid, created_by, yieldid)",
+        'CREATE INDEX IF NOT EXISTS ix_crop_master_updated_at_cropid ON crop_master (updated_at, "CropId")',
     ]
 
     with engine.connect() as conn:
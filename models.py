@@ -1,7 +1,46 @@
-from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, Float, ForeignKey, DateTime, func
+from sqlalchemy import create_engine, MetaData, Table, Column, Index, Integer, String, Float, ForeignKey, DateTime, LargeBinary, func
 from config import Config
+from utils.db_routing import ReadReplicaRouter, scoped_connect
 
-engine = create_engine(Config.DATABASE_URL)
+
+class LazyEngine:
+    """Stand-in for the primary engine so importing models has no side effects.
+
+    ``init_engines`` (called from ``create_app``) creates the real engine; CLI
+    scripts that never build the app get one from ``Config`` on first use.
+    Inside a request, ``connect()`` hands out the request's shared connection.
+    """
+
+    def __init__(self):
+        self._engine = None
+
+    def configure(self, url, **options):
+        if self._engine is not None:
+            self._engine.dispose()
+        self._engine = create_engine(url, **options)
+        return self._engine
+
+    def get(self):
+        if self._engine is None:
+            self.configure(Config.DATABASE_URL, pool_size=Config.DB_POOL_SIZE, max_overflow=Config.DB_MAX_OVERFLOW)
+        return self._engine
+
+    def connect(self):
+        return scoped_connect(id(self), lambda: self.get().connect())
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+engine = LazyEngine()
+read_engine = ReadReplicaRouter(engine)
+
+
+def init_engines(config):
+    """Create the primary and replica engines from app config."""
+    pool = {"pool_size": config["DB_POOL_SIZE"], "max_overflow": config["DB_MAX_OVERFLOW"]}
+    engine.configure(config["DATABASE_URL"], **pool)
+    read_engine.set_replicas([create_engine(url, **pool) for url in config.get("READ_DATABASE_URLS", [])])
 
 metadata = MetaData()
 
@@ -78,6 +117,7 @@ crop_master = Table(
     Column("updated_by", Integer, ForeignKey("users.id"), nullable=True),
     Column("created_at", DateTime, nullable=False, server_default=func.now()),
     Column("updated_at", DateTime, nullable=False, server_default=func.now(), onupdate=func.now()),
+    Index("ix_crop_master_updated_at_cropid", "updated_at", "CropId"),
 )
 
 yielddata = Table(
@@ -95,6 +135,48 @@ yielddata = Table(
     Column("updated_by", Integer, ForeignKey("users.id"), nullable=True),
     Column("created_at", DateTime, nullable=False, server_default=func.now()),
     Column("updated_at", DateTime, nullable=False, server_default=func.now(), onupdate=func.now()),
+    Column("client_key", String(100), nullable=True),
+    Index("ux_yielddata_created_by_client_key", "created_by", "client_key", unique=True),
+    Index("ix_yielddata_updated_at_yieldid", "updated_at", "yieldid"),
+    Index("ix_yielddata_duplicate_key", "cropid", "year", "municipalityid", "seasonid", "created_by", "yieldid"),
+)
+
+change_tombstones = Table(
+    "change_tombstones", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("entity", String(50), nullable=False),
+    Column("entity_id", Integer, nullable=False),
+    Column("owner_id", Integer, nullable=True),
+    Column("deleted_by", Integer, nullable=True),
+    Column("deleted_at", DateTime, nullable=False, server_default=func.now()),
+    Index("ix_change_tombstones_entity_deleted_at_id", "entity", "deleted_at", "id"),
+)
+
+yield_forecasts = Table(
+    "yield_forecasts", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("cropid", Integer, ForeignKey("crop_master.CropId"), nullable=False),
+    Column("districtid", Integer, ForeignKey("mastersetup.district.districtid"), nullable=False),
+    Column("metric", String(20), nullable=False),
+    Column("model", String(30), nullable=False),
+    Column("target_year", Integer, nullable=False),
+    Column("forecast", Float, nullable=False),
+    Column("lower", Float, nullable=True),
+    Column("upper", Float, nullable=True),
+    Column("confidence", Float, nullable=False),
+    Column("observations", Integer, nullable=False),
+    Column("fitted_at", DateTime, nullable=False),
+    Index("ix_yield_forecasts_metric_model_crop_district", "metric", "model", "cropid", "districtid"),
+)
+
+yield_sketches = Table(
+    "yield_sketches", metadata,
+    Column("cropid", Integer, ForeignKey("crop_master.CropId"), primary_key=True),
+    Column("districtid", Integer, ForeignKey("mastersetup.district.districtid"), primary_key=True),
+    Column("year", Integer, primary_key=True),
+    Column("count", Integer, nullable=False),
+    Column("sketch", LargeBinary, nullable=False),
+    Column("updated_at", DateTime, nullable=False, server_default=func.now()),
 )
 
 
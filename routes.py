@@ -1,15 +1,15 @@
 from datetime import datetime
 from io import BytesIO
-import csv
-import io
+import json
+import time
 
-from openpyxl import Workbook
-from flask import Blueprint, flash, render_template, request, redirect, url_for, send_file, Response, session
+from flask import Blueprint, Response, current_app, flash, render_template, request, redirect, url_for, send_file, session, jsonify
 from sqlalchemy import select, func, insert, update, delete, text
 from sqlalchemy.exc import IntegrityError
 
 from models import (
     engine,
+    read_engine,
     crop_master,
     district,
     municipality,
@@ -22,18 +22,58 @@ from models import (
 from services.yield_service import (
     get_total_production,
     get_total_cultivated_area,
-    get_average_yield,
     get_highest_producing_crop,
     get_latest_year_data_count,
     get_analysis_summary,
 )
 from services.audit_service import log_audit
+from services.change_feed_service import record_tombstone
+from services.export_jobs import (
+    JOB_DONE,
+    download_mimetype,
+    download_name,
+    get_job as get_export_job,
+    make_download_token,
+    open_download,
+    submit_export,
+)
+from services.export_service import (
+    EXPORT_FORMATS,
+    REPORT_DISPLAY_COLUMNS,
+    REPORT_FILTERS,
+    build_full_report_query,
+    filter_report_columns,
+    report_records,
+)
+from services.query_executor import fetch_records, fetch_scalar, run_calls, run_queries
+from services.search_service import (
+    invalidate_search_indexes,
+    search_crops,
+    search_districts,
+    search_municipalities,
+)
+from services.event_channel import start_listening
+from services.yield_write_service import publish_yield_change
+from services.quantile_service import update_yield_sketches
 from services.auth_service import ROLE_ADMIN, ROLE_FARMER, ROLE_OFFICER, hash_password
+from utils.db_routing import note_committed_write
+from utils.event_bus import event_bus
+from utils.fragment_cache import bump_reference_data_version
+from utils.metrics import metrics
+from utils.row_records import records_from_result
 from utils.security import login_required, role_required, get_current_user_id
 
 
 main = Blueprint("main", __name__)
 
+DASHBOARD_HIDDEN_COLUMNS = {
+    "yieldid", "cropid", "districtid", "municipalityid", "seasonid",
+    "created_by", "updated_by", "created_at", "updated_at", "client_key",
+}
+DASHBOARD_DISPLAY_COLUMNS = tuple(name for name in yielddata.c.keys() if name not in DASHBOARD_HIDDEN_COLUMNS)
+# yieldid is selected for the edit/delete links but not displayed.
+DASHBOARD_RECORD_COLUMNS = ("yieldid",) + DASHBOARD_DISPLAY_COLUMNS
+
 
 
 
@@ -65,51 +105,46 @@ def validate_yield_data(data):
     return errors
 
 
-def _filter_report_columns(report_data):
-    """Remove redundant ID columns and keep only meaningful display columns."""
-    if not report_data:
-        return report_data, []
+def _selected_municipality_options(conn, municipality_id):
+    """Return only the currently selected municipality; the rest are loaded lazily via search."""
+    if not municipality_id:
+        return []
+    return conn.execute(
+        select(municipality).where(municipality.c.municipalityid == municipality_id)
+    ).mappings().all()
+
+
+def _search_limit():
+    return max(1, min(request.args.get("limit", default=20, type=int) or 20, 200))
+
+
+def _report_filters(values):
+    return {name: values.get(name, type=int) for name in REPORT_FILTERS}
+
 
-                                                                           
-    exclude_columns = {
-        'yieldid', 'YieldId',
-        'cropid', 'CropId',
-        'districtid', 'district_id',
-        'provinceid', 'province_id',
-        'municipalityid', 'municipality_id',
-        'seasonid', 'season_id'
+def _export_scope():
+    """Key export jobs and download links per farmer; officers and admins share them.
+
+    Every role exports the same rows as the report page; the scope only keeps
+    farmers from polling or downloading each other's jobs.
+    """
+    if session.get("role") == ROLE_FARMER:
+        return f"user:{get_current_user_id()}"
+    return "all"
+
+
+def _export_job_payload(job):
+    payload = {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "format": job["format"],
+        "rows": job.get("rows"),
+        "error": job.get("error"),
+        "status_url": url_for("main.export_job_status", job_id=job["job_id"]),
     }
-    
-                                                  
-    all_columns = list(report_data[0].keys()) if report_data else []
-    filtered_columns = [col for col in all_columns if col not in exclude_columns]
-    
-                                                                        
-    column_order = [
-        'year', 'CropName', 'croptypename', 'seasonname',
-        'areaharvested', 'yieldamount', 'production',
-        'municipalityname', 'districtname', 'provincename', 'MunicipalityTypeName'
-    ]
-    
-                                                                     
-    ordered_columns = [col for col in column_order if col in filtered_columns]
-    remaining_columns = [col for col in filtered_columns if col not in column_order]
-    final_columns = ordered_columns + remaining_columns
-    
-    return report_data, final_columns
-
-
-def _build_full_report_query(selected_year, selected_crop_id, selected_district_id, selected_season_id):
-    query = select(yield_full_report)
-    if selected_year is not None:
-        query = query.where(yield_full_report.c.year == selected_year)
-    if selected_crop_id is not None:
-        query = query.where(yield_full_report.c.cropid == selected_crop_id)
-    if selected_district_id is not None:
-        query = query.where(yield_full_report.c.districtid == selected_district_id)
-    if selected_season_id is not None:
-        query = query.where(yield_full_report.c.seasonid == selected_season_id)
-    return query
+    if job["status"] == JOB_DONE:
+        payload["download_url"] = url_for("main.download_export", token=make_download_token(job))
+    return payload
 
 
 def _sync_crop_type_sequence(conn):
@@ -145,45 +180,53 @@ def _sync_season_sequence(conn):
 def dashboard():
     """Dashboard with latest records and KPI cards."""
     try:
-        with engine.connect() as conn:
-            current_user_id = get_current_user_id()
-            current_user_role = session.get("role")
-            dashboard_owner_id = current_user_id if current_user_role == ROLE_FARMER else None
-
-            yield_query = select(yielddata)
-            count_query = select(func.count(yielddata.c.yieldid))
-
-            if current_user_role == ROLE_FARMER and current_user_id:
-                yield_query = yield_query.where(yielddata.c.created_by == current_user_id)
-                count_query = count_query.where(yielddata.c.created_by == current_user_id)
-
-            result = conn.execute(yield_query.order_by(yielddata.c.year.desc()).limit(10)).mappings()
-            yield_records = [dict(r) for r in result.all()]
-                                                         
-            exclude_columns = {'yieldid', 'cropid', 'districtid', 'municipalityid', 'seasonid', 'created_by', 'updated_by', 'created_at', 'updated_at'}
-            all_columns = list(yield_records[0].keys()) if yield_records else []
-            columns = [col for col in all_columns if col not in exclude_columns]
-            total_records = conn.execute(count_query).scalar() or 0
-
-            farmer_summary = None
-            if current_user_role == ROLE_FARMER and current_user_id:
-                my_records = conn.execute(
-                    select(func.count(yielddata.c.yieldid)).where(yielddata.c.created_by == current_user_id)
-                ).scalar() or 0
-                my_production = conn.execute(
-                    select(func.sum(yielddata.c.production)).where(yielddata.c.created_by == current_user_id)
-                ).scalar() or 0
-                my_area = conn.execute(
-                    select(func.sum(yielddata.c.areaharvested)).where(yielddata.c.created_by == current_user_id)
-                ).scalar() or 0
-                farmer_summary = {
-                    "records": my_records,
-                    "production": float(my_production),
-                    "area": float(my_area),
-                    "avg_yield": float(my_production / my_area) if my_area else 0.0,
-                }
+        current_user_id = get_current_user_id()
+        current_user_role = session.get("role")
+        dashboard_owner_id = current_user_id if current_user_role == ROLE_FARMER else None
+
+        yield_query = select(*(yielddata.c[name] for name in DASHBOARD_RECORD_COLUMNS))
+        count_query = select(func.count(yielddata.c.yieldid))
 
-        analysis_summary = get_analysis_summary(dashboard_owner_id)
+        if current_user_role == ROLE_FARMER and current_user_id:
+            yield_query = yield_query.where(yielddata.c.created_by == current_user_id)
+            count_query = count_query.where(yielddata.c.created_by == current_user_id)
+
+        results = run_calls(
+            {
+                "records": lambda: run_queries(
+                    read_engine,
+                    {
+                        "yield_records": fetch_records(
+                            yield_query.order_by(yielddata.c.year.desc()).limit(10), name="DashboardRecord"
+                        ),
+                        "total_records": fetch_scalar(count_query),
+                    },
+                ),
+                "analysis_summary": lambda: get_analysis_summary(dashboard_owner_id),
+                "total_production": lambda: get_total_production(dashboard_owner_id),
+                "total_area": lambda: get_total_cultivated_area(dashboard_owner_id),
+                "highest_crop": lambda: get_highest_producing_crop(dashboard_owner_id),
+                "latest_year_data_count": lambda: get_latest_year_data_count(dashboard_owner_id),
+            }
+        )
+
+        yield_records = results["records"]["yield_records"]
+        columns = list(DASHBOARD_DISPLAY_COLUMNS) if yield_records else []
+        total_records = results["records"]["total_records"] or 0
+        total_production = results["total_production"]
+        total_area = results["total_area"]
+        avg_yield_per_ha = (total_production / total_area) if total_area else 0
+
+        farmer_summary = None
+        if current_user_role == ROLE_FARMER and current_user_id:
+            farmer_summary = {
+                "records": total_records,
+                "production": float(total_production),
+                "area": float(total_area),
+                "avg_yield": float(avg_yield_per_ha),
+            }
+
+        analysis_summary = results["analysis_summary"]
         chart_scope = "personal" if dashboard_owner_id else "global"
         if current_user_role == ROLE_FARMER and not analysis_summary.get("by_year"):
             analysis_summary = get_analysis_summary()
@@ -199,12 +242,12 @@ def dashboard():
             "index.html",
             yield_records=yield_records,
             columns=columns,
-            total_production=get_total_production(dashboard_owner_id),
-            total_area=get_total_cultivated_area(dashboard_owner_id),
-            avg_yield_per_ha=get_average_yield(dashboard_owner_id),
+            total_production=total_production,
+            total_area=total_area,
+            avg_yield_per_ha=avg_yield_per_ha,
             total_records=total_records,
-            highest_crop=get_highest_producing_crop(dashboard_owner_id),
-            latest_year_data_count=get_latest_year_data_count(dashboard_owner_id),
+            highest_crop=results["highest_crop"],
+            latest_year_data_count=results["latest_year_data_count"],
             farmer_summary=farmer_summary,
             dashboard_chart_data=dashboard_chart_data,
             chart_scope=chart_scope,
@@ -245,7 +288,6 @@ def add_yield():
         with engine.connect() as conn:
             crops = conn.execute(select(crop_master).order_by(crop_master.c.CropName)).mappings().all()
             districts = conn.execute(select(district).order_by(district.c.districtname)).mappings().all()
-            municipalities = conn.execute(select(municipality).order_by(municipality.c.municipalityname)).mappings().all()
             seasons = conn.execute(select(season_master).order_by(season_master.c.seasonname)).mappings().all()
 
             if request.method == "POST":
@@ -279,11 +321,26 @@ def add_yield():
                         updated_by=user_id,
                     )
                     result = conn.execute(stmt)
+                    after = {
+                        "cropid": form_data["crop_id"],
+                        "districtid": form_data["district_id"],
+                        "seasonid": form_data["season_id"],
+                        "year": form_data["year"],
+                        "areaharvested": form_data["areaharvested"],
+                        "yieldamount": form_data["yieldamount"],
+                        "production": form_data["production"],
+                    }
+                    update_yield_sketches(conn, [(None, after)])
                     conn.commit()
-                    log_audit("INSERT", "yielddata", user_id=user_id, record_id=getattr(result, "inserted_primary_key", [None])[0])
+                    note_committed_write()
+                    new_yield_id = getattr(result, "inserted_primary_key", [None])[0]
+                    log_audit("INSERT", "yielddata", user_id=user_id, record_id=new_yield_id)
+                    publish_yield_change(conn, "insert", new_yield_id, user_id, after=after)
                     flash("Yield record added successfully!", "success")
                     return redirect(url_for("main.dashboard"))
 
+            municipalities = _selected_municipality_options(conn, form_data.get("municipality_id"))
+
         for error in errors:
             flash(error, "danger")
 
@@ -321,7 +378,6 @@ def edit_yield(yield_id):
 
         crops = conn.execute(select(crop_master).order_by(crop_master.c.CropName)).mappings().all()
         districts = conn.execute(select(district).order_by(district.c.districtname)).mappings().all()
-        municipalities = conn.execute(select(municipality).order_by(municipality.c.municipalityname)).mappings().all()
         seasons = conn.execute(select(season_master).order_by(season_master.c.seasonname)).mappings().all()
 
         form_data = {
@@ -367,18 +423,34 @@ def edit_yield(yield_id):
                             yieldamount=form_data["yieldamount"],
                             production=form_data["production"],
                             updated_by=user_id,
-                            updated_at=datetime.utcnow(),
+                            updated_at=func.now(),
                         )
                     )
                     conn.execute(stmt)
+                    after = {
+                        "cropid": form_data["crop_id"],
+                        "districtid": form_data["district_id"],
+                        "seasonid": form_data["season_id"],
+                        "year": form_data["year"],
+                        "areaharvested": form_data["areaharvested"],
+                        "yieldamount": form_data["yieldamount"],
+                        "production": form_data["production"],
+                    }
+                    update_yield_sketches(conn, [(yield_record, after)])
                     conn.commit()
+                    note_committed_write()
                     log_audit("UPDATE", "yielddata", user_id=user_id, record_id=yield_id)
+                    publish_yield_change(
+                        conn, "update", yield_id, yield_record.get("created_by"), before=yield_record, after=after
+                    )
                     flash("Yield record updated successfully!", "success")
                     return redirect(url_for("main.dashboard"))
 
                 for err in errors:
                     flash(err, "danger")
 
+        municipalities = _selected_municipality_options(conn, form_data.get("municipality_id"))
+
     return render_template(
         "edit_yield_fixed.html",
         form_data=form_data,
@@ -409,14 +481,94 @@ def delete_yield(yield_id):
 
             stmt = delete(yielddata).where(yielddata.c.yieldid == yield_id)
             conn.execute(stmt)
+            record_tombstone(conn, "yield", yield_id, owner_id=record.get("created_by"), deleted_by=user_id)
+            update_yield_sketches(conn, [(record, None)])
             conn.commit()
+            note_committed_write()
             log_audit("DELETE", "yielddata", user_id=user_id, record_id=yield_id)
+            publish_yield_change(conn, "delete", yield_id, record.get("created_by"), before=record)
             flash("Yield record deleted successfully!", "success")
     except Exception as exc:
         flash(f"Error deleting record: {exc}", "danger")
     return redirect(url_for("main.dashboard"))
 
 
+@main.route("/events/yield")
+@login_required
+def yield_events():
+    """Server-Sent Events stream of yield record deltas.
+
+    Officers and admins receive every change; farmers only changes to their own
+    records. Each stream holds a worker thread, so streams end after
+    ``EVENTS_STREAM_MAX_SECONDS`` and at most ``EVENTS_MAX_STREAMS`` are open per
+    process; browsers reconnect with ``Last-Event-ID`` and replay what they missed.
+    """
+    config = current_app.config
+    owner_id = get_current_user_id() if session.get("role") == ROLE_FARMER else None
+    last_event_id = request.headers.get("Last-Event-ID")
+    keepalive_seconds = config["EVENTS_KEEPALIVE_SECONDS"]
+    max_pending = config["EVENTS_MAX_PENDING"]
+    stream_seconds = config["EVENTS_STREAM_MAX_SECONDS"]
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+    if event_bus.subscriber_count() >= config["EVENTS_MAX_STREAMS"]:
+        # EventSource gives up on error statuses, so ask it to come back later instead.
+        metrics.incr("sse_deferred")
+        return Response("retry: 30000\n\n", mimetype="text/event-stream", headers=headers)
+    start_listening()
+
+    def stream():
+        subscription = event_bus.subscribe(owner_id=owner_id, max_pending=max_pending, last_event_id=last_event_id)
+        metrics.incr("sse_connections")
+        deadline = time.monotonic() + stream_seconds
+        try:
+            yield "retry: 5000\n\n"
+            while time.monotonic() < deadline:
+                if subscription.overflowed:
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                event = subscription.get(timeout=min(keepalive_seconds, max(deadline - time.monotonic(), 0)))
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return Response(stream(), mimetype="text/event-stream", headers=headers)
+
+
+@main.route("/search/municipalities")
+@login_required
+def search_municipalities_api():
+    """Typeahead search over municipality names, optionally limited to one district."""
+    results = search_municipalities(
+        request.args.get("q", ""),
+        district_id=request.args.get("district_id", type=int),
+        limit=_search_limit(),
+    )
+    return jsonify({"results": results})
+
+
+@main.route("/search/districts")
+@login_required
+def search_districts_api():
+    """Typeahead search over district names, optionally limited to one province."""
+    results = search_districts(
+        request.args.get("q", ""),
+        province_id=request.args.get("province_id", type=int),
+        limit=_search_limit(),
+    )
+    return jsonify({"results": results})
+
+
+@main.route("/search/crops")
+@login_required
+def search_crops_api():
+    """Typeahead search over crop names."""
+    return jsonify({"results": search_crops(request.args.get("q", ""), limit=_search_limit())})
+
+
 @main.route("/master/crop")
 @login_required
 @role_required(ROLE_ADMIN)
@@ -427,8 +579,8 @@ def list_crop_master():
             select(crop_master.c.CropId, crop_master.c.CropName, crop_type_master.c.croptypename).join(
                 crop_type_master, crop_master.c.croptypeid == crop_type_master.c.croptypeid
             )
-        ).mappings()
-        crops = [dict(r) for r in result.all()]
+        )
+        crops = records_from_result(result, "CropRecord")
                                                                                 
         columns = ['CropName', 'croptypename'] if crops else []
 
@@ -473,7 +625,10 @@ def add_crop_master():
                 )
                 result = conn.execute(stmt)
                 conn.commit()
+                note_committed_write()
                 log_audit("INSERT", "crop_master", user_id=user_id, record_id=getattr(result, "inserted_primary_key", [None])[0])
+                invalidate_search_indexes("crop")
+                bump_reference_data_version()
                 flash("Crop added successfully!", "success")
                 return redirect(url_for("main.list_crop_master"))
 
@@ -526,11 +681,14 @@ def edit_crop_master(crop_id):
                         CropName=name,
                         croptypeid=croptype_id,
                         updated_by=user_id,
-                        updated_at=datetime.utcnow(),
+                        updated_at=func.now(),
                     )
                 )
                 conn.commit()
+                note_committed_write()
                 log_audit("UPDATE", "crop_master", user_id=user_id, record_id=crop_id)
+                invalidate_search_indexes("crop")
+                bump_reference_data_version()
                 flash("Crop updated successfully!", "success")
                 return redirect(url_for("main.list_crop_master"))
 
@@ -558,8 +716,12 @@ def delete_crop_master(crop_id):
                     flash("Cannot delete crop. It is used in yield records.", "danger")
                 else:
                     conn.execute(delete(crop_master).where(crop_master.c.CropId == crop_id))
+                    record_tombstone(conn, "crop", crop_id, deleted_by=user_id)
                     conn.commit()
+                    note_committed_write()
                     log_audit("DELETE", "crop_master", user_id=user_id, record_id=crop_id)
+                    invalidate_search_indexes("crop")
+                    bump_reference_data_version()
                     flash("Crop deleted successfully!", "success")
     except Exception as exc:
         flash(f"Unable to delete crop: {exc}", "danger")
@@ -602,6 +764,8 @@ def add_crop_type():
                     _sync_crop_type_sequence(conn)
                     conn.execute(insert(crop_type_master).values(croptypename=form_data["croptypename"]))
                     conn.commit()
+                    note_committed_write()
+                    bump_reference_data_version()
                     flash("Crop type added successfully.", "success")
                     return redirect(url_for("main.list_crop_types"))
                 except IntegrityError:
@@ -650,6 +814,8 @@ def edit_crop_type(croptype_id):
                     .values(croptypename=form_data["croptypename"])
                 )
                 conn.commit()
+                note_committed_write()
+                bump_reference_data_version()
                 flash("Crop type updated successfully.", "success")
                 return redirect(url_for("main.list_crop_types"))
 
@@ -670,7 +836,10 @@ def delete_crop_type(croptype_id):
             return redirect(url_for("main.list_crop_types"))
 
         conn.execute(delete(crop_type_master).where(crop_type_master.c.croptypeid == croptype_id))
+        record_tombstone(conn, "crop_type", croptype_id, deleted_by=get_current_user_id())
         conn.commit()
+        note_committed_write()
+        bump_reference_data_version()
         flash("Crop type deleted successfully.", "success")
 
     return redirect(url_for("main.list_crop_types"))
@@ -711,6 +880,8 @@ def add_season():
                     _sync_season_sequence(conn)
                     conn.execute(insert(season_master).values(seasonname=form_data["seasonname"]))
                     conn.commit()
+                    note_committed_write()
+                    bump_reference_data_version()
                     flash("Season added successfully.", "success")
                     return redirect(url_for("main.list_seasons"))
                 except IntegrityError:
@@ -757,6 +928,8 @@ def edit_season(season_id):
                     .values(seasonname=form_data["seasonname"])
                 )
                 conn.commit()
+                note_committed_write()
+                bump_reference_data_version()
                 flash("Season updated successfully.", "success")
                 return redirect(url_for("main.list_seasons"))
 
@@ -777,7 +950,10 @@ def delete_season(season_id):
             return redirect(url_for("main.list_seasons"))
 
         conn.execute(delete(season_master).where(season_master.c.seasonid == season_id))
+        record_tombstone(conn, "season", season_id, deleted_by=get_current_user_id())
         conn.commit()
+        note_committed_write()
+        bump_reference_data_version()
         flash("Season deleted successfully.", "success")
 
     return redirect(url_for("main.list_seasons"))
@@ -839,6 +1015,7 @@ def add_user_admin():
                     )
                 )
                 conn.commit()
+                note_committed_write()
                 flash("User created successfully.", "success")
                 return redirect(url_for("main.list_users"))
 
@@ -899,6 +1076,7 @@ def edit_user_admin(user_id):
                 if not errors:
                     conn.execute(update(users).where(users.c.id == user_id).values(**values))
                     conn.commit()
+                    note_committed_write()
                     flash("User updated successfully.", "success")
                     return redirect(url_for("main.list_users"))
 
@@ -922,11 +1100,20 @@ def delete_user_admin(user_id):
 
         conn.execute(delete(users).where(users.c.id == user_id))
         conn.commit()
+        note_committed_write()
         flash("User deleted successfully.", "success")
 
     return redirect(url_for("main.list_users"))
 
 
+@main.route("/admin/metrics")
+@login_required
+@role_required(ROLE_ADMIN)
+def admin_metrics():
+    """Process-local runtime counters (compression savings, etc.) as JSON."""
+    return jsonify(metrics.snapshot())
+
+
 @main.route("/yield/full_report")
 @login_required
 def full_yield_report():
@@ -936,16 +1123,17 @@ def full_yield_report():
         selected_crop_id = request.args.get("crop_id", type=int)
         selected_district_id = request.args.get("district_id", type=int)
         selected_season_id = request.args.get("season_id", type=int)
-        current_user_role = session.get("role")
-        current_user_id = get_current_user_id()
 
-        with engine.connect() as conn:
-            query = _build_full_report_query(selected_year, selected_crop_id, selected_district_id, selected_season_id)
-            if current_user_role == ROLE_FARMER and current_user_id:
-                owned_ids = select(yielddata.c.yieldid).where(yielddata.c.created_by == current_user_id)
-                query = query.where(yield_full_report.c.yieldid.in_(owned_ids))
-            report_data = conn.execute(query).mappings().all()
-            report_data, columns = _filter_report_columns(report_data)
+        with read_engine.connect() as conn:
+            query, params = build_full_report_query(
+                selected_year,
+                selected_crop_id,
+                selected_district_id,
+                selected_season_id,
+                columns=REPORT_DISPLAY_COLUMNS,
+            )
+            report_data = report_records(conn.execute(query, params))
+            report_data, columns = filter_report_columns(report_data)
 
             crops = conn.execute(select(crop_master).order_by(crop_master.c.CropName)).mappings().all()
             districts = conn.execute(select(district).order_by(district.c.districtname)).mappings().all()
@@ -988,56 +1176,59 @@ def full_yield_report():
 @login_required
 def export_full_report(file_format):
     """Export filtered report to CSV or Excel."""
-    selected_year = request.args.get("year", type=int)
-    selected_crop_id = request.args.get("crop_id", type=int)
-    selected_district_id = request.args.get("district_id", type=int)
-    selected_season_id = request.args.get("season_id", type=int)
-    current_user_role = session.get("role")
-    current_user_id = get_current_user_id()
+    filters = _report_filters(request.args)
+    export_format = EXPORT_FORMATS.get(file_format.lower())
+    if export_format is None:
+        flash("Unsupported export format.", "danger")
+        return redirect(url_for("main.full_yield_report", **filters))
 
-    with engine.connect() as conn:
-        query = _build_full_report_query(selected_year, selected_crop_id, selected_district_id, selected_season_id)
-        if current_user_role == ROLE_FARMER and current_user_id:
-            owned_ids = select(yielddata.c.yieldid).where(yielddata.c.created_by == current_user_id)
-            query = query.where(yield_full_report.c.yieldid.in_(owned_ids))
-        rows = conn.execute(query).mappings().all()
+    with read_engine.connect() as conn:
+        query, params = build_full_report_query(columns=REPORT_DISPLAY_COLUMNS, **filters)
+        rows = report_records(conn.execute(query, params))
 
     if not rows:
         flash("No data to export for current filters.", "danger")
-        return redirect(url_for("main.full_yield_report", year=selected_year, crop_id=selected_crop_id, district_id=selected_district_id, season_id=selected_season_id))
-
-    rows, columns = _filter_report_columns(rows)
-
-    if file_format.lower() == "csv":
-        output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=columns)
-        writer.writeheader()
-        for row in rows:
-            writer.writerow({column: row[column] for column in columns})
-        csv_data = output.getvalue()
-        return Response(
-            csv_data,
-            mimetype="text/csv",
-            headers={"Content-Disposition": "attachment; filename=yield_report.csv"},
-        )
+        return redirect(url_for("main.full_yield_report", **filters))
+
+    rows, columns = filter_report_columns(rows)
+    output = BytesIO()
+    export_format["writer"](rows, columns, output)
+    output.seek(0)
+    return send_file(
+        output,
+        as_attachment=True,
+        download_name=f"yield_report.{export_format['extension']}",
+        mimetype=export_format["mimetype"],
+    )
 
-    if file_format.lower() == "excel":
-        workbook = Workbook()
-        worksheet = workbook.active
-        worksheet.title = "Yield Report"
-        worksheet.append(columns)
-        for row in rows:
-            worksheet.append([row[column] for column in columns])
-
-        output = BytesIO()
-        workbook.save(output)
-        output.seek(0)
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name="yield_report.xlsx",
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
 
-    flash("Unsupported export format.", "danger")
-    return redirect(url_for("main.full_yield_report", year=selected_year, crop_id=selected_crop_id, district_id=selected_district_id, season_id=selected_season_id))
+@main.route("/yield/full_report/export/<string:file_format>/jobs", methods=["POST"])
+@login_required
+def submit_export_job(file_format):
+    """Queue a background export; identical pending exports share one job."""
+    try:
+        job = submit_export(_export_scope(), _report_filters(request.form), file_format.lower())
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    except Exception as exc:
+        return jsonify({"error": f"Unable to queue export: {exc}"}), 500
+    return jsonify(_export_job_payload(job)), 202
+
+
+@main.route("/yield/full_report/export/jobs/<string:job_id>")
+@login_required
+def export_job_status(job_id):
+    job = get_export_job(job_id)
+    if job is None or job["scope"] != _export_scope():
+        return jsonify({"error": "Export job not found."}), 404
+    return jsonify(_export_job_payload(job))
+
+
+@main.route("/yield/full_report/export/download/<string:token>")
+@login_required
+def download_export(token):
+    path, job = open_download(token, _export_scope())
+    if path is None:
+        flash("Export link is invalid or has expired.", "danger")
+        return redirect(url_for("main.full_yield_report"))
+    return send_file(path, as_attachment=True, download_name=download_name(job), mimetype=download_mimetype(job))
@@ -0,0 +1,183 @@
+"""Outlier detection for yield records, vectorized across all groups at once.
+
+Records are grouped by (crop, district, season) across years. For each metric
+the rows are sorted once by (group, value) so every group's median/quartiles
+come from index arithmetic on the sorted array instead of a Python loop.
+NumPy is imported lazily so the web app does not pay for it at startup.
+"""
+from sqlalchemy import select
+
+from models import read_engine, yielddata
+
+
+METHOD_ROBUST_Z = "robust_z"
+METHOD_IQR = "iqr"
+DEFAULT_THRESHOLDS = {METHOD_ROBUST_Z: 3.5, METHOD_IQR: 1.5}
+METRICS = ("yieldamount", "production", "yield_ratio")
+MIN_GROUP_SIZE = 4
+LOAD_CHUNK_ROWS = 50000
+
+_COLUMNS = ("yieldid", "cropid", "districtid", "seasonid", "year", "yieldamount", "production", "areaharvested")
+
+
+def load_yield_arrays(created_by=None):
+    """Stream yielddata into column arrays without materializing row objects."""
+    import numpy as np
+
+    query = select(*(yielddata.c[name] for name in _COLUMNS)).order_by(yielddata.c.yieldid)
+    if created_by is not None:
+        query = query.where(yielddata.c.created_by == created_by)
+
+    chunks = []
+    with read_engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=LOAD_CHUNK_ROWS).execute(query)
+        for partition in result.partitions():
+            chunks.append(np.array(partition, dtype=float).reshape(-1, len(_COLUMNS)))
+
+    matrix = np.concatenate(chunks) if chunks else np.empty((0, len(_COLUMNS)))
+    arrays = {name: matrix[:, index] for index, name in enumerate(_COLUMNS)}
+    for name in ("yieldid", "cropid", "districtid", "year"):
+        arrays[name] = arrays[name].astype(np.int64)
+    arrays["seasonid"] = np.nan_to_num(arrays["seasonid"], nan=-1).astype(np.int64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        arrays["yield_ratio"] = np.where(arrays["areaharvested"] > 0, arrays["production"] / arrays["areaharvested"], np.nan)
+    return arrays
+
+
+def _group_index(arrays):
+    import numpy as np
+
+    # Pack the three ids into one int64 key; a 1-D unique is far cheaper than
+    # np.unique(axis=0) over a stacked (n, 3) array.
+    districts = int(arrays["districtid"].max()) + 1
+    seasons = int(arrays["seasonid"].max()) + 2
+    keys = (arrays["cropid"] * districts + arrays["districtid"]) * seasons + arrays["seasonid"] + 1
+    _unique, inverse = np.unique(keys, return_inverse=True)
+    return inverse.reshape(-1)
+
+
+def _sorted_quantiles(groups, values, quantiles):
+    """Per-group linear-interpolated quantiles of ``values``.
+
+    ``groups`` must be non-negative ints. Returns ``(counts, {q: per-group array})``.
+    """
+    import numpy as np
+
+    order = np.argsort(values)
+    order = order[np.argsort(groups[order], kind="stable")]
+    sorted_values = values[order]
+    counts = np.bincount(groups, minlength=groups.max() + 1 if groups.size else 0)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1])) if counts.size else counts
+    result = {}
+    for q in quantiles:
+        position = starts + q * np.maximum(counts - 1, 0)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        valid = counts > 0
+        lower = np.where(valid, lower, 0)
+        upper = np.where(valid, upper, 0)
+        if sorted_values.size:
+            fraction = position - np.floor(position)
+            result[q] = np.where(valid, sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction, np.nan)
+        else:
+            result[q] = np.full(counts.shape, np.nan)
+    return counts, result
+
+
+def _score_metric(groups, values, method, threshold):
+    """Return ``(flagged_mask, score, center)`` aligned with ``values``; NaNs never flag."""
+    import numpy as np
+
+    valid = ~np.isnan(values)
+    flagged = np.zeros(values.shape, dtype=bool)
+    score = np.full(values.shape, np.nan)
+    center = np.full(values.shape, np.nan)
+    if not valid.any():
+        return flagged, score, center
+
+    group_ids = groups[valid]
+    metric = values[valid]
+    counts, quantiles = _sorted_quantiles(group_ids, metric, (0.25, 0.5, 0.75))
+    median = quantiles[0.5][group_ids]
+    large_enough = counts[group_ids] >= MIN_GROUP_SIZE
+
+    if method == METHOD_IQR:
+        q1 = quantiles[0.25][group_ids]
+        q3 = quantiles[0.75][group_ids]
+        spread = q3 - q1
+        with np.errstate(divide="ignore", invalid="ignore"):
+            distance = np.where(metric < q1, q1 - metric, np.where(metric > q3, metric - q3, 0.0))
+            row_score = np.where(spread > 0, distance / spread, 0.0)
+    else:
+        deviation = np.abs(metric - median)
+        _counts, mad_quantiles = _sorted_quantiles(group_ids, deviation, (0.5,))
+        mad = mad_quantiles[0.5][group_ids]
+        mean_ad = np.bincount(group_ids, weights=deviation, minlength=counts.size)[group_ids] / counts[group_ids]
+        # MAD is zero when most of a group repeats one value; fall back to the
+        # mean absolute deviation scaled to the same normal-consistent units.
+        scale = np.where(mad > 0, mad / 0.6745, mean_ad * 1.2533)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            row_score = np.where(scale > 0, (metric - median) / scale, 0.0)
+
+    flagged[valid] = large_enough & (np.abs(row_score) > threshold)
+    score[valid] = row_score
+    center[valid] = median
+    return flagged, score, center
+
+
+def detect_outliers(arrays, method=METHOD_ROBUST_Z, threshold=None):
+    """Flag yield records whose metrics are extreme within their group.
+
+    Returns one entry per flagged yieldid with the offending metrics, their
+    values, the group median and the score (robust z, or distance beyond the
+    quartiles in IQRs).
+    """
+    import numpy as np
+
+    if method not in DEFAULT_THRESHOLDS:
+        raise ValueError(f"Unknown method: {method}")
+    threshold = DEFAULT_THRESHOLDS[method] if threshold is None else float(threshold)
+    if arrays["yieldid"].size == 0:
+        return []
+
+    groups = _group_index(arrays)
+    per_metric = {metric: _score_metric(groups, arrays[metric], method, threshold) for metric in METRICS}
+    any_flagged = np.zeros(groups.shape, dtype=bool)
+    for flagged, _score, _center in per_metric.values():
+        any_flagged |= flagged
+
+    outliers = []
+    for row in np.flatnonzero(any_flagged):
+        outliers.append(
+            {
+                "yieldid": int(arrays["yieldid"][row]),
+                "cropid": int(arrays["cropid"][row]),
+                "districtid": int(arrays["districtid"][row]),
+                "seasonid": None if arrays["seasonid"][row] < 0 else int(arrays["seasonid"][row]),
+                "year": int(arrays["year"][row]),
+                "metrics": {
+                    metric: {
+                        "value": float(arrays[metric][row]),
+                        "median": float(center[row]),
+                        "score": round(float(score[row]), 3),
+                    }
+                    for metric, (flagged, score, center) in per_metric.items()
+                    if flagged[row]
+                },
+            }
+        )
+    return outliers
+
+
+def find_yield_outliers(created_by=None, method=METHOD_ROBUST_Z, threshold=None):
+    """Load the (optionally per-farmer) yield data and return flagged records."""
+    return detect_outliers(load_yield_arrays(created_by), method=method, threshold=threshold)
+
+
+def rank_outliers(outliers):
+    """Most extreme first, by the largest absolute score across flagged metrics."""
+    return sorted(
+        outliers,
+        key=lambda item: max(abs(metric["score"]) for metric in item["metrics"].values()),
+        reverse=True,
+    )
@@ -1,5 +1,6 @@
 from datetime import datetime
-import bcrypt
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeTimedSerializer
 from sqlalchemy import select, update
 
 from models import engine, users
@@ -9,16 +10,23 @@ ROLE_FARMER = "Farmer"
 ROLE_OFFICER = "Officer"
 ROLE_ADMIN = "Admin"
 
+API_TOKEN_SALT = "api-token"
+
 
 
 
 def hash_password(password: str) -> str:
+    import bcrypt
+
     return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
 
 
 def verify_password(password: str, password_hash: str) -> bool:
     if not password_hash:
         return False
+
+    import bcrypt
+
     return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
 
 
@@ -45,3 +53,20 @@ def update_user_last_seen(user_id: int):
             .values(updated_at=datetime.utcnow())
         )
         conn.commit()
+
+
+def _api_token_serializer():
+    return URLSafeTimedSerializer(current_app.config["SECRET_KEY"], salt=API_TOKEN_SALT)
+
+
+def generate_api_token(user_id: int) -> str:
+    return _api_token_serializer().dumps({"uid": user_id})
+
+
+def load_api_token(token: str) -> int | None:
+    """Return the user id a bearer token was issued to, or None if invalid/expired."""
+    try:
+        payload = _api_token_serializer().loads(token, max_age=current_app.config["API_TOKEN_MAX_AGE_SECONDS"])
+    except BadSignature:
+        return None
+    return payload.get("uid")
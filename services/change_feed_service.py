@@ -0,0 +1,146 @@
+"""Incremental change feed over ``updated_at`` watermarks plus delete tombstones.
+
+Upserts and deletes are paged independently, each by its own ``(timestamp, id)``
+keyset, and merged by timestamp. Rows younger than ``CHANGE_FEED_LAG_SECONDS``
+are held back so a transaction that commits after a later one (with an earlier
+``now()``) is not skipped by the watermark.
+"""
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import and_, func, insert, or_, select
+
+from config import Config
+from models import engine, read_engine, change_tombstones, crop_master, crop_type_master, season_master, yielddata
+from utils.cursors import decode_cursor, encode_cursor
+
+
+FEED_ENTITIES = {
+    "yield": {"table": yielddata, "id": yielddata.c.yieldid, "updated_at": yielddata.c.updated_at, "owner": yielddata.c.created_by},
+    "crop": {"table": crop_master, "id": crop_master.c.CropId, "updated_at": crop_master.c.updated_at, "owner": None},
+    # No updated_at on these masters, so the feed only carries their deletes.
+    "crop_type": {"table": crop_type_master, "id": crop_type_master.c.croptypeid, "updated_at": None, "owner": None},
+    "season": {"table": season_master, "id": season_master.c.seasonid, "updated_at": None, "owner": None},
+}
+
+
+def _setting(name):
+    if has_app_context():
+        return current_app.config.get(name, getattr(Config, name))
+    return getattr(Config, name)
+
+
+def record_tombstone(conn, entity, entity_id, owner_id=None, deleted_by=None):
+    """Record a delete in the caller's transaction so the feed can replay it."""
+    conn.execute(
+        insert(change_tombstones).values(entity=entity, entity_id=entity_id, owner_id=owner_id, deleted_by=deleted_by)
+    )
+
+
+def get_change_watermark():
+    """Cheap fingerprint of yield and crop changes, for keying caches across workers.
+
+    The latest yield ``updated_at``, yield tombstone and crop ``updated_at`` are
+    each one backward index scan, so unlike a row count this never reads the
+    table. A write that commits with an older timestamp than one already seen
+    does not move the watermark, so caches keyed on it still need a TTL.
+    """
+    latest_yield = select(func.max(yielddata.c.updated_at)).scalar_subquery()
+    latest_delete = (
+        select(func.max(change_tombstones.c.deleted_at)).where(change_tombstones.c.entity == "yield").scalar_subquery()
+    )
+    latest_crop = select(func.max(crop_master.c.updated_at)).scalar_subquery()
+    with read_engine.connect() as conn:
+        watermark = conn.execute(select(latest_yield, latest_delete, latest_crop)).one()
+    return ":".join(str(value) for value in watermark)
+
+
+def _after(timestamp_column, id_column, watermark):
+    if watermark is None:
+        return None
+    timestamp, last_id = watermark
+    return or_(timestamp_column > timestamp, and_(timestamp_column == timestamp, id_column > last_id))
+
+
+def _parse_watermark(value):
+    if value is None:
+        return None
+    timestamp, last_id = value
+    return datetime.fromisoformat(timestamp), int(last_id)
+
+
+def parse_feed_cursor(cursor=None, since=None):
+    """Turn a feed cursor (or an ISO ``since`` timestamp) into upsert/delete watermarks."""
+    if cursor:
+        position = decode_cursor(cursor)
+        try:
+            return _parse_watermark(position.get("u")), _parse_watermark(position.get("d"))
+        except (AttributeError, TypeError, ValueError):
+            raise ValueError("Invalid cursor.") from None
+    if since:
+        start = (datetime.fromisoformat(since), 0)
+        return start, start
+    return None, None
+
+
+def _jsonable(row):
+    return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in row.items()}
+
+
+def _serialize_watermark(watermark):
+    return [watermark[0].isoformat(), watermark[1]] if watermark else None
+
+
+def get_changes(entity, cursor=None, since=None, limit=1000, owner_id=None):
+    """Return up to ``limit`` upserts and ``limit`` deletes after the cursor.
+
+    ``owner_id`` restricts yield changes to one farmer's records. The returned
+    ``next_cursor`` always advances past everything returned; ``has_more`` says
+    whether another call would return more right now.
+    """
+    spec = FEED_ENTITIES.get(entity)
+    if spec is None:
+        raise ValueError(f"Unknown entity: {entity}")
+    upsert_mark, delete_mark = parse_feed_cursor(cursor, since)
+    horizon = func.now() - timedelta(seconds=_setting("CHANGE_FEED_LAG_SECONDS"))
+
+    with engine.connect() as conn:
+        upserts = []
+        if spec["updated_at"] is not None:
+            query = select(spec["table"]).where(spec["updated_at"] < horizon)
+            after = _after(spec["updated_at"], spec["id"], upsert_mark)
+            if after is not None:
+                query = query.where(after)
+            if owner_id is not None and spec["owner"] is not None:
+                query = query.where(spec["owner"] == owner_id)
+            upserts = conn.execute(query.order_by(spec["updated_at"], spec["id"]).limit(limit)).mappings().all()
+
+        tombstones = change_tombstones.c
+        query = select(change_tombstones).where(tombstones.entity == entity, tombstones.deleted_at < horizon)
+        after = _after(tombstones.deleted_at, tombstones.id, delete_mark)
+        if after is not None:
+            query = query.where(after)
+        if owner_id is not None and spec["owner"] is not None:
+            query = query.where(tombstones.owner_id == owner_id)
+        deletes = conn.execute(query.order_by(tombstones.deleted_at, tombstones.id).limit(limit)).mappings().all()
+
+    id_key = spec["id"].key
+    changes = [
+        {"op": "upsert", "id": row[id_key], "at": row[spec["updated_at"].key], "record": _jsonable(row)}
+        for row in upserts
+    ]
+    changes.extend({"op": "delete", "id": row["entity_id"], "at": row["deleted_at"]} for row in deletes)
+    changes.sort(key=lambda change: change["at"])
+    for change in changes:
+        change["at"] = change["at"].isoformat()
+
+    if upserts:
+        upsert_mark = (upserts[-1][spec["updated_at"].key], upserts[-1][id_key])
+    if deletes:
+        delete_mark = (deletes[-1]["deleted_at"], deletes[-1]["id"])
+    return {
+        "entity": entity,
+        "changes": changes,
+        "next_cursor": encode_cursor({"u": _serialize_watermark(upsert_mark), "d": _serialize_watermark(delete_mark)}),
+        "has_more": len(upserts) == limit or len(deletes) == limit,
+    }
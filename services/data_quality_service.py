@@ -0,0 +1,204 @@
+"""Streaming integrity scan over yielddata.
+
+The table is read in yieldid order through a server-side cursor, ``chunk_size``
+rows at a time, and each chunk is checked with vectorized NumPy rules:
+
+* ``production_mismatch`` - production is not yieldamount x areaharvested
+  (within ``tolerance``, relative).
+* ``municipality_district`` - the municipality belongs to another district.
+* ``duplicate_entry`` - more than one row for the same crop, season, year,
+  municipality and farmer (counted per row through ``ix_yielddata_duplicate_key``).
+
+Violations are appended to a CSV report. After each chunk the last yieldid and
+the report size are checkpointed, so an interrupted scan resumes where it
+stopped without duplicating report lines.
+"""
+import csv
+import json
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import func, select, true
+
+from models import read_engine, municipality, yielddata
+
+
+RULE_PRODUCTION = "production_mismatch"
+RULE_MUNICIPALITY = "municipality_district"
+RULE_DUPLICATE = "duplicate_entry"
+
+REPORT_FIELDS = ["yieldid", "rule", "detail", "cropid", "districtid", "municipalityid", "seasonid", "year", "created_by"]
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_TOLERANCE = 0.05
+
+def _scan_query(after_id):
+    # Only rows after the checkpoint are read, in yieldid order, so the scan
+    # streams and resumes cheaply. Duplicates are counted per row by an index
+    # probe over the same key (table-wide, so a resumed scan still sees rows
+    # before the checkpoint); the rank counts those with a smaller yieldid.
+    other = yielddata.alias("duplicate")
+    duplicates = (
+        select(
+            func.count().label("duplicate_count"),
+            func.count().filter(other.c.yieldid <= yielddata.c.yieldid).label("duplicate_rank"),
+        )
+        .where(
+            other.c.cropid == yielddata.c.cropid,
+            other.c.year == yielddata.c.year,
+            other.c.municipalityid == yielddata.c.municipalityid,
+            other.c.seasonid.is_not_distinct_from(yielddata.c.seasonid),
+            other.c.created_by.is_not_distinct_from(yielddata.c.created_by),
+        )
+        .lateral("duplicates")
+    )
+    return (
+        select(
+            yielddata.c.yieldid,
+            yielddata.c.cropid,
+            yielddata.c.districtid,
+            yielddata.c.municipalityid,
+            yielddata.c.seasonid,
+            yielddata.c.year,
+            yielddata.c.created_by,
+            yielddata.c.yieldamount,
+            yielddata.c.areaharvested,
+            yielddata.c.production,
+            municipality.c.districtid.label("municipality_districtid"),
+            duplicates.c.duplicate_count,
+            duplicates.c.duplicate_rank,
+        )
+        .select_from(
+            yielddata.outerjoin(municipality, yielddata.c.municipalityid == municipality.c.municipalityid).join(
+                duplicates, true()
+            )
+        )
+        .where(yielddata.c.yieldid > after_id)
+        .order_by(yielddata.c.yieldid)
+    )
+
+
+def check_chunk(rows, tolerance=DEFAULT_TOLERANCE):
+    """Apply every rule to one chunk of scan rows; returns report dicts."""
+    import numpy as np
+
+    if not rows:
+        return []
+    columns = {key: [row[key] for row in rows] for key in rows[0].keys()}
+    yield_amount = np.array(columns["yieldamount"], dtype=float)
+    area = np.array(columns["areaharvested"], dtype=float)
+    production = np.array(columns["production"], dtype=float)
+    district_ids = np.array(columns["districtid"], dtype=float)
+    municipality_districts = np.array(columns["municipality_districtid"], dtype=float)
+    duplicate_count = np.array(columns["duplicate_count"], dtype=np.int64)
+    duplicate_rank = np.array(columns["duplicate_rank"], dtype=np.int64)
+
+    expected = yield_amount * area
+    mismatch = np.abs(production - expected) > tolerance * np.maximum(np.abs(expected), 1e-9)
+    wrong_district = np.isnan(municipality_districts) | (municipality_districts != district_ids)
+    duplicated = duplicate_count > 1
+
+    violations = []
+
+    def add(mask, rule, detail):
+        for index in np.flatnonzero(mask):
+            violations.append(
+                {
+                    **{field: columns[field][index] for field in REPORT_FIELDS if field in columns},
+                    "rule": rule,
+                    "detail": detail(index),
+                }
+            )
+
+    add(mismatch, RULE_PRODUCTION, lambda i: f"production {production[i]:g} vs yield x area {expected[i]:g}")
+    add(
+        wrong_district,
+        RULE_MUNICIPALITY,
+        lambda i: "municipality not found"
+        if np.isnan(municipality_districts[i])
+        else f"municipality is in district {int(municipality_districts[i])}, record says {int(district_ids[i])}",
+    )
+    add(duplicated, RULE_DUPLICATE, lambda i: f"entry {duplicate_rank[i]} of {duplicate_count[i]}")
+    violations.sort(key=lambda item: item["yieldid"])
+    return violations
+
+
+def _read_checkpoint(checkpoint_path):
+    try:
+        with open(checkpoint_path, encoding="utf-8") as checkpoint_file:
+            return json.load(checkpoint_file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_checkpoint(checkpoint_path, state):
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as checkpoint_file:
+        json.dump(state, checkpoint_file, indent=2)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def scan_yield_quality(
+    report_path,
+    checkpoint_path,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    tolerance=DEFAULT_TOLERANCE,
+    restart=False,
+    pause_seconds=0.0,
+    max_chunks=None,
+):
+    """Scan yielddata (resuming from ``checkpoint_path`` unless ``restart``).
+
+    ``pause_seconds`` sleeps between chunks to keep load low during business
+    hours; ``max_chunks`` stops early (the next call resumes). Returns the final
+    checkpoint state.
+    """
+    state = None if restart else _read_checkpoint(checkpoint_path)
+    if state is None or state.get("report") != os.path.abspath(report_path):
+        state = {
+            "report": os.path.abspath(report_path),
+            "last_yieldid": 0,
+            "report_bytes": 0,
+            "rows_scanned": 0,
+            "violations": {},
+            "started_at": datetime.utcnow().isoformat(),
+            "finished_at": None,
+        }
+    elif state.get("finished_at"):
+        return state
+
+    for directory in {os.path.dirname(os.path.abspath(path)) for path in (report_path, checkpoint_path)}:
+        os.makedirs(directory, exist_ok=True)
+
+    chunks = 0
+    with open(report_path, "a+", newline="", encoding="utf-8") as report:
+        # Drop lines written after the last checkpoint by an interrupted run.
+        report.truncate(state["report_bytes"])
+        report.seek(state["report_bytes"])
+        writer = csv.DictWriter(report, fieldnames=REPORT_FIELDS)
+        if state["report_bytes"] == 0:
+            writer.writeheader()
+
+        with read_engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(
+                _scan_query(state["last_yieldid"])
+            )
+            for partition in result.mappings().partitions(chunk_size):
+                for violation in check_chunk(partition, tolerance):
+                    writer.writerow(violation)
+                    state["violations"][violation["rule"]] = state["violations"].get(violation["rule"], 0) + 1
+                report.flush()
+                state["last_yieldid"] = partition[-1]["yieldid"]
+                state["rows_scanned"] += len(partition)
+                state["report_bytes"] = report.tell()
+                _write_checkpoint(checkpoint_path, state)
+
+                chunks += 1
+                if max_chunks is not None and chunks >= max_chunks:
+                    return state
+                if pause_seconds:
+                    time.sleep(pause_seconds)
+
+    state["finished_at"] = datetime.utcnow().isoformat()
+    _write_checkpoint(checkpoint_path, state)
+    return state
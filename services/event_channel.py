@@ -0,0 +1,149 @@
+"""Cross-process delivery of live-update events over PostgreSQL LISTEN/NOTIFY.
+
+Writers send each event with ``pg_notify``; every web worker process runs one
+listener thread on a dedicated connection that feeds the notifications into its
+process-local :data:`utils.event_bus.event_bus`. PostgreSQL delivers
+notifications in commit order to every listener, so all processes see the same
+sequence of event ids and a browser can reconnect to any worker with
+``Last-Event-ID``. ``EVENTS_CHANNEL=local`` skips the database and publishes
+in-process (single-process development and tests).
+"""
+import json
+import logging
+import os
+import select
+import threading
+import uuid
+
+from flask import current_app, has_app_context
+from sqlalchemy import ARRAY, Text, bindparam, func
+from sqlalchemy import select as sql_select
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import Config
+from models import engine
+from utils.event_bus import event_bus
+
+
+CHANNEL_LOCAL = "local"
+CHANNEL_POSTGRES = "postgres"
+EVENT_CHANNELS = (CHANNEL_LOCAL, CHANNEL_POSTGRES)
+NOTIFY_CHANNEL = "yield_events"
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name):
+    if has_app_context():
+        return current_app.config.get(name, getattr(Config, name))
+    return getattr(Config, name)
+
+
+def _notify_statement():
+    payloads = func.unnest(bindparam("payloads", type_=ARRAY(Text))).table_valued("payload")
+    return sql_select(func.pg_notify(NOTIFY_CHANNEL, payloads.c.payload)).select_from(payloads)
+
+
+def publish_events(conn, events):
+    """Publish ``(event_type, owner_id, data)`` tuples to every web worker.
+
+    Call after the write has committed: the notifications go out in their own
+    short transaction on ``conn``, which is committed here. Live updates are
+    best effort, so a failure is logged rather than failing the write request.
+    """
+    if not events:
+        return
+    if _setting("EVENTS_CHANNEL") == CHANNEL_LOCAL:
+        for event_type, owner_id, data in events:
+            event_bus.publish(event_type, owner_id, data)
+        return
+    payloads = [
+        json.dumps({"id": uuid.uuid4().hex, "type": event_type, "owner_id": owner_id, "data": data})
+        for event_type, owner_id, data in events
+    ]
+    try:
+        conn.execute(_notify_statement(), {"payloads": payloads})
+        conn.commit()
+    except SQLAlchemyError:
+        logger.exception("Could not publish %d live-update events", len(payloads))
+        conn.rollback()
+
+
+class NotificationListener:
+    """Background thread that republishes NOTIFY payloads on a local event bus.
+
+    The connection is detached from the pool so it never takes a request's
+    slot. If it drops, notifications sent meanwhile are lost, so subscribers
+    are told to resync before the listener reconnects.
+    """
+
+    def __init__(self, bus, channel=NOTIFY_CHANNEL, reconnect_seconds=5.0, poll_seconds=5.0):
+        self.bus = bus
+        self.channel = channel
+        self.reconnect_seconds = reconnect_seconds
+        self.poll_seconds = poll_seconds
+        self.listening = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self, wait_seconds=2.0):
+        """Start the thread once per process and wait briefly until it is listening."""
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._stop.clear()
+                self.listening.clear()
+                self._thread = threading.Thread(target=self._run, name="event-listener", daemon=True)
+                self._thread.start()
+        return self.listening.wait(wait_seconds)
+
+    def stop(self):
+        self._stop.set()
+
+    def deliver(self, payload):
+        try:
+            event = json.loads(payload)
+            self.bus.publish(event["type"], event["owner_id"], event["data"], event_id=event["id"])
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed event notification: %.200s", payload)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("Event listener connection failed; retrying in %ss", self.reconnect_seconds)
+            if self.listening.is_set():
+                self.listening.clear()
+                self.bus.interrupt()
+            self._stop.wait(self.reconnect_seconds)
+
+    def _listen(self):
+        connection = engine.get().raw_connection()
+        connection.detach()
+        dbapi_connection = connection.dbapi_connection
+        try:
+            dbapi_connection.autocommit = True
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.channel}")
+            self.listening.set()
+            while not self._stop.is_set():
+                readable, _, _ = select.select([dbapi_connection], [], [], self.poll_seconds)
+                if not readable:
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    self.deliver(dbapi_connection.notifies.pop(0).payload)
+        finally:
+            connection.close()
+
+
+listener = NotificationListener(event_bus)
+
+
+def start_listening():
+    """Make sure this process receives events from every worker (no-op for the local channel)."""
+    if _setting("EVENTS_CHANNEL") == CHANNEL_POSTGRES:
+        listener.ensure_started()
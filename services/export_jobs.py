@@ -0,0 +1,348 @@
+"""Background report exports spooled to disk.
+
+Job state lives next to the spooled file as ``<job_id>.json`` so every web
+worker process can answer status polls and serve downloads. Job ids are derived
+from the export scope, filters, format and data version, which makes identical
+concurrent requests land on the same job.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, has_app_context
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import func, select
+
+from config import Config
+from models import crop_master, read_engine, yielddata
+from services.export_service import EXPORT_FORMATS, REPORT_DISPLAY_COLUMNS, build_full_report_query, report_columns
+from utils.metrics import metrics
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+TOKEN_SALT = "report-export-download"
+STREAM_CHUNK_ROWS = 2000
+
+_executor = None
+_executor_lock = threading.Lock()
+_spool_lock = threading.Lock()
+# job_id -> spool dir for jobs this process has queued or is running.
+_owned_jobs = {}
+_heartbeat_thread = None
+
+
+def _setting(name):
+    if has_app_context():
+        return current_app.config.get(name, getattr(Config, name))
+    return getattr(Config, name)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_setting("EXPORT_WORKERS"),
+                    thread_name_prefix="report-export",
+                )
+    return _executor
+
+
+def _heartbeat(interval):
+    while True:
+        time.sleep(interval)
+        for job_id, spool_dir in list(_owned_jobs.items()):
+            try:
+                os.utime(_lock_path(spool_dir, job_id))
+            except FileNotFoundError:
+                pass
+
+
+def _own_job(spool_dir, job_id):
+    """Keep the job's lock fresh while this process has it queued or running."""
+    global _heartbeat_thread
+    _owned_jobs[job_id] = spool_dir
+    with _executor_lock:
+        if _heartbeat_thread is None or not _heartbeat_thread.is_alive():
+            _heartbeat_thread = threading.Thread(
+                target=_heartbeat, args=(_setting("EXPORT_HEARTBEAT_SECONDS"),), name="report-export-heartbeat", daemon=True
+            )
+            _heartbeat_thread.start()
+
+
+def _spool_dir():
+    path = _setting("EXPORT_SPOOL_DIR")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _meta_path(spool_dir, job_id):
+    return os.path.join(spool_dir, f"{job_id}.json")
+
+
+def _lock_path(spool_dir, job_id):
+    return os.path.join(spool_dir, f"{job_id}.lock")
+
+
+def _data_path(spool_dir, job):
+    return os.path.join(spool_dir, f"{job['job_id']}.{EXPORT_FORMATS[job['format']]['extension']}")
+
+
+def _read_meta(spool_dir, job_id):
+    try:
+        with open(_meta_path(spool_dir, job_id), encoding="utf-8") as meta_file:
+            return json.load(meta_file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(spool_dir, job):
+    job["updated_at"] = time.time()
+    tmp_path = _meta_path(spool_dir, job["job_id"]) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as meta_file:
+        json.dump(job, meta_file)
+    os.replace(tmp_path, _meta_path(spool_dir, job["job_id"]))
+
+
+def _remove_job(spool_dir, job):
+    for path in (_data_path(spool_dir, job), _meta_path(spool_dir, job["job_id"]), _lock_path(spool_dir, job["job_id"])):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def get_data_version(owner_id=None):
+    """Cheap fingerprint of the rows an export would read.
+
+    Row count plus the latest ``updated_at`` catches inserts, edits and deletes;
+    the crop master timestamp covers renamed crops shown in the report.
+    """
+    yield_query = select(func.count(yielddata.c.yieldid), func.max(yielddata.c.updated_at))
+    if owner_id is not None:
+        yield_query = yield_query.where(yielddata.c.created_by == owner_id)
+
+    with read_engine.connect() as conn:
+        row_count, last_update = conn.execute(yield_query).one()
+        crops_updated = conn.execute(select(func.max(crop_master.c.updated_at))).scalar()
+    return f"{row_count}:{last_update}:{crops_updated}"
+
+
+def make_job_id(scope, filters, file_format, data_version):
+    key = json.dumps(
+        {"scope": scope, "filters": filters, "format": file_format, "version": data_version},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def _is_stale(spool_dir, job):
+    """A queued or running job is stale once its owner stops refreshing the lock.
+
+    Jobs can run, or wait behind ``EXPORT_WORKERS``, for any length of time;
+    only a lock that is missing or older than ``EXPORT_JOB_TIMEOUT_SECONDS``
+    means the owning process is gone.
+    """
+    if job["status"] not in (JOB_QUEUED, JOB_RUNNING):
+        return False
+    try:
+        age = time.time() - os.path.getmtime(_lock_path(spool_dir, job["job_id"]))
+    except FileNotFoundError:
+        return True
+    return age > _setting("EXPORT_JOB_TIMEOUT_SECONDS")
+
+
+def expire_jobs(spool_dir=None):
+    """Drop jobs idle past the TTL, then evict least recently used files over the cap."""
+    spool_dir = spool_dir or _spool_dir()
+    ttl = _setting("EXPORT_JOB_TTL_SECONDS")
+    max_files = _setting("EXPORT_SPOOL_MAX_FILES")
+    now = time.time()
+
+    with _spool_lock:
+        finished = []
+        for name in os.listdir(spool_dir):
+            if not name.endswith(".json"):
+                continue
+            job = _read_meta(spool_dir, name[:-len(".json")])
+            if job is None or job["status"] not in (JOB_DONE, JOB_FAILED):
+                continue
+            if now - job["accessed_at"] > ttl:
+                _remove_job(spool_dir, job)
+                metrics.incr("export_jobs_expired", reason="ttl")
+            else:
+                finished.append(job)
+
+        finished.sort(key=lambda item: item["accessed_at"])
+        for job in finished[:max(len(finished) - max_files, 0)]:
+            _remove_job(spool_dir, job)
+            metrics.incr("export_jobs_expired", reason="lru")
+
+
+def _run_job(spool_dir, job, query, params):
+    job["status"] = JOB_RUNNING
+    _write_meta(spool_dir, job)
+    data_path = _data_path(spool_dir, job)
+    tmp_path = data_path + ".part"
+    started = time.monotonic()
+    try:
+        with read_engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=STREAM_CHUNK_ROWS).execute(query, params).mappings()
+            columns = report_columns(list(result.keys()))
+            counter = {"rows": 0}
+
+            def counted(rows):
+                for row in rows:
+                    counter["rows"] += 1
+                    yield row
+
+            with open(tmp_path, "wb") as target:
+                EXPORT_FORMATS[job["format"]]["writer"](counted(result), columns, target)
+        os.replace(tmp_path, data_path)
+        job.update(status=JOB_DONE, rows=counter["rows"], finished_at=time.time(), accessed_at=time.time())
+        metrics.incr("export_jobs_finished", format=job["format"])
+    except Exception as exc:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        job.update(status=JOB_FAILED, error=str(exc), finished_at=time.time(), accessed_at=time.time())
+        metrics.incr("export_jobs_failed", format=job["format"])
+    finally:
+        metrics.incr("export_job_seconds", time.monotonic() - started, format=job["format"])
+        _write_meta(spool_dir, job)
+        _owned_jobs.pop(job["job_id"], None)
+        try:
+            os.remove(_lock_path(spool_dir, job["job_id"]))
+        except FileNotFoundError:
+            pass
+
+
+def _claim_lock(spool_dir, job_id):
+    try:
+        os.close(os.open(_lock_path(spool_dir, job_id), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return False
+    return True
+
+
+def _lock_age(spool_dir, job_id):
+    try:
+        return time.time() - os.path.getmtime(_lock_path(spool_dir, job_id))
+    except FileNotFoundError:
+        return 0.0
+
+
+def _break_lock(spool_dir, job_id):
+    """Move a stale lock aside; the rename is atomic, so only one process takes the job over."""
+    path = _lock_path(spool_dir, job_id)
+    stale_path = f"{path}.{os.getpid()}.{threading.get_ident()}.stale"
+    try:
+        os.rename(path, stale_path)
+    except FileNotFoundError:
+        return
+    os.remove(stale_path)
+
+
+def submit_export(scope, filters, file_format, owner_id=None):
+    """Queue a report export, or join the matching queued/running/finished job."""
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {file_format}")
+
+    spool_dir = _spool_dir()
+    expire_jobs(spool_dir)
+    job_id = make_job_id(scope, filters, file_format, get_data_version(owner_id))
+
+    with _spool_lock:
+        job = _read_meta(spool_dir, job_id)
+        if job is not None and not _is_stale(spool_dir, job) and job["status"] != JOB_FAILED:
+            if job["status"] != JOB_DONE or os.path.exists(_data_path(spool_dir, job)):
+                metrics.incr("export_jobs_shared", format=file_format)
+                return job
+
+        while not _claim_lock(spool_dir, job_id):
+            job = _read_meta(spool_dir, job_id)
+            if job is not None and not _is_stale(spool_dir, job):
+                metrics.incr("export_jobs_shared", format=file_format)
+                return job
+            if job is None and _lock_age(spool_dir, job_id) < _setting("EXPORT_LOCK_GRACE_SECONDS"):
+                # Another process has just claimed the job and is writing its meta.
+                time.sleep(0.05)
+                continue
+            _break_lock(spool_dir, job_id)
+        _own_job(spool_dir, job_id)
+
+        now = time.time()
+        job = {
+            "job_id": job_id,
+            "scope": scope,
+            "filters": filters,
+            "format": file_format,
+            "status": JOB_QUEUED,
+            "rows": None,
+            "error": None,
+            "created_at": now,
+            "finished_at": None,
+            "accessed_at": now,
+        }
+        _write_meta(spool_dir, job)
+
+    query, params = build_full_report_query(owner_id=owner_id, columns=REPORT_DISPLAY_COLUMNS, **filters)
+    _get_executor().submit(_run_job, spool_dir, dict(job), query, params)
+    metrics.incr("export_jobs_submitted", format=file_format)
+    return job
+
+
+def get_job(job_id):
+    if not job_id.isalnum():
+        return None
+    spool_dir = _spool_dir()
+    job = _read_meta(spool_dir, job_id)
+    if job is not None and _is_stale(spool_dir, job):
+        job.update(status=JOB_FAILED, error="Export worker stopped before finishing.")
+    return job
+
+
+def _serializer():
+    return URLSafeTimedSerializer(_setting("SECRET_KEY"), salt=TOKEN_SALT)
+
+
+def make_download_token(job):
+    return _serializer().dumps({"job_id": job["job_id"], "scope": job["scope"]})
+
+
+def open_download(token, scope):
+    """Resolve a signed download token to ``(path, job)`` for a finished job in ``scope``."""
+    try:
+        payload = _serializer().loads(token, max_age=_setting("EXPORT_TOKEN_MAX_AGE_SECONDS"))
+    except BadSignature:
+        return None, None
+    if payload.get("scope") != scope:
+        return None, None
+
+    spool_dir = _spool_dir()
+    with _spool_lock:
+        job = _read_meta(spool_dir, payload["job_id"])
+        if job is None or job["status"] != JOB_DONE:
+            return None, None
+        path = _data_path(spool_dir, job)
+        if not os.path.exists(path):
+            return None, None
+        job["accessed_at"] = time.time()
+        _write_meta(spool_dir, job)
+    return path, job
+
+
+def download_name(job):
+    return f"yield_report.{EXPORT_FORMATS[job['format']]['extension']}"
+
+
+def download_mimetype(job):
+    return EXPORT_FORMATS[job["format"]]["mimetype"]
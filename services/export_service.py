@@ -0,0 +1,140 @@
+import csv
+import io
+from functools import lru_cache
+
+from sqlalchemy import bindparam, select
+
+from models import yield_full_report, yielddata
+from utils.row_records import records_from_result
+
+
+EXCLUDED_REPORT_COLUMNS = {
+    "yieldid", "YieldId",
+    "cropid", "CropId",
+    "districtid", "district_id",
+    "provinceid", "province_id",
+    "municipalityid", "municipality_id",
+    "seasonid", "season_id",
+}
+
+REPORT_COLUMN_ORDER = [
+    "year", "CropName", "croptypename", "seasonname",
+    "areaharvested", "yieldamount", "production",
+    "municipalityname", "districtname", "provincename", "MunicipalityTypeName",
+]
+
+REPORT_FILTERS = ("year", "crop_id", "district_id", "season_id")
+
+
+def report_columns(keys):
+    """Drop ID columns and order the remaining report columns for display."""
+    filtered_columns = [col for col in keys if col not in EXCLUDED_REPORT_COLUMNS]
+    ordered_columns = [col for col in REPORT_COLUMN_ORDER if col in filtered_columns]
+    remaining_columns = [col for col in filtered_columns if col not in REPORT_COLUMN_ORDER]
+    return ordered_columns + remaining_columns
+
+
+# Only the displayed columns are selected for the report page and exports.
+REPORT_DISPLAY_COLUMNS = tuple(report_columns(yield_full_report.c.keys()))
+
+
+def report_records(result):
+    """Report rows as compact ``ReportRecord`` tuples named after the selected columns."""
+    return records_from_result(result, "ReportRecord")
+
+
+def filter_report_columns(report_data):
+    """Remove redundant ID columns and keep only meaningful display columns."""
+    if not report_data:
+        return report_data, []
+    return report_data, report_columns(list(report_data[0].keys()))
+
+
+_REPORT_FILTER_COLUMNS = {
+    "year": yield_full_report.c.year,
+    "crop_id": yield_full_report.c.cropid,
+    "district_id": yield_full_report.c.districtid,
+    "season_id": yield_full_report.c.seasonid,
+}
+
+
+@lru_cache(maxsize=256)
+def _full_report_statement(filter_names, by_owner, column_names, keyset):
+    """Report statement for one filter shape; values are bound at execute time."""
+    if column_names is None:
+        query = select(yield_full_report)
+    else:
+        query = select(*(yield_full_report.c[name] for name in column_names))
+    for name in filter_names:
+        query = query.where(_REPORT_FILTER_COLUMNS[name] == bindparam(name))
+    if by_owner:
+        owned_ids = select(yielddata.c.yieldid).where(yielddata.c.created_by == bindparam("owner_id"))
+        query = query.where(yield_full_report.c.yieldid.in_(owned_ids))
+    if keyset:
+        query = (
+            query.where(yield_full_report.c.yieldid > bindparam("after_id"))
+            .order_by(yield_full_report.c.yieldid)
+            .limit(bindparam("limit"))
+        )
+    return query
+
+
+def build_full_report_query(
+    year=None, crop_id=None, district_id=None, season_id=None, owner_id=None, columns=None, after_id=None, limit=None
+):
+    """Return ``(statement, params)`` for the report with the page's filters.
+
+    ``columns`` narrows the SELECT list to the named report columns. With a
+    ``limit`` the rows are keyset-paged by ``yieldid`` after ``after_id``.
+    """
+    values = {"year": year, "crop_id": crop_id, "district_id": district_id, "season_id": season_id}
+    params = {name: value for name, value in values.items() if value is not None}
+    if owner_id is not None:
+        params["owner_id"] = owner_id
+    keyset = limit is not None
+    if keyset:
+        params.update(after_id=0 if after_id is None else after_id, limit=limit)
+    statement = _full_report_statement(
+        tuple(name for name in REPORT_FILTERS if name in params),
+        owner_id is not None,
+        None if columns is None else tuple(columns),
+        keyset,
+    )
+    return statement, params
+
+
+def write_csv(rows, columns, target):
+    """Write report rows as CSV to a binary file object."""
+    text_target = io.TextIOWrapper(target, encoding="utf-8", newline="")
+    writer = csv.DictWriter(text_target, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({column: row[column] for column in columns})
+    text_target.flush()
+    text_target.detach()
+
+
+def write_excel(rows, columns, target):
+    """Write report rows to an .xlsx workbook using openpyxl's write-only mode."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet("Yield Report")
+    worksheet.append(columns)
+    for row in rows:
+        worksheet.append([row[column] for column in columns])
+    workbook.save(target)
+
+
+EXPORT_FORMATS = {
+    "csv": {
+        "extension": "csv",
+        "mimetype": "text/csv",
+        "writer": write_csv,
+    },
+    "excel": {
+        "extension": "xlsx",
+        "mimetype": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "writer": write_excel,
+    },
+}
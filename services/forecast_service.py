@@ -0,0 +1,233 @@
+"""Yearly forecasts for every (crop, district) series, fitted in one batch.
+
+Yearly totals are stacked into a padded ``(series, years)`` matrix with NaN for
+missing years. Both models are fitted to all series at once:
+
+* ``linear`` - ordinary least squares trend per series; the 2x2 normal
+  equations of every series are solved together with ``np.linalg.solve``.
+* ``seasonal_naive`` - the last observed year repeated (yearly totals have a
+  season length of one year); the spread comes from year-over-year changes.
+
+Prediction intervals are normal-theory intervals at ``confidence``. Forecasts
+are stored in ``yield_forecasts`` by ``refit_forecasts``; NumPy is imported
+lazily so the web app does not pay for it at startup.
+"""
+from datetime import datetime
+from statistics import NormalDist
+
+from sqlalchemy import delete, func, insert, select
+
+from models import crop_master, district, engine, read_engine, yield_forecasts, yielddata
+
+
+MODEL_LINEAR = "linear"
+MODEL_SEASONAL_NAIVE = "seasonal_naive"
+MODELS = (MODEL_LINEAR, MODEL_SEASONAL_NAIVE)
+METRICS = ("production", "yield")
+DEFAULT_HORIZON = 1
+DEFAULT_CONFIDENCE = 0.95
+MIN_LINEAR_POINTS = 3
+
+
+def load_series_matrix():
+    """Return yearly totals per (crop, district) as padded matrices.
+
+    ``production`` and ``yield`` (production / area) are ``(series, years)``
+    float arrays with NaN where a series has no data for that year.
+    """
+    import numpy as np
+
+    query = (
+        select(
+            yielddata.c.cropid,
+            yielddata.c.districtid,
+            yielddata.c.year,
+            func.sum(yielddata.c.production),
+            func.sum(yielddata.c.areaharvested),
+        )
+        .group_by(yielddata.c.cropid, yielddata.c.districtid, yielddata.c.year)
+    )
+    with read_engine.connect() as conn:
+        rows = conn.execute(query).all()
+
+    totals = np.array(rows, dtype=float).reshape(-1, 5)
+    crop_ids = totals[:, 0].astype(np.int64)
+    district_ids = totals[:, 1].astype(np.int64)
+    years = totals[:, 2].astype(np.int64)
+    if not len(rows):
+        empty = np.empty((0, 0))
+        return {"cropid": crop_ids, "districtid": district_ids, "years": years, "production": empty, "yield": empty}
+
+    keys = crop_ids * (int(district_ids.max()) + 1) + district_ids
+    unique_keys, first_row, series = np.unique(keys, return_index=True, return_inverse=True)
+    series = series.reshape(-1)
+    first_year = int(years.min())
+    year_index = years - first_year
+
+    shape = (unique_keys.size, int(year_index.max()) + 1)
+    production = np.full(shape, np.nan)
+    production[series, year_index] = totals[:, 3]
+    ratio = np.full(shape, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio[series, year_index] = np.where(totals[:, 4] > 0, totals[:, 3] / totals[:, 4], np.nan)
+
+    return {
+        "cropid": crop_ids[first_row],
+        "districtid": district_ids[first_row],
+        "years": np.arange(first_year, first_year + shape[1]),
+        "production": production,
+        "yield": ratio,
+    }
+
+
+def fit_linear(values, horizon=DEFAULT_HORIZON, confidence=DEFAULT_CONFIDENCE):
+    """Fit a least-squares trend to every row of ``values`` at once.
+
+    Returns ``{"forecast", "lower", "upper"}`` arrays of shape
+    ``(series, horizon)``; rows with fewer than ``MIN_LINEAR_POINTS`` observed
+    years are NaN.
+    """
+    import numpy as np
+
+    observed = ~np.isnan(values)
+    weights = observed.astype(float)
+    y = np.where(observed, values, 0.0)
+    t = np.arange(values.shape[1], dtype=float)
+
+    n = weights.sum(axis=1)
+    sum_t = weights @ t
+    sum_tt = weights @ (t * t)
+    normal = np.stack([np.stack([n, sum_t], axis=-1), np.stack([sum_t, sum_tt], axis=-1)], axis=-2)
+    rhs = np.stack([y.sum(axis=1), y @ t], axis=-1)
+
+    # Series with too few points (or all in one year) have a singular system.
+    fitted = (n >= MIN_LINEAR_POINTS) & (n * sum_tt - sum_t * sum_t > 0)
+    coefficients = np.full((values.shape[0], 2), np.nan)
+    if fitted.any():
+        coefficients[fitted] = np.linalg.solve(normal[fitted], rhs[fitted][..., None])[..., 0]
+
+    intercept, slope = coefficients[:, :1], coefficients[:, 1:]
+    residuals = np.where(observed, values - (intercept + slope * t), 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma = np.sqrt((residuals ** 2).sum(axis=1) / (n - 2))[:, None]
+        mean_t = (sum_t / n)[:, None]
+        sxx = (sum_tt - sum_t * sum_t / n)[:, None]
+
+    future_t = values.shape[1] - 1 + np.arange(1, horizon + 1, dtype=float)
+    forecast = intercept + slope * future_t
+    with np.errstate(divide="ignore", invalid="ignore"):
+        spread = sigma * np.sqrt(1 + 1 / n[:, None] + (future_t - mean_t) ** 2 / sxx)
+    margin = NormalDist().inv_cdf(0.5 + confidence / 2) * spread
+    return {"forecast": forecast, "lower": forecast - margin, "upper": forecast + margin}
+
+
+def fit_seasonal_naive(values, horizon=DEFAULT_HORIZON, confidence=DEFAULT_CONFIDENCE):
+    """Repeat each row's last observed value; the interval widens with sqrt(steps ahead).
+
+    The spread is the RMS of year-over-year changes between consecutive observed
+    years, so rows with no such pair get a point forecast but NaN bounds.
+    """
+    import numpy as np
+
+    observed = ~np.isnan(values)
+    columns = values.shape[1]
+    last_index = columns - 1 - np.argmax(observed[:, ::-1], axis=1)
+    has_data = observed.any(axis=1)
+    last_value = np.where(has_data, values[np.arange(values.shape[0]), last_index], np.nan)
+
+    steps = np.diff(values, axis=1)
+    step_observed = ~np.isnan(steps)
+    step_count = step_observed.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma = np.sqrt(np.where(step_observed, steps ** 2, 0.0).sum(axis=1) / step_count)
+    sigma = np.where(step_count > 0, sigma, np.nan)
+
+    ahead = (columns - 1 - last_index)[:, None] + np.arange(1, horizon + 1)
+    forecast = np.repeat(last_value[:, None], horizon, axis=1)
+    margin = NormalDist().inv_cdf(0.5 + confidence / 2) * sigma[:, None] * np.sqrt(ahead)
+    return {"forecast": forecast, "lower": forecast - margin, "upper": forecast + margin}
+
+
+_FITTERS = {MODEL_LINEAR: fit_linear, MODEL_SEASONAL_NAIVE: fit_seasonal_naive}
+
+
+def build_forecasts(matrix, horizon=DEFAULT_HORIZON, confidence=DEFAULT_CONFIDENCE):
+    """Fit every model and metric to ``matrix``; returns ``yield_forecasts`` row dicts."""
+    import numpy as np
+
+    if matrix["production"].size == 0:
+        return []
+
+    last_year = int(matrix["years"][-1])
+    fitted_at = datetime.utcnow()
+    rows = []
+    for metric in METRICS:
+        values = matrix[metric]
+        observations = (~np.isnan(values)).sum(axis=1)
+        for model in MODELS:
+            result = _FITTERS[model](values, horizon=horizon, confidence=confidence)
+            series, step = np.nonzero(~np.isnan(result["forecast"]))
+            for index, ahead in zip(series.tolist(), step.tolist()):
+                lower = result["lower"][index, ahead]
+                upper = result["upper"][index, ahead]
+                rows.append(
+                    {
+                        "cropid": int(matrix["cropid"][index]),
+                        "districtid": int(matrix["districtid"][index]),
+                        "metric": metric,
+                        "model": model,
+                        "target_year": last_year + ahead + 1,
+                        "forecast": float(result["forecast"][index, ahead]),
+                        "lower": None if np.isnan(lower) else float(lower),
+                        "upper": None if np.isnan(upper) else float(upper),
+                        "confidence": confidence,
+                        "observations": int(observations[index]),
+                        "fitted_at": fitted_at,
+                    }
+                )
+    return rows
+
+
+def refit_forecasts(horizon=DEFAULT_HORIZON, confidence=DEFAULT_CONFIDENCE):
+    """Refit every series and replace the stored forecasts; returns the row count."""
+    rows = build_forecasts(load_series_matrix(), horizon=horizon, confidence=confidence)
+    with engine.connect() as conn:
+        conn.execute(delete(yield_forecasts))
+        if rows:
+            conn.execute(insert(yield_forecasts), rows)
+        conn.commit()
+    return len(rows)
+
+
+def get_forecasts(crop_id=None, district_id=None, metric="production", model=MODEL_LINEAR):
+    """Stored forecasts with crop and district names, newest target year last."""
+    query = (
+        select(
+            yield_forecasts.c.cropid,
+            crop_master.c.CropName.label("crop_name"),
+            yield_forecasts.c.districtid,
+            district.c.districtname.label("district_name"),
+            yield_forecasts.c.target_year,
+            yield_forecasts.c.forecast,
+            yield_forecasts.c.lower,
+            yield_forecasts.c.upper,
+            yield_forecasts.c.confidence,
+            yield_forecasts.c.observations,
+            yield_forecasts.c.fitted_at,
+        )
+        .join(crop_master, yield_forecasts.c.cropid == crop_master.c.CropId)
+        .join(district, yield_forecasts.c.districtid == district.c.districtid)
+        .where(yield_forecasts.c.metric == metric, yield_forecasts.c.model == model)
+        .order_by(crop_master.c.CropName, district.c.districtname, yield_forecasts.c.target_year)
+    )
+    if crop_id is not None:
+        query = query.where(yield_forecasts.c.cropid == crop_id)
+    if district_id is not None:
+        query = query.where(yield_forecasts.c.districtid == district_id)
+
+    with read_engine.connect() as conn:
+        rows = conn.execute(query).mappings().all()
+    return [
+        {**row, "fitted_at": row["fitted_at"].isoformat() if row["fitted_at"] else None}
+        for row in rows
+    ]
@@ -0,0 +1,113 @@
+from sqlalchemy import func, literal, select, tuple_
+
+from models import district, municipality, municipalitytype, province, read_engine, yielddata
+
+
+GEOGRAPHY_LEVELS = ("province", "district", "municipality")
+
+_LEVEL_COLUMNS = {
+    "province": (province.c.provinceid, province.c.provincename),
+    "district": (district.c.districtid, district.c.districtname),
+    "municipality": (municipality.c.municipalityid, municipality.c.municipalityname),
+}
+
+
+def _level_node(level, area_id, name, row):
+    return {
+        "level": level,
+        "id": area_id,
+        "name": name,
+        "total_production": float(row["total_production"] or 0),
+        "total_area": float(row["total_area"] or 0),
+        "avg_yield_per_hectare": float(row["avg_yield_per_hectare"] or 0),
+        "records": int(row["records"] or 0),
+        "children": [],
+    }
+
+
+def _build_rollup_statement(root_level, root_id, levels, created_by=None):
+    id_columns = [_LEVEL_COLUMNS[level][0].label(f"{level}_id") for level in levels]
+    name_columns = [_LEVEL_COLUMNS[level][1].label(f"{level}_name") for level in levels]
+    grouping_columns = [func.grouping(_LEVEL_COLUMNS[level][0]).label(f"{level}_grouping") for level in levels]
+
+    root_name = (
+        func.max(_LEVEL_COLUMNS[root_level][1]) if root_level else literal("National")
+    ).label("root_name")
+
+    statement = (
+        select(
+            *id_columns,
+            *name_columns,
+            *grouping_columns,
+            root_name,
+            func.max(municipalitytype.c.MunicipalityTypeName).label("municipality_type"),
+            func.sum(yielddata.c.production).label("total_production"),
+            func.sum(yielddata.c.areaharvested).label("total_area"),
+            func.avg(yielddata.c.yieldamount).label("avg_yield_per_hectare"),
+            func.count(yielddata.c.yieldid).label("records"),
+        )
+        .select_from(yielddata)
+        .join(district, yielddata.c.districtid == district.c.districtid)
+        .join(province, district.c.provinceid == province.c.provinceid)
+        .join(municipality, yielddata.c.municipalityid == municipality.c.municipalityid)
+        .outerjoin(municipalitytype, municipality.c.municipalitytypeid == municipalitytype.c.municipalitytypeid)
+    )
+    if levels:
+        statement = statement.group_by(
+            func.rollup(*(tuple_(*_LEVEL_COLUMNS[level]) for level in levels))
+        )
+    if root_level:
+        statement = statement.where(_LEVEL_COLUMNS[root_level][0] == root_id)
+    if created_by is not None:
+        statement = statement.where(yielddata.c.created_by == created_by)
+    return statement
+
+
+def _rows_to_tree(rows, root_level, root_id, levels):
+    def row_depth(row):
+        return sum(1 for level in levels if not row[f"{level}_grouping"])
+
+    root = None
+    nodes = {}
+    for row in sorted(rows, key=lambda r: (row_depth(r), *(str(r[f"{lvl}_name"] or "") for lvl in levels))):
+        depth = row_depth(row)
+        if depth == 0:
+            root = _level_node(root_level or "national", root_id, row["root_name"], row)
+            nodes[()] = root
+            continue
+
+        key = tuple(row[f"{level}_id"] for level in levels[:depth])
+        parent = nodes.get(key[:-1])
+        if parent is None:
+            continue
+        level = levels[depth - 1]
+        node = _level_node(level, key[-1], row[f"{level}_name"], row)
+        if level == "municipality":
+            node["municipality_type"] = row["municipality_type"]
+        parent["children"].append(node)
+        nodes[key] = node
+
+    return root
+
+
+def get_geography_rollup(root_level=None, root_id=None, depth=len(GEOGRAPHY_LEVELS), created_by=None):
+    """Return a production tree below ``root_level``/``root_id`` computed in one ROLLUP pass.
+
+    ``root_level`` is ``None`` for the national view, otherwise ``"province"`` or
+    ``"district"``. ``depth`` limits how many levels below the root are expanded.
+    """
+    if root_level is not None and root_level not in GEOGRAPHY_LEVELS[:-1]:
+        raise ValueError(f"Unsupported geography level: {root_level}")
+
+    start = GEOGRAPHY_LEVELS.index(root_level) + 1 if root_level else 0
+    levels = GEOGRAPHY_LEVELS[start:start + max(depth, 0)]
+
+    with read_engine.connect() as conn:
+        statement = _build_rollup_statement(root_level, root_id, levels, created_by)
+        rows = conn.execute(statement).mappings().all()
+
+    root = _rows_to_tree(rows, root_level, root_id, levels)
+    if root is None:
+        empty_row = {"total_production": 0, "total_area": 0, "avg_yield_per_hectare": 0, "records": 0}
+        root = _level_node(root_level or "national", root_id, None, empty_row)
+    return root
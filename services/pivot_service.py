@@ -0,0 +1,274 @@
+"""Cross-tab (pivot) queries over yielddata for any allow-listed dimensions.
+
+A request names row and column dimensions, measures and filters. It is
+normalized, compiled into one ``GROUP BY GROUPING SETS`` query (the cells plus,
+optionally, row totals, column totals and the grand total) and returned as a
+dense matrix per measure with columnar axis keys. Results are cached per
+normalized request, change watermark and reference-data version, for at most
+``PIVOT_CACHE_TTL_SECONDS``; yield writes also clear this process's cache.
+"""
+import hashlib
+import json
+import operator
+
+from sqlalchemy import Float, func, literal, select, tuple_
+
+from models import crop_master, crop_type_master, district, municipality, province, read_engine, season_master, yielddata
+from services.change_feed_service import get_change_watermark
+from utils.fragment_cache import FragmentCache, fragment_cache
+from utils.metrics import metrics
+
+
+# name: (id column, label column, tables to join)
+DIMENSIONS = {
+    "year": (yielddata.c.year, yielddata.c.year, ()),
+    "crop": (yielddata.c.cropid, crop_master.c.CropName, (crop_master,)),
+    "crop_type": (crop_master.c.croptypeid, crop_type_master.c.croptypename, (crop_master, crop_type_master)),
+    "season": (yielddata.c.seasonid, season_master.c.seasonname, (season_master,)),
+    "province": (district.c.provinceid, province.c.provincename, (district, province)),
+    "district": (yielddata.c.districtid, district.c.districtname, (district,)),
+    "municipality": (yielddata.c.municipalityid, municipality.c.municipalityname, (municipality,)),
+}
+MEASURES = {
+    "production": func.sum(yielddata.c.production),
+    "area": func.sum(yielddata.c.areaharvested),
+    "yield_per_hectare": func.sum(yielddata.c.production) / func.nullif(func.sum(yielddata.c.areaharvested), 0, type_=Float),
+    "avg_yield": func.avg(yielddata.c.yieldamount),
+    "records": func.count(yielddata.c.yieldid),
+}
+FILTERS = {
+    "crop_id": (yielddata.c.cropid, operator.eq, ()),
+    "crop_type_id": (crop_master.c.croptypeid, operator.eq, (crop_master,)),
+    "season_id": (yielddata.c.seasonid, operator.eq, ()),
+    "province_id": (district.c.provinceid, operator.eq, (district,)),
+    "district_id": (yielddata.c.districtid, operator.eq, ()),
+    "municipality_id": (yielddata.c.municipalityid, operator.eq, ()),
+    "year_from": (yielddata.c.year, operator.ge, ()),
+    "year_to": (yielddata.c.year, operator.le, ()),
+}
+MAX_AXIS_DIMENSIONS = 3
+MAX_CELLS = 100000
+
+_JOINS = (
+    (crop_master, yielddata.c.cropid == crop_master.c.CropId, False),
+    (crop_type_master, crop_master.c.croptypeid == crop_type_master.c.croptypeid, False),
+    (district, yielddata.c.districtid == district.c.districtid, False),
+    (province, district.c.provinceid == province.c.provinceid, False),
+    (municipality, yielddata.c.municipalityid == municipality.c.municipalityid, False),
+    (season_master, yielddata.c.seasonid == season_master.c.seasonid, True),
+)
+
+pivot_cache = FragmentCache()
+
+
+def invalidate_pivot_cache():
+    """Drop every cached pivot in this worker; call after committing yield writes."""
+    pivot_cache.bump_version()
+
+
+def normalize_request(rows=(), columns=(), measures=("production",), filters=None, totals=False):
+    """Validate against the allow-lists and return a canonical request dict.
+
+    Axis order is kept (it is the nesting order); duplicate names are dropped,
+    unset filters removed and the rest sorted so equal requests share a cache key.
+    """
+    rows = list(dict.fromkeys(rows))
+    columns = list(dict.fromkeys(columns))
+    measures = list(dict.fromkeys(measures)) or ["production"]
+    for name in rows + columns:
+        if name not in DIMENSIONS:
+            raise ValueError(f"Unsupported dimension: {name}")
+    if set(rows) & set(columns):
+        raise ValueError("A dimension cannot be on both rows and columns")
+    if len(rows) > MAX_AXIS_DIMENSIONS or len(columns) > MAX_AXIS_DIMENSIONS:
+        raise ValueError(f"Use at most {MAX_AXIS_DIMENSIONS} dimensions per axis")
+    for name in measures:
+        if name not in MEASURES:
+            raise ValueError(f"Unsupported measure: {name}")
+    filters = {name: int(value) for name, value in (filters or {}).items() if value is not None}
+    for name in filters:
+        if name not in FILTERS:
+            raise ValueError(f"Unsupported filter: {name}")
+    return {
+        "rows": rows,
+        "columns": columns,
+        "measures": measures,
+        "filters": dict(sorted(filters.items())),
+        "totals": bool(totals) and bool(rows or columns),
+    }
+
+
+def _axis_columns(names, prefix):
+    columns = []
+    for index, name in enumerate(names):
+        id_column, label_column, _tables = DIMENSIONS[name]
+        columns.append((id_column.label(f"{prefix}{index}_id"), label_column.label(f"{prefix}{index}_label")))
+    return columns
+
+
+def build_pivot_query(request):
+    """Compile a normalized request into one grouped statement."""
+    tables = set()
+    for name in request["rows"] + request["columns"]:
+        tables.update(DIMENSIONS[name][2])
+    for name in request["filters"]:
+        tables.update(FILTERS[name][2])
+    if province in tables:
+        tables.add(district)
+    if crop_type_master in tables:
+        tables.add(crop_master)
+
+    source = yielddata
+    for table, on_clause, outer in _JOINS:
+        if table in tables:
+            source = source.join(table, on_clause, isouter=outer)
+
+    row_columns = _axis_columns(request["rows"], "r")
+    column_columns = _axis_columns(request["columns"], "c")
+    row_flat = [column for pair in row_columns for column in pair]
+    column_flat = [column for pair in column_columns for column in pair]
+
+    def grouping(pairs):
+        # GROUPING() is non-zero on the rows where this axis is rolled up.
+        if not pairs:
+            return literal(0)
+        return func.grouping(*(pair[0].element for pair in pairs))
+
+    statement = select(
+        *row_flat,
+        *column_flat,
+        grouping(row_columns).label("row_rollup"),
+        grouping(column_columns).label("column_rollup"),
+        *(MEASURES[name].label(f"m_{name}") for name in request["measures"]),
+    ).select_from(source)
+
+    plain = [column.element for column in row_flat + column_flat]
+    if request["totals"]:
+        sets = [plain, [column.element for column in row_flat], [column.element for column in column_flat], []]
+        # A single-axis pivot would repeat the cell set; keep each set once.
+        unique_sets = {tuple(map(str, columns)): columns for columns in sets}.values()
+        statement = statement.group_by(func.grouping_sets(*(tuple_(*columns) for columns in unique_sets)))
+    elif plain:
+        statement = statement.group_by(*plain)
+
+    for name, value in request["filters"].items():
+        column, compare, _tables = FILTERS[name]
+        statement = statement.where(compare(column, value))
+    return statement
+
+
+def _label_order(label):
+    # Numbers (years) first in numeric order, then names case-insensitively, then blanks.
+    if label is None:
+        return (2, 0, "")
+    if isinstance(label, (int, float)):
+        return (0, label, "")
+    return (1, 0, str(label).lower())
+
+
+def _axis(names, keys, labels):
+    order = sorted(range(len(keys)), key=lambda index: ([_label_order(label) for label in labels[index]], str(keys[index])))
+    ordered_keys = [keys[index] for index in order]
+    ordered_labels = [labels[index] for index in order]
+    return ordered_keys, {
+        "dimensions": names,
+        "ids": {name: [key[position] for key in ordered_keys] for position, name in enumerate(names)},
+        "labels": {name: [label[position] for label in ordered_labels] for position, name in enumerate(names)},
+    }
+
+
+def _number(value):
+    return None if value is None else float(value)
+
+
+def shape_pivot(request, rows):
+    """Turn grouped result rows into dense columnar JSON."""
+    row_count, column_count = len(request["rows"]), len(request["columns"])
+    cells, row_totals, column_totals, grand_total = {}, {}, {}, None
+    row_labels, column_labels = {}, {}
+
+    for row in rows:
+        row_key = tuple(row[f"r{index}_id"] for index in range(row_count))
+        column_key = tuple(row[f"c{index}_id"] for index in range(column_count))
+        values = {name: _number(row[f"m_{name}"]) for name in request["measures"]}
+        row_rollup = bool(row_count and row["row_rollup"])
+        column_rollup = bool(column_count and row["column_rollup"])
+        if row_rollup and (column_rollup or not column_count) or column_rollup and not row_count:
+            grand_total = values
+            continue
+        if row_rollup:
+            column_totals[column_key] = values
+            continue
+        if column_rollup:
+            row_totals[row_key] = values
+            continue
+        if not column_count:
+            row_totals[row_key] = values
+        if not row_count:
+            column_totals[column_key] = values
+        row_labels[row_key] = tuple(row[f"r{index}_label"] for index in range(row_count))
+        column_labels[column_key] = tuple(row[f"c{index}_label"] for index in range(column_count))
+        cells[(row_key, column_key)] = values
+
+    if len(row_labels) * len(column_labels) > MAX_CELLS:
+        raise ValueError(f"Pivot has more than {MAX_CELLS} cells; add filters or fewer dimensions")
+
+    row_keys, row_axis = _axis(request["rows"], list(row_labels), list(row_labels.values()))
+    column_keys, column_axis = _axis(request["columns"], list(column_labels), list(column_labels.values()))
+
+    result = {
+        "rows": row_axis,
+        "columns": column_axis,
+        "measures": request["measures"],
+        "cells": {
+            name: [
+                [cells.get((row_key, column_key), {}).get(name) for column_key in column_keys]
+                for row_key in row_keys
+            ]
+            for name in request["measures"]
+        },
+    }
+    if request["totals"]:
+        result["row_totals"] = {
+            name: [row_totals.get(key, {}).get(name) for key in row_keys] for name in request["measures"]
+        }
+        result["column_totals"] = {
+            name: [column_totals.get(key, {}).get(name) for key in column_keys] for name in request["measures"]
+        }
+        result["grand_total"] = grand_total
+    return result
+
+
+def _result_row_limit(request):
+    """Most grouped rows a pivot within ``MAX_CELLS`` can return.
+
+    Every cell row is a distinct cell. With totals there is also one row per
+    row key and per column key, and their product is at most ``MAX_CELLS``, so
+    their sum is at most ``MAX_CELLS + 1``; then one grand total.
+    """
+    return 2 * MAX_CELLS + 2 if request["totals"] else MAX_CELLS
+
+
+def get_pivot(rows=(), columns=(), measures=("production",), filters=None, totals=False):
+    """Return the cross-tab for the request, served from cache while the data is unchanged."""
+    request = normalize_request(rows, columns, measures, filters, totals)
+    # The watermark sees yield and crop writes from every worker; renamed seasons
+    # and crop types only bump the reference-data version in the worker that
+    # renamed them, so other workers pick them up when the TTL expires.
+    version = [get_change_watermark(), fragment_cache.version, pivot_cache.version]
+    key = hashlib.sha256(json.dumps([request, version], sort_keys=True).encode("utf-8")).hexdigest()
+    cached = pivot_cache.get(key)
+    if cached is not None:
+        metrics.incr("pivot_cache", result="hit")
+        return cached
+
+    metrics.incr("pivot_cache", result="miss")
+    row_limit = _result_row_limit(request)
+    with read_engine.connect() as conn:
+        result_rows = conn.execute(build_pivot_query(request).limit(row_limit + 1)).mappings().all()
+    if len(result_rows) > row_limit:
+        raise ValueError(f"Pivot has more than {MAX_CELLS} cells; add filters or fewer dimensions")
+    result = shape_pivot(request, result_rows)
+    pivot_cache.set(key, result)
+    return result
+
@@ -0,0 +1,195 @@
+"""Yield-amount distributions from per-(crop, district, year) KLL sketches.
+
+Every yield write updates the sketch of the group it touches in the same
+transaction: inserts add their value to the stored sketch, while edits and
+deletes (which a sketch cannot undo) rebuild the affected groups from their
+rows. Percentile queries merge the stored sketches for any crop, district,
+province and year range instead of scanning yielddata.
+"""
+from datetime import datetime
+
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models import crop_master, district, engine, read_engine, yield_sketches, yielddata
+from utils.quantile_sketch import KLLSketch
+
+
+DEFAULT_QUANTILES = (0.1, 0.5, 0.9)
+SKETCH_K = 200
+GROUP_BY_COLUMNS = {
+    "crop": (yield_sketches.c.cropid, crop_master.c.CropName),
+    "district": (yield_sketches.c.districtid, district.c.districtname),
+    "year": (yield_sketches.c.year, yield_sketches.c.year),
+}
+
+
+def _group_key(record):
+    return record["cropid"], record["districtid"], record["year"]
+
+
+def _store_sketches(conn, sketches):
+    """Upsert ``{(cropid, districtid, year): KLLSketch}``; empty sketches are kept with count 0."""
+    if not sketches:
+        return
+    now = datetime.utcnow()
+    rows = [
+        {"cropid": key[0], "districtid": key[1], "year": key[2], "count": sketch.count, "sketch": sketch.to_bytes(), "updated_at": now}
+        for key, sketch in sketches.items()
+    ]
+    stmt = pg_insert(yield_sketches).values(rows)
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[yield_sketches.c.cropid, yield_sketches.c.districtid, yield_sketches.c.year],
+            set_={"count": stmt.excluded["count"], "sketch": stmt.excluded.sketch, "updated_at": stmt.excluded.updated_at},
+        )
+    )
+
+
+def _lock_groups(conn, keys):
+    """Lock the sketch rows for ``keys`` (creating missing ones); returns their stored sketches.
+
+    Rows are locked in key order so concurrent writers cannot deadlock. A
+    writer that rebuilds a group reads its yielddata rows only after taking
+    the lock, so a concurrent insert into the group either committed first (and
+    is read) or waits and then adds itself to the rebuilt sketch.
+    """
+    keys = sorted(keys)
+    key_columns = tuple_(yield_sketches.c.cropid, yield_sketches.c.districtid, yield_sketches.c.year)
+    conn.execute(
+        pg_insert(yield_sketches)
+        .values(
+            [
+                {"cropid": key[0], "districtid": key[1], "year": key[2], "count": 0, "sketch": KLLSketch(SKETCH_K).to_bytes()}
+                for key in keys
+            ]
+        )
+        .on_conflict_do_nothing()
+    )
+    stored = conn.execute(
+        select(yield_sketches)
+        .where(key_columns.in_(keys))
+        .order_by(yield_sketches.c.cropid, yield_sketches.c.districtid, yield_sketches.c.year)
+        .with_for_update()
+    ).mappings().all()
+    return {_group_key(row): KLLSketch.from_bytes(row["sketch"]) for row in stored}
+
+
+def _rebuild_groups(conn, keys):
+    sketches = {key: KLLSketch(SKETCH_K) for key in keys}
+    rows = conn.execute(
+        select(yielddata.c.cropid, yielddata.c.districtid, yielddata.c.year, yielddata.c.yieldamount).where(
+            tuple_(yielddata.c.cropid, yielddata.c.districtid, yielddata.c.year).in_(list(keys))
+        )
+    ).mappings().all()
+    for row in rows:
+        sketches[_group_key(row)].update(row["yieldamount"])
+    return sketches
+
+
+def update_yield_sketches(conn, changes):
+    """Apply ``(before, after)`` yielddata-shaped pairs to the stored sketches.
+
+    Call before committing the write so sketches and rows commit together.
+    ``before`` is ``None`` for inserts and ``after`` is ``None`` for deletes.
+    """
+    rebuild = set()
+    additions = {}
+    for before, after in changes:
+        if before is not None:
+            rebuild.add(_group_key(before))
+            if after is not None:
+                rebuild.add(_group_key(after))
+        elif after is not None:
+            additions.setdefault(_group_key(after), []).append(after["yieldamount"])
+
+    pending = {key: values for key, values in additions.items() if key not in rebuild}
+    if not rebuild and not pending:
+        return
+    stored = _lock_groups(conn, rebuild | set(pending))
+    sketches = _rebuild_groups(conn, rebuild) if rebuild else {}
+    for key, values in pending.items():
+        sketch = sketches[key] = stored.get(key) or KLLSketch(SKETCH_K)
+        for value in values:
+            sketch.update(value)
+    _store_sketches(conn, sketches)
+
+
+def rebuild_all_sketches(batch_rows=50000):
+    """Recompute every sketch from yielddata (backfill or repair); returns the group count."""
+    query = (
+        select(yielddata.c.cropid, yielddata.c.districtid, yielddata.c.year, yielddata.c.yieldamount)
+        .order_by(yielddata.c.cropid, yielddata.c.districtid, yielddata.c.year)
+    )
+    sketches = {}
+    with read_engine.connect() as read_conn:
+        result = read_conn.execution_options(stream_results=True, yield_per=batch_rows).execute(query)
+        for partition in result.mappings().partitions(batch_rows):
+            for row in partition:
+                sketches.setdefault(_group_key(row), KLLSketch(SKETCH_K)).update(row["yieldamount"])
+
+    with engine.connect() as conn:
+        conn.execute(update(yield_sketches).values(count=0, sketch=KLLSketch(SKETCH_K).to_bytes(), updated_at=datetime.utcnow()))
+        _store_sketches(conn, sketches)
+        conn.commit()
+    return len(sketches)
+
+
+def get_yield_quantiles(
+    quantiles=DEFAULT_QUANTILES,
+    group_by=None,
+    crop_id=None,
+    district_id=None,
+    province_id=None,
+    year_from=None,
+    year_to=None,
+):
+    """Merge stored sketches matching the filters, optionally per crop, district or year.
+
+    Returns one entry per group with the record count, min, max and the value at
+    each requested quantile.
+    """
+    if group_by is not None and group_by not in GROUP_BY_COLUMNS:
+        raise ValueError(f"Unsupported group_by: {group_by}")
+
+    group_columns = GROUP_BY_COLUMNS.get(group_by, ())
+    query = (
+        select(yield_sketches.c.sketch, *(column.label(f"group_{index}") for index, column in enumerate(group_columns)))
+        .join(crop_master, yield_sketches.c.cropid == crop_master.c.CropId)
+        .join(district, yield_sketches.c.districtid == district.c.districtid)
+        .where(yield_sketches.c.count > 0)
+    )
+    if crop_id is not None:
+        query = query.where(yield_sketches.c.cropid == crop_id)
+    if district_id is not None:
+        query = query.where(yield_sketches.c.districtid == district_id)
+    if province_id is not None:
+        query = query.where(district.c.provinceid == province_id)
+    if year_from is not None:
+        query = query.where(yield_sketches.c.year >= year_from)
+    if year_to is not None:
+        query = query.where(yield_sketches.c.year <= year_to)
+
+    merged = {}
+    with read_engine.connect() as conn:
+        for row in conn.execute(query).mappings():
+            group = (row["group_0"], row["group_1"]) if group_columns else (None, None)
+            merged.setdefault(group, KLLSketch(SKETCH_K)).merge(KLLSketch.from_bytes(row["sketch"]))
+
+    groups = []
+    for (key, label), sketch in sorted(merged.items(), key=lambda item: str(item[0][1])):
+        groups.append(
+            {
+                "key": key,
+                "label": label,
+                "count": sketch.count,
+                "min": sketch.min,
+                "max": sketch.max,
+                # Items are stored as float32, so trim the representation noise.
+                "quantiles": {
+                    str(fraction): None if value is None else round(value, 4)
+                    for fraction, value in zip(quantiles, sketch.quantiles(quantiles))
+                },
+            }
+        )
+    return groups
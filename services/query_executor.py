@@ -0,0 +1,160 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+from flask import current_app, has_app_context
+
+from config import Config
+from utils.row_records import records_from_result
+from utils.single_flight import no_waiting
+
+
+class QueryDeadlineExceeded(TimeoutError):
+    """Raised when fanned-out queries do not finish before the request deadline."""
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_worker_state = threading.local()
+
+
+def _setting(name):
+    if has_app_context():
+        return current_app.config.get(name, getattr(Config, name))
+    return getattr(Config, name)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_setting("QUERY_FANOUT_WORKERS"),
+                    thread_name_prefix="query-fanout",
+                )
+    return _executor
+
+
+def _remaining(deadline):
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise QueryDeadlineExceeded("Query deadline exceeded")
+    return remaining
+
+
+def _apply_statement_timeout(conn, deadline):
+    """Let PostgreSQL abort a statement that would outlive the request deadline."""
+    remaining = _remaining(deadline)
+    dialect = getattr(conn, "dialect", None)
+    if remaining is not None and getattr(dialect, "name", None) == "postgresql":
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {max(int(remaining * 1000), 1)}")
+
+
+def _run_in_worker(call):
+    _worker_state.active = True
+    try:
+        with no_waiting():
+            return call()
+    finally:
+        _worker_state.active = False
+
+
+def _fan_out(calls, deadline):
+    executor = _get_executor()
+    futures = {
+        name: executor.submit(contextvars.copy_context().run, _run_in_worker, call)
+        for name, call in calls.items()
+    }
+    done, pending = wait(futures.values(), timeout=_remaining(deadline), return_when=FIRST_EXCEPTION)
+
+    for future in done:
+        error = future.exception()
+        if error is not None:
+            for other in pending:
+                other.cancel()
+            raise error
+
+    if pending:
+        for future in pending:
+            future.cancel()
+        raise QueryDeadlineExceeded(f"{len(pending)} of {len(futures)} queries missed the deadline")
+
+    return {name: future.result() for name, future in futures.items()}
+
+
+def _parallel_enabled(calls):
+    return (
+        _setting("PARALLEL_QUERIES")
+        and len(calls) > 1
+        and not getattr(_worker_state, "active", False)
+    )
+
+
+def _deadline(timeout):
+    if timeout is None:
+        timeout = _setting("QUERY_FANOUT_TIMEOUT_SECONDS")
+    return time.monotonic() + timeout if timeout else None
+
+
+def fetch_all(statement, params=None):
+    return lambda conn: conn.execute(statement, params).mappings().all()
+
+
+def fetch_records(statement, params=None, name="Record"):
+    return lambda conn: records_from_result(conn.execute(statement, params), name)
+
+
+def fetch_first(statement, params=None):
+    return lambda conn: conn.execute(statement, params).mappings().first()
+
+
+def fetch_scalar(statement, params=None):
+    return lambda conn: conn.execute(statement, params).scalar()
+
+
+def run_queries(bind, tasks, timeout=None):
+    """Run independent read-only ``tasks`` and return their results by name.
+
+    Each task is a callable taking a connection. When ``PARALLEL_QUERIES`` is on,
+    every task gets its own pooled connection from ``bind`` and runs on the shared
+    bounded thread pool; otherwise the tasks run in order on a single connection.
+    The first error is re-raised, and :class:`QueryDeadlineExceeded` is raised if
+    the deadline passes first.
+    """
+    deadline = _deadline(timeout)
+
+    if not _parallel_enabled(tasks):
+        results = {}
+        with bind.connect() as conn:
+            for name, task in tasks.items():
+                _remaining(deadline)
+                results[name] = task(conn)
+        return results
+
+    def with_connection(task):
+        def call():
+            with bind.connect() as conn:
+                _apply_statement_timeout(conn, deadline)
+                return task(conn)
+
+        return call
+
+    return _fan_out({name: with_connection(task) for name, task in tasks.items()}, deadline)
+
+
+def run_calls(calls, timeout=None):
+    """Run independent zero-argument callables (e.g. service functions) like :func:`run_queries`."""
+    deadline = _deadline(timeout)
+
+    if not _parallel_enabled(calls):
+        results = {}
+        for name, call in calls.items():
+            _remaining(deadline)
+            results[name] = call()
+        return results
+
+    return _fan_out(calls, deadline)
@@ -0,0 +1,140 @@
+from sqlalchemy import Float, func, select
+
+from models import crop_master, district, municipality, province, read_engine, season_master, users, yielddata
+
+
+# Allow-listed dimensions: the id column, the display column and the table the
+# display column needs joined in.
+DIMENSIONS = {
+    "farmer": (yielddata.c.created_by, users.c.username, users),
+    "municipality": (yielddata.c.municipalityid, municipality.c.municipalityname, municipality),
+    "crop": (yielddata.c.cropid, crop_master.c.CropName, crop_master),
+    "district": (yielddata.c.districtid, district.c.districtname, district),
+    "province": (district.c.provinceid, province.c.provincename, province),
+    "year": (yielddata.c.year, yielddata.c.year, None),
+    "season": (yielddata.c.seasonid, season_master.c.seasonname, season_master),
+}
+RANK_ENTITIES = ("farmer", "municipality", "crop", "district")
+PARTITIONS = ("district", "province", "crop", "year", "season")
+
+_PRODUCTION = func.sum(yielddata.c.production)
+_AREA = func.sum(yielddata.c.areaharvested)
+METRICS = {
+    "production": _PRODUCTION,
+    "area": _AREA,
+    "yield_per_hectare": _PRODUCTION / func.nullif(_AREA, 0, type_=Float),
+}
+TIE_FUNCTIONS = {"rank": func.rank, "dense": func.dense_rank, "row": func.row_number}
+FILTERS = {
+    "crop_id": yielddata.c.cropid,
+    "district_id": yielddata.c.districtid,
+    "province_id": district.c.provinceid,
+    "season_id": yielddata.c.seasonid,
+    "year": yielddata.c.year,
+}
+MAX_TOP_K = 100
+
+# Join order matters: province is reached through district.
+_JOINS = (
+    (crop_master, yielddata.c.cropid == crop_master.c.CropId, False),
+    (district, yielddata.c.districtid == district.c.districtid, False),
+    (province, district.c.provinceid == province.c.provinceid, False),
+    (municipality, yielddata.c.municipalityid == municipality.c.municipalityid, False),
+    (users, yielddata.c.created_by == users.c.id, True),
+    (season_master, yielddata.c.seasonid == season_master.c.seasonid, True),
+)
+
+
+def _from_clause(tables):
+    if province in tables:
+        tables = tables | {district}
+    source = yielddata
+    for table, on_clause, outer in _JOINS:
+        if table in tables:
+            source = source.join(table, on_clause, isouter=outer)
+    return source
+
+
+def build_ranking_query(entity, metric="production", partition=None, top_k=10, ties="rank", filters=None):
+    """Compile one windowed query returning the top ``top_k`` ``entity`` rows per partition.
+
+    ``ties="rank"`` keeps every row tied at the cutoff (a partition can return
+    more than ``top_k`` rows), ``"dense"`` ranks ties without gaps and ``"row"``
+    breaks ties by id for exactly ``top_k`` rows.
+    """
+    if entity not in RANK_ENTITIES:
+        raise ValueError(f"Unsupported entity: {entity}")
+    if metric not in METRICS:
+        raise ValueError(f"Unsupported metric: {metric}")
+    if partition is not None and (partition not in PARTITIONS or partition == entity):
+        raise ValueError(f"Unsupported partition: {partition}")
+    if ties not in TIE_FUNCTIONS:
+        raise ValueError(f"Unsupported ties mode: {ties}")
+
+    entity_id, entity_name, entity_table = DIMENSIONS[entity]
+    group_columns = [entity_id.label("entity_id"), entity_name.label("entity_name")]
+    tables = {entity_table}
+    if partition is not None:
+        partition_id, partition_name, partition_table = DIMENSIONS[partition]
+        group_columns += [partition_id.label("partition_id"), partition_name.label("partition_name")]
+        tables.add(partition_table)
+
+    filters = {name: value for name, value in (filters or {}).items() if value is not None}
+    if "province_id" in filters:
+        tables.add(district)
+
+    totals = (
+        select(
+            *group_columns,
+            METRICS[metric].label("value"),
+            _PRODUCTION.label("total_production"),
+            _AREA.label("total_area"),
+            func.count(yielddata.c.yieldid).label("records"),
+        )
+        .select_from(_from_clause({table for table in tables if table is not None}))
+        .group_by(*group_columns)
+    )
+    for name, value in filters.items():
+        totals = totals.where(FILTERS[name] == value)
+    totals = totals.subquery("totals")
+
+    partition_by = [totals.c.partition_id] if partition is not None else []
+    rank_order = [totals.c.value.desc().nulls_last()]
+    if ties == "row":
+        rank_order.append(totals.c.entity_id)
+    ranked = select(
+        totals,
+        TIE_FUNCTIONS[ties]().over(partition_by=partition_by, order_by=rank_order).label("rank"),
+    ).subquery("ranked")
+
+    order_by = [ranked.c.partition_name, ranked.c.partition_id] if partition is not None else []
+    return (
+        select(ranked)
+        .where(ranked.c.rank <= max(1, min(int(top_k), MAX_TOP_K)))
+        .order_by(*order_by, ranked.c.rank, ranked.c.entity_id)
+    )
+
+
+def get_rankings(entity, metric="production", partition=None, top_k=10, ties="rank", filters=None):
+    """Top-K ``entity`` rows by ``metric``, grouped per ``partition`` value (or one group)."""
+    statement = build_ranking_query(entity, metric, partition, top_k, ties, filters)
+    with read_engine.connect() as conn:
+        rows = conn.execute(statement).mappings().all()
+
+    groups = []
+    for row in rows:
+        key = row.get("partition_id")
+        if not groups or groups[-1]["id"] != key:
+            groups.append({"id": key, "name": row.get("partition_name"), "items": []})
+        groups[-1]["items"].append(
+            {
+                "rank": row["rank"],
+                "id": row["entity_id"],
+                "name": row["entity_name"],
+                "value": None if row["value"] is None else float(row["value"]),
+                "total_production": float(row["total_production"] or 0),
+                "total_area": float(row["total_area"] or 0),
+                "records": row["records"],
+            }
+        )
+    return {"entity": entity, "metric": metric, "partition": partition, "ties": ties, "groups": groups}
@@ -0,0 +1,167 @@
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy import select
+
+from models import crop_master, district, municipality, read_engine
+
+
+SEARCH_INDEX_TTL_SECONDS = 600
+MIN_TRIGRAM_SIMILARITY = 0.5
+
+
+def _normalize(value):
+    return " ".join(str(value or "").lower().split())
+
+
+def _trigrams(value):
+    padded = f"  {value} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """In-memory prefix and trigram index over ``(id, name, group_id)`` entries."""
+
+    def __init__(self, entries):
+        self._entries = {}
+        self._groups = {}
+        self._prefixes = []
+        self._postings = {}
+
+        for entry_id, name, group_id in entries:
+            normalized = _normalize(name)
+            grams = _trigrams(normalized)
+            self._entries[entry_id] = (name, normalized, group_id)
+            self._groups.setdefault(group_id, []).append(entry_id)
+            for token in set(normalized.split()) | {normalized}:
+                self._prefixes.append((token, entry_id))
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add(entry_id)
+
+        self._prefixes.sort()
+        for entry_ids in self._groups.values():
+            entry_ids.sort(key=lambda entry_id: self._entries[entry_id][1])
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _prefix_scores(self, query):
+        scores = {}
+        position = bisect_left(self._prefixes, (query,))
+        while position < len(self._prefixes):
+            token, entry_id = self._prefixes[position]
+            if not token.startswith(query):
+                break
+            score = 3.0 if self._entries[entry_id][1].startswith(query) else 2.0
+            scores[entry_id] = max(scores.get(entry_id, 0.0), score)
+            position += 1
+        return scores
+
+    def _trigram_scores(self, query):
+        """Score entries by the share of query trigrams they contain (word-similarity style)."""
+        query_grams = _trigrams(query)
+        shared = {}
+        for gram in query_grams:
+            for entry_id in self._postings.get(gram, ()):
+                shared[entry_id] = shared.get(entry_id, 0) + 1
+
+        scores = {}
+        for entry_id, overlap in shared.items():
+            similarity = overlap / len(query_grams)
+            if similarity >= MIN_TRIGRAM_SIMILARITY:
+                scores[entry_id] = similarity
+        return scores
+
+    def _result(self, entry_id, score):
+        name, _normalized, group_id = self._entries[entry_id]
+        return {"id": entry_id, "name": name, "group_id": group_id, "score": round(score, 3)}
+
+    def search(self, query, group_id=None, limit=20):
+        """Rank entries by prefix match first, then trigram similarity; an empty query lists the group."""
+        normalized = _normalize(query)
+        if group_id is not None:
+            candidates = set(self._groups.get(group_id, ()))
+        else:
+            candidates = None
+
+        if not normalized:
+            entry_ids = self._groups.get(group_id, []) if group_id is not None else sorted(
+                self._entries, key=lambda entry_id: self._entries[entry_id][1]
+            )
+            return [self._result(entry_id, 0.0) for entry_id in entry_ids[:limit]]
+
+        scores = self._trigram_scores(normalized)
+        for entry_id, score in self._prefix_scores(normalized).items():
+            scores[entry_id] = max(scores.get(entry_id, 0.0), score)
+
+        ranked = sorted(
+            (
+                (score, entry_id)
+                for entry_id, score in scores.items()
+                if candidates is None or entry_id in candidates
+            ),
+            key=lambda item: (-item[0], self._entries[item[1]][1]),
+        )
+        return [self._result(entry_id, score) for score, entry_id in ranked[:limit]]
+
+
+_INDEX_LOADERS = {
+    "municipality": lambda: select(
+        municipality.c.municipalityid, municipality.c.municipalityname, municipality.c.districtid
+    ),
+    "district": lambda: select(district.c.districtid, district.c.districtname, district.c.provinceid),
+    "crop": lambda: select(crop_master.c.CropId, crop_master.c.CropName, crop_master.c.croptypeid),
+}
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _get_index(kind):
+    cached = _indexes.get(kind)
+    if cached and time.monotonic() - cached[0] < SEARCH_INDEX_TTL_SECONDS:
+        return cached[1]
+
+    with _indexes_lock:
+        cached = _indexes.get(kind)
+        if cached and time.monotonic() - cached[0] < SEARCH_INDEX_TTL_SECONDS:
+            return cached[1]
+        with read_engine.connect() as conn:
+            rows = conn.execute(_INDEX_LOADERS[kind]()).all()
+        index = NameIndex(tuple(row) for row in rows)
+        _indexes[kind] = (time.monotonic(), index)
+        return index
+
+
+def invalidate_search_indexes(kind=None):
+    """Drop cached indexes so the next search reloads names from the database."""
+    with _indexes_lock:
+        if kind is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(kind, None)
+
+
+def search_municipalities(query, district_id=None, limit=20):
+    results = _get_index("municipality").search(query, group_id=district_id, limit=limit)
+    return [
+        {"id": item["id"], "name": item["name"], "district_id": item["group_id"], "score": item["score"]}
+        for item in results
+    ]
+
+
+def search_districts(query, province_id=None, limit=20):
+    results = _get_index("district").search(query, group_id=province_id, limit=limit)
+    return [
+        {"id": item["id"], "name": item["name"], "province_id": item["group_id"], "score": item["score"]}
+        for item in results
+    ]
+
+
+def search_crops(query, limit=20):
+    results = _get_index("crop").search(query, limit=limit)
+    return [
+        {"id": item["id"], "name": item["name"], "croptype_id": item["group_id"], "score": item["score"]}
+        for item in results
+    ]
@@ -1,44 +1,77 @@
-from sqlalchemy import func, select
+"""Dashboard and analysis aggregates.
 
-from models import crop_master, engine, yielddata
+Statements are built once per filter shape (``lru_cache`` on the ``_*_statement``
+builders) with bound parameters for the filter values, so a call only binds
+values; SQLAlchemy reuses the memoized cache key and compiled form.
 
+The public aggregates are single-flight: identical concurrent calls (same
+arguments and read routing) wait for one query and share its result.
+"""
+from functools import lru_cache
 
-def _apply_created_by_filter(statement, created_by=None):
-    if created_by is None:
+from sqlalchemy import bindparam, func, select
+
+from models import crop_master, district, read_engine, yielddata
+from services.query_executor import fetch_all, run_queries
+from utils.db_routing import read_scope
+from utils.single_flight import coalesced
+
+
+def _apply_created_by_filter(statement, by_owner):
+    if not by_owner:
         return statement
-    return statement.where(yielddata.c.created_by == created_by)
+    return statement.where(yielddata.c.created_by == bindparam("created_by"))
+
+
+def _owner_params(created_by, **params):
+    return {"created_by": created_by, **params}
 
 
+@lru_cache(maxsize=None)
+def _sum_statement(column_name, by_owner):
+    return _apply_created_by_filter(select(func.sum(yielddata.c[column_name])), by_owner)
+
+
+@coalesced(scope=read_scope)
 def get_total_production(created_by=None):
-    with engine.connect() as conn:
-        statement = _apply_created_by_filter(select(func.sum(yielddata.c.production)), created_by)
-        return conn.execute(statement).scalar() or 0
+    with read_engine.connect() as conn:
+        statement = _sum_statement("production", created_by is not None)
+        return conn.execute(statement, _owner_params(created_by)).scalar() or 0
 
 
+@coalesced(scope=read_scope)
 def get_total_cultivated_area(created_by=None):
-    with engine.connect() as conn:
-        statement = _apply_created_by_filter(select(func.sum(yielddata.c.areaharvested)), created_by)
-        return conn.execute(statement).scalar() or 0
+    with read_engine.connect() as conn:
+        statement = _sum_statement("areaharvested", created_by is not None)
+        return conn.execute(statement, _owner_params(created_by)).scalar() or 0
 
 
+@coalesced(scope=read_scope)
 def get_average_yield(created_by=None):
     total_production = get_total_production(created_by)
     total_area = get_total_cultivated_area(created_by)
     return (total_production / total_area) if total_area else 0
 
 
-def get_trend_data(crop_id, created_by=None):
-    with engine.connect() as conn:
-        statement = (
-            select(
-                yielddata.c.year.label("year"),
-                func.sum(yielddata.c.production).label("production"),
-            )
-            .where(yielddata.c.cropid == crop_id)
-            .group_by(yielddata.c.year)
-            .order_by(yielddata.c.year)
+@lru_cache(maxsize=None)
+def _trend_statement(by_owner):
+    statement = (
+        select(
+            yielddata.c.year.label("year"),
+            func.sum(yielddata.c.production).label("production"),
         )
-        rows = conn.execute(_apply_created_by_filter(statement, created_by)).mappings().all()
+        .where(yielddata.c.cropid == bindparam("crop_id"))
+        .group_by(yielddata.c.year)
+        .order_by(yielddata.c.year)
+    )
+    return _apply_created_by_filter(statement, by_owner)
+
+
+@coalesced(scope=read_scope)
+def get_trend_data(crop_id, created_by=None):
+    with read_engine.connect() as conn:
+        statement = _trend_statement(created_by is not None)
+        rows = conn.execute(statement, _owner_params(created_by, crop_id=crop_id)).mappings().all()
 
     return {
         "years": [row["year"] for row in rows],
@@ -46,18 +79,27 @@ def get_trend_data(crop_id, created_by=None):
     }
 
 
-def get_crop_comparison(created_by=None):
-    with engine.connect() as conn:
-        statement = (
-            select(
-                crop_master.c.CropName.label("crop_name"),
-                func.sum(yielddata.c.production).label("production"),
-            )
-            .join(crop_master, yielddata.c.cropid == crop_master.c.CropId)
-            .group_by(crop_master.c.CropName)
-            .order_by(crop_master.c.CropName)
+@lru_cache(maxsize=None)
+def _crop_comparison_statement(by_owner, by_district=False):
+    statement = (
+        select(
+            crop_master.c.CropName.label("crop_name"),
+            func.sum(yielddata.c.production).label("production"),
         )
-        rows = conn.execute(_apply_created_by_filter(statement, created_by)).mappings().all()
+        .join(crop_master, yielddata.c.cropid == crop_master.c.CropId)
+        .group_by(crop_master.c.CropName)
+        .order_by(crop_master.c.CropName)
+    )
+    if by_district:
+        statement = statement.where(yielddata.c.districtid == bindparam("district_id"))
+    return _apply_created_by_filter(statement, by_owner)
+
+
+@coalesced(scope=read_scope)
+def get_crop_comparison(created_by=None):
+    with read_engine.connect() as conn:
+        statement = _crop_comparison_statement(created_by is not None)
+        rows = conn.execute(statement, _owner_params(created_by)).mappings().all()
 
     return {
         "crops": [row["crop_name"] for row in rows],
@@ -65,19 +107,11 @@ def get_crop_comparison(created_by=None):
     }
 
 
+@coalesced(scope=read_scope)
 def get_district_analysis(district_id, created_by=None):
-    with engine.connect() as conn:
-        statement = (
-            select(
-                crop_master.c.CropName.label("crop_name"),
-                func.sum(yielddata.c.production).label("production"),
-            )
-            .join(crop_master, yielddata.c.cropid == crop_master.c.CropId)
-            .where(yielddata.c.districtid == district_id)
-            .group_by(crop_master.c.CropName)
-            .order_by(crop_master.c.CropName)
-        )
-        rows = conn.execute(_apply_created_by_filter(statement, created_by)).mappings().all()
+    with read_engine.connect() as conn:
+        statement = _crop_comparison_statement(created_by is not None, by_district=True)
+        rows = conn.execute(statement, _owner_params(created_by, district_id=district_id)).mappings().all()
 
     return {
         "crops": [row["crop_name"] for row in rows],
@@ -85,19 +119,26 @@ def get_district_analysis(district_id, created_by=None):
     }
 
 
-def get_highest_producing_crop(created_by=None):
-    with engine.connect() as conn:
-        statement = (
-            select(
-                crop_master.c.CropName.label("crop_name"),
-                func.sum(yielddata.c.production).label("total_production"),
-            )
-            .join(crop_master, yielddata.c.cropid == crop_master.c.CropId)
-            .group_by(crop_master.c.CropName)
-            .order_by(func.sum(yielddata.c.production).desc())
-            .limit(1)
+@lru_cache(maxsize=None)
+def _highest_producing_crop_statement(by_owner):
+    statement = (
+        select(
+            crop_master.c.CropName.label("crop_name"),
+            func.sum(yielddata.c.production).label("total_production"),
         )
-        row = conn.execute(_apply_created_by_filter(statement, created_by)).mappings().first()
+        .join(crop_master, yielddata.c.cropid == crop_master.c.CropId)
+        .group_by(crop_master.c.CropName)
+        .order_by(func.sum(yielddata.c.production).desc())
+        .limit(1)
+    )
+    return _apply_created_by_filter(statement, by_owner)
+
+
+@coalesced(scope=read_scope)
+def get_highest_producing_crop(created_by=None):
+    with read_engine.connect() as conn:
+        statement = _highest_producing_crop_statement(created_by is not None)
+        row = conn.execute(statement, _owner_params(created_by)).mappings().first()
 
     if not row:
         return {"crop_name": "N/A", "total_production": 0}
@@ -108,55 +149,79 @@ def get_highest_producing_crop(created_by=None):
     }
 
 
+@lru_cache(maxsize=None)
+def _latest_year_statement(by_owner):
+    return _apply_created_by_filter(select(func.max(yielddata.c.year)), by_owner)
+
+
+@lru_cache(maxsize=None)
+def _year_count_statement(by_owner):
+    statement = select(func.count(yielddata.c.yieldid)).where(yielddata.c.year == bindparam("year"))
+    return _apply_created_by_filter(statement, by_owner)
+
+
+@coalesced(scope=read_scope)
 def get_latest_year_data_count(created_by=None):
-    with engine.connect() as conn:
-        latest_year_statement = _apply_created_by_filter(select(func.max(yielddata.c.year)), created_by)
-        latest_year = conn.execute(latest_year_statement).scalar()
+    by_owner = created_by is not None
+    with read_engine.connect() as conn:
+        latest_year = conn.execute(_latest_year_statement(by_owner), _owner_params(created_by)).scalar()
         if latest_year is None:
             return 0
 
-        count_statement = select(func.count(yielddata.c.yieldid)).where(yielddata.c.year == latest_year)
-        count_statement = _apply_created_by_filter(count_statement, created_by)
-        return conn.execute(count_statement).scalar() or 0
+        params = _owner_params(created_by, year=latest_year)
+        return conn.execute(_year_count_statement(by_owner), params).scalar() or 0
 
 
-def get_analysis_summary(created_by=None):
-    """Return aggregate analysis blocks for reporting and charts."""
-    with engine.connect() as conn:
-        by_year_statement = (
-            select(
-                yielddata.c.year.label("year"),
-                func.sum(yielddata.c.production).label("total_production"),
-            )
-            .group_by(yielddata.c.year)
-            .order_by(yielddata.c.year)
+@lru_cache(maxsize=None)
+def _analysis_summary_statements(by_owner):
+    by_year_statement = (
+        select(
+            yielddata.c.year.label("year"),
+            func.sum(yielddata.c.production).label("total_production"),
         )
-        by_year_rows = conn.execute(_apply_created_by_filter(by_year_statement, created_by)).mappings().all()
-
-        by_crop_statement = (
-            select(
-                crop_master.c.CropName.label("crop"),
-                func.sum(yielddata.c.production).label("total_production"),
-                func.avg(yielddata.c.yieldamount).label("avg_yield_per_hectare"),
-                func.sum(yielddata.c.areaharvested).label("total_area"),
-            )
-            .join(crop_master, yielddata.c.cropid == crop_master.c.CropId)
-            .group_by(crop_master.c.CropName)
-            .order_by(crop_master.c.CropName)
+        .group_by(yielddata.c.year)
+        .order_by(yielddata.c.year)
+    )
+
+    by_crop_statement = (
+        select(
+            crop_master.c.CropName.label("crop"),
+            func.sum(yielddata.c.production).label("total_production"),
+            func.avg(yielddata.c.yieldamount).label("avg_yield_per_hectare"),
+            func.sum(yielddata.c.areaharvested).label("total_area"),
         )
-        by_crop_rows = conn.execute(_apply_created_by_filter(by_crop_statement, created_by)).mappings().all()
-
-        by_district_statement = (
-            select(
-                yielddata.c.districtid.label("district_id"),
-                func.sum(yielddata.c.production).label("total_production"),
-                func.avg(yielddata.c.yieldamount).label("avg_yield_per_hectare"),
-                func.sum(yielddata.c.areaharvested).label("total_area"),
-            )
-            .group_by(yielddata.c.districtid)
-            .order_by(yielddata.c.districtid)
+        .join(crop_master, yielddata.c.cropid == crop_master.c.CropId)
+        .group_by(crop_master.c.CropName)
+        .order_by(crop_master.c.CropName)
+    )
+
+    by_district_statement = (
+        select(
+            yielddata.c.districtid.label("district_id"),
+            district.c.districtname.label("district_name"),
+            func.sum(yielddata.c.production).label("total_production"),
+            func.avg(yielddata.c.yieldamount).label("avg_yield_per_hectare"),
+            func.sum(yielddata.c.areaharvested).label("total_area"),
         )
-        by_district_rows = conn.execute(_apply_created_by_filter(by_district_statement, created_by)).mappings().all()
+        .join(district, yielddata.c.districtid == district.c.districtid)
+        .group_by(yielddata.c.districtid, district.c.districtname)
+        .order_by(yielddata.c.districtid)
+    )
+
+    return {
+        "by_year": _apply_created_by_filter(by_year_statement, by_owner),
+        "by_crop": _apply_created_by_filter(by_crop_statement, by_owner),
+        "by_district": _apply_created_by_filter(by_district_statement, by_owner),
+    }
+
+
+@coalesced(scope=read_scope)
+def get_analysis_summary(created_by=None):
+    """Return aggregate analysis blocks for reporting and charts."""
+    statements = _analysis_summary_statements(created_by is not None)
+    params = _owner_params(created_by)
+    rows = run_queries(read_engine, {name: fetch_all(statement, params) for name, statement in statements.items()})
+    by_year_rows, by_crop_rows, by_district_rows = rows["by_year"], rows["by_crop"], rows["by_district"]
 
     return {
         "by_year": [
@@ -175,6 +240,7 @@ def get_analysis_summary(created_by=None):
         "by_district": [
             {
                 "district_id": row["district_id"],
+                "district_name": row.get("district_name"),
                 "total_production": float(row["total_production"] or 0),
                 "avg_yield_per_hectare": float(row["avg_yield_per_hectare"] or 0),
                 "total_area": float(row["total_area"] or 0),
@@ -0,0 +1,266 @@
+import math
+from datetime import datetime
+
+from sqlalchemy import and_, func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models import engine, crop_master, district, municipality, season_master, yielddata
+from services.audit_service import log_audit
+from services.event_channel import publish_events
+from services.pivot_service import invalidate_pivot_cache
+from services.quantile_service import update_yield_sketches
+
+
+CLIENT_KEY_MAX_LENGTH = 100
+UPSERT_COLUMNS = (
+    "cropid", "districtid", "municipalityid", "seasonid",
+    "year", "areaharvested", "yieldamount", "production",
+)
+
+
+def _whole_number(value):
+    """``int`` that refuses to truncate: 2020.9 and "2020.9" are rejected."""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        return int(value)
+    number = float(value)
+    if not number.is_integer():
+        raise ValueError(f"{value!r} is not a whole number")
+    return int(number)
+
+
+def _finite_number(value):
+    """``float`` that rejects NaN and Infinity (Python's JSON parser accepts both)."""
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"{value!r} is not a finite number")
+    return number
+
+
+ITEM_FIELDS = {
+    "crop_id": ("cropid", _whole_number),
+    "district_id": ("districtid", _whole_number),
+    "municipality_id": ("municipalityid", _whole_number),
+    "season_id": ("seasonid", _whole_number),
+    "year": ("year", _whole_number),
+    "area_harvested": ("areaharvested", _finite_number),
+    "yield_amount": ("yieldamount", _finite_number),
+    "production": ("production", _finite_number),
+}
+
+STATUS_CREATED = "created"
+STATUS_UPDATED = "updated"
+STATUS_UNCHANGED = "unchanged"
+STATUS_INVALID = "invalid"
+
+
+def publish_yield_changes(conn, changes):
+    """Publish live-update deltas for committed yield writes.
+
+    ``changes`` holds ``(op, yield_id, owner_id, before, after)`` tuples where
+    ``before``/``after`` are yielddata-shaped mappings (or ``None``). Crop names
+    for every change are looked up in one query. Cached pivots in this worker
+    are dropped as well.
+    """
+    invalidate_pivot_cache()
+    crop_ids = {record["cropid"] for change in changes for record in change[3:] if record}
+    crop_names = {}
+    if crop_ids:
+        crop_names = dict(
+            conn.execute(select(crop_master.c.CropId, crop_master.c.CropName).where(crop_master.c.CropId.in_(crop_ids))).all()
+        )
+
+    def delta_row(record):
+        if not record:
+            return None
+        return {
+            "year": record["year"],
+            "crop_id": record["cropid"],
+            "crop_name": crop_names.get(record["cropid"]),
+            "district_id": record["districtid"],
+            "season_id": record["seasonid"],
+            "production": float(record["production"] or 0),
+            "area": float(record["areaharvested"] or 0),
+        }
+
+    publish_events(
+        conn,
+        [
+            ("yield", owner_id, {"op": op, "yieldid": yield_id, "removed": delta_row(before), "added": delta_row(after)})
+            for op, yield_id, owner_id, before, after in changes
+        ],
+    )
+
+
+def publish_yield_change(conn, op, yield_id, owner_id, before=None, after=None):
+    publish_yield_changes(conn, [(op, yield_id, owner_id, before, after)])
+
+
+def natural_key(row):
+    """Default idempotency key: one record per crop, place, season and year."""
+    return "nk:{cropid}:{districtid}:{municipalityid}:{seasonid}:{year}".format(**row)
+
+
+def _parse_item(item):
+    if not isinstance(item, dict):
+        return None, ["Item must be a JSON object"]
+
+    row = {}
+    errors = []
+    for field, (column, cast) in ITEM_FIELDS.items():
+        value = item.get(field)
+        if value is None or isinstance(value, bool):
+            errors.append(f"{field} is required")
+            continue
+        try:
+            row[column] = cast(value)
+        except (TypeError, ValueError, OverflowError):
+            kind = "a whole number" if cast is _whole_number else "a finite number"
+            errors.append(f"{field} must be {kind}")
+    if errors:
+        return None, errors
+
+    client_key = item.get("client_key")
+    if client_key is None:
+        client_key = natural_key(row)
+    elif not isinstance(client_key, str) or not client_key.strip() or len(client_key) > CLIENT_KEY_MAX_LENGTH:
+        return None, [f"client_key must be a non-empty string of at most {CLIENT_KEY_MAX_LENGTH} characters"]
+    row["client_key"] = client_key.strip()
+    return row, []
+
+
+def validate_yield_batch(conn, items):
+    """Parse and validate a batch of API items together.
+
+    Returns ``(rows, errors)`` aligned with ``items``: ``rows[i]`` is a
+    yielddata-shaped dict or ``None`` and ``errors[i]`` lists its problems.
+    Reference ids are checked with one query per master table.
+    """
+    current_year = datetime.now().year
+    parsed = [_parse_item(item) for item in items]
+    rows = [row for row, _errors in parsed]
+    errors = [list(item_errors) for _row, item_errors in parsed]
+    valid_rows = [row for row in rows if row is not None]
+
+    def existing(column, values):
+        values = set(values)
+        if not values:
+            return set()
+        return set(conn.execute(select(column).where(column.in_(values))).scalars().all())
+
+    crop_ids = existing(crop_master.c.CropId, (row["cropid"] for row in valid_rows))
+    district_ids = existing(district.c.districtid, (row["districtid"] for row in valid_rows))
+    season_ids = existing(season_master.c.seasonid, (row["seasonid"] for row in valid_rows))
+    municipality_ids = {row["municipalityid"] for row in valid_rows}
+    municipality_districts = dict(
+        conn.execute(
+            select(municipality.c.municipalityid, municipality.c.districtid).where(
+                municipality.c.municipalityid.in_(municipality_ids)
+            )
+        ).all()
+    ) if municipality_ids else {}
+
+    seen_keys = {}
+    for index, row in enumerate(rows):
+        if row is None:
+            continue
+        item_errors = errors[index]
+        if row["yieldamount"] < 0:
+            item_errors.append("Yield amount cannot be negative")
+        if row["production"] < 0:
+            item_errors.append("Production cannot be negative")
+        if row["areaharvested"] < 0:
+            item_errors.append("Area harvested cannot be negative")
+        if not (1900 <= row["year"] <= current_year):
+            item_errors.append(f"Year must be between 1900 and {current_year}")
+        if row["cropid"] not in crop_ids:
+            item_errors.append("Invalid crop selected")
+        if row["districtid"] not in district_ids:
+            item_errors.append("Invalid district selected")
+        if row["seasonid"] not in season_ids:
+            item_errors.append("Invalid season selected")
+        if row["municipalityid"] not in municipality_districts:
+            item_errors.append("Invalid municipality selected")
+        elif municipality_districts[row["municipalityid"]] != row["districtid"]:
+            item_errors.append("Municipality does not belong to the selected district")
+        if row["client_key"] in seen_keys:
+            item_errors.append(f"Duplicate client_key (same as item {seen_keys[row['client_key']]})")
+        else:
+            seen_keys[row["client_key"]] = index
+        if item_errors:
+            rows[index] = None
+
+    return rows, errors
+
+
+def _unchanged(existing_row, row):
+    return all(existing_row[column] == row[column] for column in UPSERT_COLUMNS)
+
+
+def _upsert_statement(rows):
+    stmt = pg_insert(yielddata).values(rows)
+    update_columns = {column: stmt.excluded[column] for column in UPSERT_COLUMNS}
+    update_columns["updated_by"] = stmt.excluded.updated_by
+    update_columns["updated_at"] = func.now()
+    return stmt.on_conflict_do_update(
+        index_elements=[yielddata.c.created_by, yielddata.c.client_key],
+        set_=update_columns,
+    ).returning(
+        yielddata.c.yieldid,
+        yielddata.c.client_key,
+        literal_column("(xmax = 0)").label("inserted"),
+    )
+
+
+def bulk_upsert_yields(items, user_id):
+    """Validate and upsert API yield items in a single ``INSERT ... ON CONFLICT``.
+
+    Records are keyed on ``(created_by, client_key)``, so resubmitting a batch
+    updates rather than duplicates. Items identical to the stored row are
+    reported as unchanged and not rewritten. Returns one result per item.
+    """
+    results = [{"index": index, "client_key": None, "status": STATUS_INVALID} for index in range(len(items))]
+
+    with engine.connect() as conn:
+        rows, errors = validate_yield_batch(conn, items)
+        for index, row in enumerate(rows):
+            if row is None:
+                results[index]["errors"] = errors[index]
+            else:
+                results[index]["client_key"] = row["client_key"]
+
+        keyed_rows = {row["client_key"]: (index, row) for index, row in enumerate(rows) if row is not None}
+        existing = {}
+        if keyed_rows:
+            existing_rows = conn.execute(
+                select(yielddata).where(
+                    and_(yielddata.c.created_by == user_id, yielddata.c.client_key.in_(list(keyed_rows)))
+                )
+            ).mappings().all()
+            existing = {row["client_key"]: row for row in existing_rows}
+
+        pending = []
+        for client_key, (index, row) in keyed_rows.items():
+            current = existing.get(client_key)
+            if current is not None and _unchanged(current, row):
+                results[index].update(status=STATUS_UNCHANGED, yieldid=current["yieldid"])
+            else:
+                pending.append({**row, "created_by": user_id, "updated_by": user_id})
+
+        changes = []
+        if pending:
+            written = conn.execute(_upsert_statement(pending)).mappings().all()
+            for written_row in written:
+                index, row = keyed_rows[written_row["client_key"]]
+                status = STATUS_CREATED if written_row["inserted"] else STATUS_UPDATED
+                results[index].update(status=status, yieldid=written_row["yieldid"])
+                before = existing.get(written_row["client_key"]) if status == STATUS_UPDATED else None
+                changes.append(("insert" if before is None else "update", written_row["yieldid"], user_id, before, row))
+            update_yield_sketches(conn, [(before, after) for _op, _id, _owner, before, after in changes])
+            conn.commit()
+            publish_yield_changes(conn, changes)
+
+    if changes:
+        log_audit("BULK_UPSERT", "yielddata", user_id=user_id, details=f"{len(changes)} records")
+    return results
@@ -0,0 +1,6 @@
+/** Purges utilities against the Jinja templates (including classes built in inline scripts). */
+module.exports = {
+  content: ["./templates/**/*.html"],
+  theme: { extend: {} },
+  plugins: [],
+};
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from app import create_app
+from config import Config
+from utils.admission import (
+    CLASS_ANALYSIS,
+    CLASS_EXPORT,
+    CLASS_OLTP,
+    AdmissionController,
+    AdmissionRejected,
+    pool_sized_limits,
+    request_class,
+)
+from utils.metrics import metrics
+
+
+def make_controller(**overrides):
+    options = {"limits": {"export": 1, "analysis": 1, "oltp": 3}, "queue_sizes": {"export": 0, "analysis": 1, "oltp": 0}}
+    options.update(overrides)
+    return AdmissionController(queue_timeout=0.05, retry_after=7, **options)
+
+
+def test_full_queue_rejects_at_once_and_queued_request_times_out():
+    controller = make_controller()
+    ticket = controller.admit(CLASS_ANALYSIS)
+    rejections = []
+
+    def queued():
+        try:
+            controller.admit(CLASS_ANALYSIS)
+        except AdmissionRejected as exc:
+            rejections.append(exc.reason)
+
+    waiter = threading.Thread(target=queued)
+    waiter.start()
+    while controller.stats()[CLASS_ANALYSIS]["waiting"] == 0:
+        time.sleep(0.001)
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.admit(CLASS_ANALYSIS)
+    waiter.join()
+
+    assert excinfo.value.reason == "queue_full" and excinfo.value.retry_after == 7
+    assert rejections == ["timeout"]
+    ticket.release()
+    ticket.release()
+    assert controller.stats()[CLASS_ANALYSIS] == {"active": 0, "waiting": 0}
+    assert controller.admit(CLASS_ANALYSIS) is not None
+
+
+def test_reserved_oltp_slots_only_admit_writes():
+    controller = make_controller(write_reserve=2)
+    controller.admit(CLASS_OLTP)
+
+    with pytest.raises(AdmissionRejected):
+        controller.admit(CLASS_OLTP)
+    controller.admit(CLASS_OLTP, write=True)
+    controller.admit(CLASS_OLTP, write=True)
+    with pytest.raises(AdmissionRejected):
+        controller.admit(CLASS_OLTP, write=True)
+
+
+def test_unset_limits_fit_the_connection_pool():
+    unset = {CLASS_EXPORT: None, CLASS_ANALYSIS: None, CLASS_OLTP: None}
+    assert pool_sized_limits(unset, 15, background_connections=2) == {"export": 2, "analysis": 4, "oltp": 7}
+
+    # With fan-out every analysis request holds five connections.
+    fanout = pool_sized_limits(unset, 15, background_connections=2, analysis_connections=5)
+    assert fanout == {"export": 2, "analysis": 1, "oltp": 6}
+    assert fanout[CLASS_EXPORT] + 5 * fanout[CLASS_ANALYSIS] + fanout[CLASS_OLTP] <= 15 - 2
+
+    assert pool_sized_limits({**unset, CLASS_OLTP: 20}, 15)[CLASS_OLTP] == 20
+
+
+def test_export_job_submission_uses_export_slots():
+    assert request_class("main.submit_export_job", "main") == CLASS_EXPORT
+
+
+def test_overflowing_analysis_request_gets_503_with_retry_after(monkeypatch):
+    monkeypatch.setattr(Config, "ADMISSION_LIMITS", {"export": 1, "analysis": 1, "oltp": 4})
+    monkeypatch.setattr(Config, "ADMISSION_QUEUE_SIZES", {"export": 0, "analysis": 0, "oltp": 0})
+    app = create_app()
+    metrics.reset()
+    busy = app.extensions["admission"].admit(CLASS_ANALYSIS)
+
+    response = app.test_client().get("/analysis/summary", headers={"Accept": "application/json"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(Config.ADMISSION_RETRY_AFTER_SECONDS)
+    assert response.get_json()["class"] == "analysis"
+    assert metrics.snapshot()["counters"]["admission_rejected{reason=queue_full,request_class=analysis}"] == 1
+    busy.release()
+    assert app.test_client().get("/analysis/summary").status_code != 503
@@ -13,7 +13,7 @@ def test_get_trend_data_shape(monkeypatch):
             ]
 
     class FakeConn:
-        def execute(self, _query):
+        def execute(self, _query, *_args):
             return FakeResult()
 
     class FakeCtx:
@@ -27,7 +27,7 @@ def test_get_trend_data_shape(monkeypatch):
         def connect(self):
             return FakeCtx()
 
-    monkeypatch.setattr(yield_service, "engine", FakeEngine())
+    monkeypatch.setattr(yield_service, "read_engine", FakeEngine())
     data = yield_service.get_trend_data(1)
 
     assert data["years"] == [2021, 2022]
@@ -46,7 +46,7 @@ def test_get_crop_comparison_shape(monkeypatch):
             ]
 
     class FakeConn:
-        def execute(self, _query):
+        def execute(self, _query, *_args):
             return FakeResult()
 
     class FakeCtx:
@@ -60,7 +60,7 @@ def test_get_crop_comparison_shape(monkeypatch):
         def connect(self):
             return FakeCtx()
 
-    monkeypatch.setattr(yield_service, "engine", FakeEngine())
+    monkeypatch.setattr(yield_service, "read_engine", FakeEngine())
     data = yield_service.get_crop_comparison()
 
     assert data["crops"] == ["Rice", "Maize"]
@@ -81,7 +81,7 @@ def test_get_analysis_summary_keys(monkeypatch):
             return self._rows
 
     class FakeConn:
-        def execute(self, _query):
+        def execute(self, _query, *_args):
             call_index["n"] += 1
             if call_index["n"] == 1:
                 return FakeResult([{"year": 2023, "total_production": 100}])
@@ -114,8 +114,119 @@ def test_get_analysis_summary_keys(monkeypatch):
         def connect(self):
             return FakeCtx()
 
-    monkeypatch.setattr(yield_service, "engine", FakeEngine())
+    monkeypatch.setattr(yield_service, "read_engine", FakeEngine())
     summary = yield_service.get_analysis_summary()
 
     assert set(summary.keys()) == {"by_year", "by_crop", "by_district"}
     assert summary["by_year"][0]["year"] == 2023
+
+
+def test_get_geography_rollup_builds_tree(monkeypatch):
+    from services import geography_service
+
+    def make_row(province_id, district_id, province_grouping, district_grouping, production):
+        return {
+            "province_id": province_id,
+            "province_name": f"Province {province_id}" if province_id else None,
+            "district_id": district_id,
+            "district_name": f"District {district_id}" if district_id else None,
+            "province_grouping": province_grouping,
+            "district_grouping": district_grouping,
+            "root_name": "National",
+            "municipality_type": None,
+            "total_production": production,
+            "total_area": 10,
+            "avg_yield_per_hectare": 2.0,
+            "records": 1,
+        }
+
+    rows = [
+        make_row(1, 11, 0, 0, 40),
+        make_row(None, None, 1, 1, 100),
+        make_row(2, None, 0, 1, 60),
+        make_row(1, None, 0, 1, 40),
+        make_row(2, 21, 0, 0, 60),
+    ]
+
+    class FakeResult:
+        def mappings(self):
+            return self
+
+        def all(self):
+            return rows
+
+    class FakeConn:
+        def execute(self, _query, *_args):
+            return FakeResult()
+
+    class FakeCtx:
+        def __enter__(self):
+            return FakeConn()
+
+        def __exit__(self, *_args):
+            return False
+
+    class FakeEngine:
+        def connect(self):
+            return FakeCtx()
+
+    monkeypatch.setattr(geography_service, "read_engine", FakeEngine())
+    tree = geography_service.get_geography_rollup(depth=2)
+
+    assert tree["level"] == "national"
+    assert tree["total_production"] == 100.0
+    assert [node["name"] for node in tree["children"]] == ["Province 1", "Province 2"]
+    assert tree["children"][1]["children"][0]["id"] == 21
+    assert tree["children"][1]["children"][0]["level"] == "district"
+
+
+def test_statements_are_reused_per_filter_shape_with_bound_values(monkeypatch):
+    executed = []
+
+    class FakeResult:
+        def mappings(self):
+            return self
+
+        def all(self):
+            return []
+
+    class FakeConn:
+        def execute(self, query, params=None):
+            executed.append((query, params))
+            return FakeResult()
+
+    class FakeCtx:
+        def __enter__(self):
+            return FakeConn()
+
+        def __exit__(self, *_args):
+            return False
+
+    class FakeEngine:
+        def connect(self):
+            return FakeCtx()
+
+    monkeypatch.setattr(yield_service, "read_engine", FakeEngine())
+    yield_service.get_trend_data(1, created_by=7)
+    yield_service.get_trend_data(2, created_by=8)
+    yield_service.get_trend_data(3)
+
+    (first, first_params), (second, second_params), (unowned, _params) = executed
+    assert first is second
+    assert unowned is not first
+    assert first_params == {"created_by": 7, "crop_id": 1}
+    assert second_params == {"created_by": 8, "crop_id": 2}
+    assert "created_by" not in str(unowned)
+
+
+def test_full_report_query_binds_filters_into_a_shared_template():
+    from services.export_service import build_full_report_query
+
+    first, first_params = build_full_report_query(year=2023, crop_id=1, owner_id=5)
+    second, second_params = build_full_report_query(year=2024, crop_id=2, owner_id=6)
+    other_shape, _params = build_full_report_query(year=2024)
+
+    assert first is second
+    assert other_shape is not first
+    assert first_params == {"year": 2023, "crop_id": 1, "owner_id": 5}
+    assert second_params == {"year": 2024, "crop_id": 2, "owner_id": 6}
@@ -0,0 +1,67 @@
+from services import anomaly_service
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def partitions(self):
+        yield self._rows[:3]
+        yield self._rows[3:]
+
+
+class FakeConn:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execution_options(self, **_options):
+        return self
+
+    def execute(self, _query, *_args, **_kwargs):
+        return FakeResult(self.rows)
+
+
+class FakeCtx:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __enter__(self):
+        return FakeConn(self.rows)
+
+    def __exit__(self, *_args):
+        return False
+
+
+class FakeEngine:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def connect(self):
+        return FakeCtx(self.rows)
+
+
+def _rows():
+    # (yieldid, cropid, districtid, seasonid, year, yieldamount, production, areaharvested)
+    rows = [(index, 1, 1, 1, 2015 + index, 3.0 + index * 0.1, (3.0 + index * 0.1) * 10, 10.0) for index in range(1, 7)]
+    # Entered in kg instead of tonnes.
+    rows.append((7, 1, 1, 1, 2023, 3100.0, 31000.0, 10.0))
+    # A separate group with a missing season and zero area: too small to flag, ratio undefined.
+    rows.append((8, 2, 1, None, 2023, 500.0, 0.0, 0.0))
+    return rows
+
+
+def test_outliers_flagged_per_group_with_both_methods(monkeypatch):
+    monkeypatch.setattr(anomaly_service, "read_engine", FakeEngine(_rows()))
+    arrays = anomaly_service.load_yield_arrays()
+
+    assert arrays["yieldid"].tolist() == list(range(1, 9))
+    assert arrays["seasonid"].tolist()[-1] == -1
+
+    robust = anomaly_service.detect_outliers(arrays)
+    assert [item["yieldid"] for item in robust] == [7]
+    assert set(robust[0]["metrics"]) == {"yieldamount", "production", "yield_ratio"}
+    assert robust[0]["metrics"]["yieldamount"]["median"] == 3.4
+
+    iqr = anomaly_service.detect_outliers(arrays, method=anomaly_service.METHOD_IQR)
+    assert [item["yieldid"] for item in iqr] == [7]
+    assert anomaly_service.rank_outliers(robust + iqr)[0]["metrics"]["yieldamount"]["score"] > 100
@@ -0,0 +1,60 @@
+import gzip
+import json
+
+from flask import url_for
+
+from app import create_app
+from utils.assets import asset_url
+
+
+def test_built_assets_are_fingerprinted_precompressed_and_immutable(tmp_path):
+    app = create_app()
+    app.static_folder = str(tmp_path)
+    dist = tmp_path / "dist"
+    dist.mkdir()
+    (dist / "app.abc123.css").write_text("body{color:red}")
+    (dist / "app.abc123.css.gz").write_bytes(gzip.compress(b"body{color:red}"))
+    (dist / "manifest.json").write_text(json.dumps({"app.css": "app.abc123.css"}))
+
+    with app.test_request_context():
+        assert asset_url("app.css") == "/assets/app.abc123.css"
+        assert asset_url("missing.js") is None
+
+    client = app.test_client()
+    compressed = client.get("/assets/app.abc123.css", headers={"Accept-Encoding": "gzip, br"})
+    assert compressed.status_code == 200
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["Content-Type"].startswith("text/css")
+    assert "immutable" in compressed.headers["Cache-Control"]
+    assert gzip.decompress(compressed.data) == b"body{color:red}"
+
+    plain = client.get("/assets/app.abc123.css")
+    assert "Content-Encoding" not in plain.headers
+    assert plain.data == b"body{color:red}"
+    assert client.get("/assets/../config.py").status_code == 404
+
+
+def test_manifest_is_revalidated_instead_of_cached_immutably(tmp_path):
+    app = create_app()
+    app.static_folder = str(tmp_path)
+    dist = tmp_path / "dist"
+    dist.mkdir()
+    (dist / "manifest.json").write_text(json.dumps({"app.css": "app.abc123.css"}))
+
+    response = app.test_client().get("/assets/manifest.json")
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "no-cache"
+
+
+def test_login_page_uses_built_css_instead_of_the_tailwind_cdn(tmp_path):
+    app = create_app()
+    app.static_folder = str(tmp_path)
+    dist = tmp_path / "dist"
+    dist.mkdir()
+    (dist / "manifest.json").write_text(json.dumps({"app.css": "app.abc123.css"}))
+
+    with app.test_request_context():
+        login_url = url_for("auth.login")
+    page = app.test_client().get(login_url).get_data(as_text=True)
+    assert 'href="/assets/app.abc123.css"' in page
+    assert "cdn.tailwindcss.com" not in page
@@ -0,0 +1,181 @@
+import json
+
+from sqlalchemy.dialects import postgresql
+
+from app import create_app
+from services import auth_service, yield_write_service
+from utils import security
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def scalars(self):
+        return self
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return self._rows
+
+
+class FakeConn:
+    def __init__(self, existing):
+        self.existing = existing
+        self.upserts = []
+        self.sketch_writes = []
+        self.notifications = []
+        self.committed = False
+
+    def execute(self, query, params=None, **_kwargs):
+        sql = str(query.compile(dialect=postgresql.dialect()))
+        if "pg_notify" in sql:
+            self.notifications.append((params["payloads"], self.committed))
+            return FakeResult([])
+        if sql.startswith("INSERT INTO yielddata"):
+            self.upserts.append(sql)
+            rows = query.compile(dialect=postgresql.dialect()).params
+            keys = sorted(value for name, value in rows.items() if name.startswith("client_key"))
+            return FakeResult(
+                [{"yieldid": 100 + index, "client_key": key, "inserted": key != "known"} for index, key in enumerate(keys)]
+            )
+        if "yield_sketches" in sql:
+            self.sketch_writes.append((sql, self.committed))
+            return FakeResult([])
+        if "FROM crop_master" in sql and "CropName" in sql:
+            return FakeResult([(1, "Rice")])
+        if "FROM crop_master" in sql:
+            return FakeResult([1])
+        if "FROM mastersetup.district" in sql:
+            return FakeResult([2])
+        if "FROM season_master" in sql:
+            return FakeResult([3])
+        if "FROM mastersetup.municipality" in sql:
+            return FakeResult([(4, 2)])
+        if "FROM yielddata" in sql:
+            return FakeResult(self.existing)
+        raise AssertionError(sql)
+
+    def commit(self):
+        self.committed = True
+
+
+class FakeCtx:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, *_args):
+        return False
+
+
+class FakeEngine:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def connect(self):
+        return FakeCtx(self.conn)
+
+
+def _record(**overrides):
+    record = {
+        "crop_id": 1,
+        "district_id": 2,
+        "municipality_id": 4,
+        "season_id": 3,
+        "year": 2024,
+        "area_harvested": 5,
+        "yield_amount": 2,
+        "production": 10,
+    }
+    record.update(overrides)
+    return record
+
+
+def test_bulk_upsert_validates_together_and_reports_per_item(monkeypatch):
+    existing = [
+        {
+            "yieldid": 7, "client_key": "same", "cropid": 1, "districtid": 2, "municipalityid": 4, "seasonid": 3,
+            "year": 2024, "areaharvested": 5.0, "yieldamount": 2.0, "production": 10.0,
+        },
+        {
+            "yieldid": 8, "client_key": "known", "cropid": 1, "districtid": 2, "municipalityid": 4, "seasonid": 3,
+            "year": 2023, "areaharvested": 1.0, "yieldamount": 1.0, "production": 1.0,
+        },
+    ]
+    conn = FakeConn(existing)
+    monkeypatch.setattr(yield_write_service, "engine", FakeEngine(conn))
+
+    results = yield_write_service.bulk_upsert_yields(
+        [
+            _record(client_key="same"),
+            _record(client_key="known"),
+            _record(year=2022),
+            _record(client_key="bad", municipality_id=99, production=-1),
+            _record(client_key="same"),
+        ],
+        user_id=5,
+    )
+
+    assert [result["status"] for result in results] == ["unchanged", "updated", "created", "invalid", "invalid"]
+    assert results[0]["yieldid"] == 7
+    assert results[2]["client_key"] == "nk:1:2:4:3:2022"
+    assert set(results[3]["errors"]) == {"Production cannot be negative", "Invalid municipality selected"}
+    assert results[4]["errors"] == ["Duplicate client_key (same as item 0)"]
+
+    assert len(conn.upserts) == 1 and conn.committed
+    assert "ON CONFLICT (created_by, client_key) DO UPDATE" in conn.upserts[0]
+    assert conn.sketch_writes and not any(committed for _sql, committed in conn.sketch_writes)
+    [(payloads, committed)] = conn.notifications
+    assert committed
+    assert [json.loads(payload)["data"]["op"] for payload in payloads] == ["update", "insert"]
+
+
+def test_bulk_endpoint_requires_bearer_token_and_skips_csrf(monkeypatch):
+    app = create_app()
+    client = app.test_client()
+    monkeypatch.setattr(security, "get_user_by_id", lambda user_id: {"id": user_id, "role": "Farmer"})
+    captured = {}
+
+    def fake_upsert(items, user_id):
+        captured.update(items=items, user_id=user_id)
+        return [{"index": 0, "client_key": "k", "status": "created", "yieldid": 1}]
+
+    monkeypatch.setattr("api_routes.bulk_upsert_yields", fake_upsert)
+
+    assert client.post("/api/yields/bulk", json=[_record()]).status_code == 401
+
+    with app.app_context():
+        token = auth_service.generate_api_token(5)
+    response = client.post("/api/yields/bulk", json=[_record()], headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    assert response.get_json()["summary"] == {"created": 1}
+    assert captured["user_id"] == 5
+
+
+def test_bulk_upsert_rejects_fractional_ids_and_non_finite_amounts_per_item(monkeypatch):
+    conn = FakeConn([])
+    monkeypatch.setattr(yield_write_service, "engine", FakeEngine(conn))
+
+    results = yield_write_service.bulk_upsert_yields(
+        [
+            _record(year=2020.9),
+            _record(production=float("nan")),
+            _record(area_harvested=float("inf")),
+            _record(yield_amount=10**400),
+            _record(year=2022.0),
+        ],
+        user_id=5,
+    )
+
+    assert [result["status"] for result in results] == ["invalid", "invalid", "invalid", "invalid", "created"]
+    assert results[0]["errors"] == ["year must be a whole number"]
+    assert results[1]["errors"] == ["production must be a finite number"]
+    assert results[2]["errors"] == ["area_harvested must be a finite number"]
+    assert results[3]["errors"] == ["yield_amount must be a finite number"]
+    assert results[4]["client_key"] == "nk:1:2:4:3:2022"
@@ -0,0 +1,182 @@
+from datetime import datetime, timedelta
+
+import routes
+from app import create_app
+from services import change_feed_service
+from utils import security
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return self._rows
+
+
+class FakeConn:
+    def __init__(self, upserts, deletes, queries):
+        self.upserts = upserts
+        self.deletes = deletes
+        self.queries = queries
+
+    def execute(self, query, *_args, **_kwargs):
+        compiled = query.compile()
+        self.queries.append((str(compiled), compiled.params))
+        if "FROM change_tombstones" in str(compiled):
+            return FakeResult(self.deletes)
+        return FakeResult(self.upserts)
+
+
+class FakeCtx:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, *_args):
+        return False
+
+
+class FakeEngine:
+    def __init__(self, upserts, deletes):
+        self.queries = []
+        self.upserts = upserts
+        self.deletes = deletes
+
+    def connect(self):
+        return FakeCtx(FakeConn(self.upserts, self.deletes, self.queries))
+
+
+def test_change_feed_merges_upserts_and_tombstones_and_advances_watermarks(monkeypatch):
+    upserts = [
+        {"yieldid": 4, "updated_at": datetime(2024, 5, 1, 10, 0), "production": 1.0},
+        {"yieldid": 2, "updated_at": datetime(2024, 5, 1, 12, 0), "production": 2.0},
+    ]
+    deletes = [{"id": 9, "entity": "yield", "entity_id": 3, "deleted_at": datetime(2024, 5, 1, 11, 0)}]
+    fake_engine = FakeEngine(upserts, deletes)
+    monkeypatch.setattr(change_feed_service, "engine", fake_engine)
+
+    page = change_feed_service.get_changes("yield", limit=2, owner_id=7)
+
+    assert [(change["op"], change["id"]) for change in page["changes"]] == [("upsert", 4), ("delete", 3), ("upsert", 2)]
+    assert page["changes"][0]["record"]["updated_at"] == "2024-05-01T10:00:00"
+    assert page["has_more"] is True
+    assert all(7 in params.values() for _sql, params in fake_engine.queries)
+
+    upsert_mark, delete_mark = change_feed_service.parse_feed_cursor(page["next_cursor"])
+    assert upsert_mark == (datetime(2024, 5, 1, 12, 0), 2)
+    assert delete_mark == (datetime(2024, 5, 1, 11, 0), 9)
+
+    fake_engine.queries.clear()
+    fake_engine.upserts, fake_engine.deletes = [], []
+    empty = change_feed_service.get_changes("yield", cursor=page["next_cursor"], limit=2)
+    sql, params = fake_engine.queries[0]
+    assert "(yielddata.updated_at > :updated_at_1 OR yielddata.updated_at = :updated_at_2 AND yielddata.yieldid > :yieldid_1)" in sql
+    assert params["yieldid_1"] == 2
+    assert empty["changes"] == [] and empty["has_more"] is False
+    assert empty["next_cursor"] == page["next_cursor"]
+
+
+def test_record_tombstone_inserts_in_callers_transaction():
+    executed = []
+
+    class Conn:
+        def execute(self, statement):
+            executed.append(statement.compile().params)
+
+    change_feed_service.record_tombstone(Conn(), "crop", 5, deleted_by=1)
+    assert executed == [{"entity": "crop", "entity_id": 5, "owner_id": None, "deleted_by": 1}]
+
+
+def test_change_watermark_reads_latest_timestamps_without_counting(monkeypatch):
+    class WatermarkResult:
+        def one(self):
+            return (datetime(2024, 1, 2), None, datetime(2024, 1, 1))
+
+    class WatermarkConn(FakeConn):
+        def execute(self, query, *_args, **_kwargs):
+            super().execute(query)
+            return WatermarkResult()
+
+    class WatermarkEngine(FakeEngine):
+        def connect(self):
+            return FakeCtx(WatermarkConn(self.upserts, self.deletes, self.queries))
+
+    fake_engine = WatermarkEngine([], [])
+    monkeypatch.setattr(change_feed_service, "read_engine", fake_engine)
+
+    assert change_feed_service.get_change_watermark() == "2024-01-02 00:00:00:None:2024-01-01 00:00:00"
+    [(sql, params)] = fake_engine.queries
+    assert "count(" not in sql
+    assert "max(yielddata.updated_at)" in sql and "max(change_tombstones.deleted_at)" in sql
+    assert params["entity_1"] == "yield"
+
+
+class ClockedResult(FakeResult):
+    def first(self):
+        return self._rows[0] if self._rows else None
+
+    def __iter__(self):
+        return iter(self._rows)
+
+
+class ClockedDatabase:
+    """Fake connection whose ``now()`` runs on the database clock (Nepal time, not UTC)."""
+
+    def __init__(self, now):
+        self.now = now
+        self.updated_at = {}
+
+    def connect(self):
+        return FakeCtx(self)
+
+    def commit(self):
+        pass
+
+    def execute(self, statement, *_args, **_kwargs):
+        compiled = statement.compile()
+        sql = str(compiled)
+        if sql.startswith("UPDATE"):
+            table = sql.split()[1]
+            self.updated_at[table] = self.now if "updated_at=now()" in sql else compiled.params["updated_at"]
+            return ClockedResult([])
+        if "FOR UPDATE" in sql or " IN (" in sql or '"CropName" =' in sql:
+            return ClockedResult([])
+        if "FROM yielddata" in sql:
+            return ClockedResult([{
+                "yieldid": 1, "cropid": 1, "districtid": 2, "municipalityid": 3, "seasonid": 1, "year": 2024,
+                "areaharvested": 1.0, "yieldamount": 1.0, "production": 1.0, "created_by": 5,
+            }])
+        return ClockedResult([{"CropId": 1, "CropName": "Rice", "croptypeid": 1}])
+
+
+def test_edits_are_stamped_by_the_database_clock_so_the_feed_sees_them(monkeypatch):
+    database_now = datetime.utcnow() + timedelta(hours=5, minutes=45)
+    # What a consumer was handed just before the edits.
+    watermark = database_now - timedelta(seconds=1)
+    database = ClockedDatabase(database_now)
+    monkeypatch.setattr(routes, "engine", database)
+    monkeypatch.setattr(security, "get_user_by_id", lambda user_id: {"id": user_id, "role": "Admin"})
+
+    app = create_app()
+    app.config.update(EVENTS_CHANNEL="local")
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session.update(user_id=5, role="Admin", csrf_token="token")
+
+    client.post("/master/crop/1/edit", data={"crop_name": "Paddy", "croptype_id": "1", "csrf_token": "token"})
+    client.post(
+        "/yield/1/edit",
+        data={
+            "crop_id": "1", "district_id": "2", "municipality_id": "3", "season_id": "1", "year": "2024",
+            "area_harvested": "2", "yield_amount": "3", "production": "6", "csrf_token": "token",
+        },
+    )
+
+    assert set(database.updated_at) == {"crop_master", "yielddata"}
+    assert all(updated_at > watermark for updated_at in database.updated_at.values())
@@ -0,0 +1,61 @@
+import gzip
+
+from flask import Flask, Response
+
+from utils.compression import CompressionMiddleware, negotiate_encoding
+from utils.metrics import metrics
+
+
+LEVELS = {"text/html": {"gzip": 6}, "text/csv": {"gzip": 6}}
+
+
+def _app():
+    app = Flask(__name__)
+
+    @app.route("/big")
+    def big():
+        return "<p>yield</p>" * 500
+
+    @app.route("/small")
+    def small():
+        return "ok"
+
+    @app.route("/stream")
+    def stream():
+        return Response((f"row,{i}\n" for i in range(200)), mimetype="text/csv")
+
+    @app.route("/binary")
+    def binary():
+        return Response(b"\x00" * 5000, mimetype="application/zip")
+
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app, levels=LEVELS, min_size=256)
+    return app
+
+
+def test_negotiate_encoding_respects_quality():
+    assert negotiate_encoding("gzip, deflate", ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding("br;q=0, gzip", ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding("identity", ["gzip"]) is None
+
+
+def test_middleware_compresses_large_and_streamed_bodies_only():
+    metrics.reset()
+    client = _app().test_client()
+    headers = {"Accept-Encoding": "gzip"}
+
+    big = client.get("/big", headers=headers)
+    assert big.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in big.headers["Vary"]
+    assert gzip.decompress(big.data) == ("<p>yield</p>" * 500).encode()
+
+    streamed = client.get("/stream", headers=headers)
+    assert streamed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(streamed.data).decode().count("\n") == 200
+
+    assert "Content-Encoding" not in client.get("/small", headers=headers).headers
+    assert "Content-Encoding" not in client.get("/binary", headers=headers).headers
+    assert "Content-Encoding" not in client.get("/big").headers
+
+    counters = metrics.snapshot()["counters"]
+    assert counters["compression_responses{encoding=gzip}"] == 2
+    assert counters["compression_bytes_saved{encoding=gzip}"] > 0
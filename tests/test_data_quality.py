@@ -0,0 +1,107 @@
+import csv
+import json
+
+from services import data_quality_service
+
+
+def _row(yieldid, **overrides):
+    row = {
+        "yieldid": yieldid,
+        "cropid": 1,
+        "districtid": 2,
+        "municipalityid": 3,
+        "seasonid": 1,
+        "year": 2020 + yieldid,
+        "created_by": 5,
+        "yieldamount": 2.0,
+        "areaharvested": 4.0,
+        "production": 8.0,
+        "municipality_districtid": 2,
+        "duplicate_count": 1,
+        "duplicate_rank": 1,
+    }
+    row.update(overrides)
+    return row
+
+
+ROWS = [
+    _row(1),
+    _row(2, production=80.0),
+    _row(3, municipality_districtid=9),
+    _row(4, duplicate_count=2, duplicate_rank=1),
+    _row(5, duplicate_count=2, duplicate_rank=2, municipality_districtid=None),
+]
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def mappings(self):
+        return self
+
+    def partitions(self, size):
+        for start in range(0, len(self._rows), size):
+            yield self._rows[start:start + size]
+
+
+class FakeConn:
+    def execution_options(self, **_options):
+        return self
+
+    def execute(self, query, *_args, **_kwargs):
+        after = query.compile().params["yieldid_1"]
+        return FakeResult([row for row in ROWS if row["yieldid"] > after])
+
+
+class FakeCtx:
+    def __enter__(self):
+        return FakeConn()
+
+    def __exit__(self, *_args):
+        return False
+
+
+class FakeEngine:
+    def connect(self):
+        return FakeCtx()
+
+
+def _report_rules(path):
+    with open(path, newline="", encoding="utf-8") as report:
+        return [(int(row["yieldid"]), row["rule"]) for row in csv.DictReader(report)]
+
+
+def test_scan_flags_rules_and_resumes_from_checkpoint(monkeypatch, tmp_path):
+    monkeypatch.setattr(data_quality_service, "read_engine", FakeEngine())
+    report_path = str(tmp_path / "violations.csv")
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+
+    first = data_quality_service.scan_yield_quality(report_path, checkpoint_path, chunk_size=2, max_chunks=1)
+    assert first["last_yieldid"] == 2 and first["finished_at"] is None
+
+    # Simulate a crash after writing report lines but before checkpointing them.
+    with open(report_path, "a", encoding="utf-8") as report:
+        report.write("99,partial,line,,,,,,\n")
+
+    final = data_quality_service.scan_yield_quality(report_path, checkpoint_path, chunk_size=2)
+    assert final["rows_scanned"] == 5 and final["finished_at"]
+    assert final["violations"] == {"production_mismatch": 1, "municipality_district": 2, "duplicate_entry": 2}
+    assert _report_rules(report_path) == [
+        (2, "production_mismatch"),
+        (3, "municipality_district"),
+        (4, "duplicate_entry"),
+        (5, "municipality_district"),
+        (5, "duplicate_entry"),
+    ]
+    with open(checkpoint_path, encoding="utf-8") as checkpoint:
+        assert json.load(checkpoint)["last_yieldid"] == 5
+
+
+def test_scan_query_reads_only_rows_after_checkpoint():
+    sql = str(data_quality_service._scan_query(100).compile())
+    assert "OVER" not in sql
+    # The checkpoint filter applies to the scanned rows, not inside a table-wide subquery.
+    assert sql.rindex("WHERE yielddata.yieldid >") > sql.index("JOIN LATERAL")
+    assert "duplicate.cropid = yielddata.cropid" in sql
+    assert "duplicate.seasonid IS NOT DISTINCT FROM yielddata.seasonid" in sql
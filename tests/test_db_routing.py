@@ -0,0 +1,136 @@
+import contextvars
+
+from utils.db_routing import ReadReplicaRouter, prefer_primary_for_request, record_write
+
+
+def test_router_round_robins_replicas_and_sticks_to_primary_after_write():
+    router = ReadReplicaRouter("primary", ["replica-a", "replica-b"])
+
+    def resolve_after(session_state, write=False):
+        prefer_primary_for_request(session_state)
+        if write:
+            record_write(session_state, 10)
+        return router.resolve()
+
+    session_state = {}
+    assert contextvars.copy_context().run(resolve_after, session_state) == "replica-a"
+    assert contextvars.copy_context().run(resolve_after, session_state) == "replica-b"
+    assert contextvars.copy_context().run(resolve_after, session_state, True) == "primary"
+    assert contextvars.copy_context().run(resolve_after, session_state) == "primary"
+    assert contextvars.copy_context().run(resolve_after, {}) == "replica-a"
+
+
+def test_router_without_replicas_uses_primary():
+    assert ReadReplicaRouter("primary").resolve() == "primary"
+
+
+class FakeConnection:
+    class dialect:
+        name = "postgresql"
+
+    def __init__(self):
+        self.options = {}
+        self.executed = []
+        self.rolled_back = 0
+        self.closed = False
+
+    def execution_options(self, **options):
+        self.options.update(options)
+        return self
+
+    def execute(self, statement, parameters=None, *, execution_options=None):
+        self.executed.append((statement, execution_options))
+        return statement
+
+    def in_transaction(self):
+        return True
+
+    def rollback(self):
+        self.rolled_back += 1
+
+    def close(self):
+        self.closed = True
+
+
+class FakeEngine:
+    def __init__(self):
+        self.opened = []
+
+    def connect(self):
+        self.opened.append(FakeConnection())
+        return self.opened[-1]
+
+
+def test_request_scope_shares_one_connection_across_services_and_releases_it():
+    import threading
+
+    from flask import Flask
+
+    from models import LazyEngine
+    from utils.db_routing import close_request_scope, open_request_scope
+
+    fake = FakeEngine()
+    primary = LazyEngine()
+    primary._engine = fake
+    router = ReadReplicaRouter(primary)
+
+    with Flask(__name__).test_request_context("/dashboard"):
+        open_request_scope("REPEATABLE READ")
+        with primary.connect() as first:
+            first.execute("select 1")
+        with router.connect() as second:
+            second.execution_options(stream_results=True).execute("select 2")
+        try:
+            with primary.connect():
+                raise RuntimeError("query failed")
+        except RuntimeError:
+            pass
+
+        other_thread = []
+        worker = threading.Thread(target=lambda: other_thread.append(primary.connect()))
+        worker.start()
+        worker.join()
+
+        assert len(fake.opened) == 2 and other_thread[0] is fake.opened[1]
+        shared = fake.opened[0]
+        assert shared.options == {"isolation_level": "REPEATABLE READ"}
+        assert shared.executed == [("select 1", None), ("select 2", {"stream_results": True})]
+        assert shared.rolled_back == 1 and not shared.closed
+        close_request_scope()
+        assert shared.closed
+
+    primary.connect()
+    primary.connect()
+    assert len(fake.opened) == 4
+
+
+def test_only_committed_writes_open_the_read_your_writes_window():
+    from app import create_app
+    from utils.db_routing import PRIMARY_UNTIL_SESSION_KEY, note_committed_write
+
+    app = create_app()
+
+    @app.route("/_test/form", methods=["POST"])
+    def rerendered_form():
+        return "validation errors"
+
+    @app.route("/_test/write", methods=["POST"])
+    def committed():
+        note_committed_write()
+        return "saved"
+
+    # Skip CSRF so the test posts without a token.
+    app.before_request_funcs[None] = [
+        func for func in app.before_request_funcs[None] if func.__name__ != "csrf_protect"
+    ]
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["user_id"] = 1
+
+    client.post("/_test/form")
+    with client.session_transaction() as sess:
+        assert PRIMARY_UNTIL_SESSION_KEY not in sess
+
+    client.post("/_test/write")
+    with client.session_transaction() as sess:
+        assert PRIMARY_UNTIL_SESSION_KEY in sess
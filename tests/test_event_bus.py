@@ -0,0 +1,98 @@
+import json
+
+from app import create_app
+from services.event_channel import NotificationListener
+from utils.event_bus import EventBus, event_bus
+
+
+def test_event_bus_scopes_by_owner_and_replays_missed_events():
+    bus = EventBus(history=3)
+    officer = bus.subscribe()
+    farmer = bus.subscribe(owner_id=7)
+
+    bus.publish("yield", 7, {"op": "insert"})
+    bus.publish("yield", 8, {"op": "delete"})
+
+    assert [officer.get(0)["data"]["op"], officer.get(0)["data"]["op"]] == ["insert", "delete"]
+    assert farmer.get(0)["owner_id"] == 7
+    assert farmer.get(0) is None
+
+    reconnected = bus.subscribe(last_event_id=1)
+    assert reconnected.get(0)["id"] == 2
+    assert not reconnected.overflowed
+
+    for _ in range(3):
+        bus.publish("yield", 7, {"op": "update"})
+    assert bus.subscribe(last_event_id=1).overflowed
+    assert bus.subscribe(last_event_id=99).overflowed
+
+
+def test_event_bus_marks_slow_subscribers_overflowed():
+    bus = EventBus()
+    slow = bus.subscribe(max_pending=1)
+    bus.publish("yield", 1, {})
+    bus.publish("yield", 1, {})
+    assert slow.overflowed
+
+
+def test_event_bus_interrupt_forces_resync():
+    bus = EventBus()
+    live = bus.subscribe()
+    first = bus.publish("yield", 1, {})
+    bus.interrupt()
+    assert live.overflowed
+    assert bus.subscribe(last_event_id=first["id"]).overflowed
+
+
+def test_listener_republishes_notifications_with_their_ids():
+    bus = EventBus()
+    listener = NotificationListener(bus)
+    for event_id in ("a1", "b2"):
+        listener.deliver(json.dumps({"id": event_id, "type": "yield", "owner_id": 3, "data": {"yieldid": event_id}}))
+    listener.deliver("not json")
+
+    reconnected = bus.subscribe(owner_id=3, last_event_id="a1")
+    assert reconnected.get(0)["id"] == "b2"
+    assert reconnected.get(0) is None
+    assert not reconnected.overflowed
+
+
+def test_yield_events_defers_streams_over_the_cap():
+    app = create_app()
+    app.config.update(EVENTS_CHANNEL="local", EVENTS_MAX_STREAMS=1)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = 5
+        session["role"] = "Officer"
+
+    held = event_bus.subscribe()
+    try:
+        response = client.get("/events/yield")
+    finally:
+        event_bus.unsubscribe(held)
+
+    assert response.get_data(as_text=True) == "retry: 30000\n\n"
+
+
+def test_yield_events_stream_sends_scoped_deltas():
+    app = create_app()
+    app.config.update(EVENTS_CHANNEL="local", EVENTS_STREAM_MAX_SECONDS=0.2, EVENTS_KEEPALIVE_SECONDS=0.05)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = 5
+        session["role"] = "Farmer"
+
+    seen = event_bus.publish("yield", 5, {"op": "insert", "yieldid": 0})
+    published = event_bus.publish("yield", 5, {"op": "insert", "yieldid": 1})
+    event_bus.publish("yield", 6, {"op": "insert", "yieldid": 2})
+
+    response = client.get("/events/yield", headers={"Last-Event-ID": str(seen["id"])})
+    body = response.get_data(as_text=True)
+
+    assert response.mimetype == "text/event-stream"
+    assert "Content-Encoding" not in response.headers
+    assert f"id: {published['id']}\nevent: yield\n" in body
+    assert '"yieldid": 1' in body
+    assert '"yieldid": 0' not in body
+    assert '"yieldid": 2' not in body
+    assert event_bus.subscriber_count() == 0
@@ -0,0 +1,219 @@
+import os
+import time
+
+import routes
+from app import create_app
+from config import Config
+from services import export_jobs
+from utils import security
+
+
+class FakeResult:
+    def __init__(self, rows=None, one=None, scalar=None):
+        self._rows = rows or []
+        self._one = one
+        self._scalar = scalar
+
+    def one(self):
+        return self._one
+
+    def scalar(self):
+        return self._scalar
+
+    def mappings(self):
+        return self
+
+    def keys(self):
+        return list(self._rows[0].keys()) if self._rows else []
+
+    def __iter__(self):
+        return iter(self._rows)
+
+
+class FakeConn:
+    def __init__(self, state):
+        self.state = state
+
+    def execution_options(self, **_options):
+        return self
+
+    def execute(self, query, *_args, **_kwargs):
+        query_text = str(query)
+        if "count(yielddata.yieldid)" in query_text:
+            return FakeResult(one=(self.state["count"], "2024-01-01"))
+        if "max(crop_master" in query_text:
+            return FakeResult(scalar="2024-01-01")
+        self.state["report_queries"] += 1
+        return FakeResult(rows=[{"yieldid": 1, "year": 2024, "CropName": "Rice", "production": 10}])
+
+
+class FakeCtx:
+    def __init__(self, state):
+        self.state = state
+
+    def __enter__(self):
+        return FakeConn(self.state)
+
+    def __exit__(self, *_args):
+        return False
+
+
+class FakeEngine:
+    def __init__(self, state):
+        self.state = state
+
+    def connect(self):
+        return FakeCtx(self.state)
+
+
+class DeferredExecutor:
+    def __init__(self):
+        self.pending = []
+
+    def submit(self, fn, *args):
+        self.pending.append((fn, args))
+
+    def run_all(self):
+        while self.pending:
+            fn, args = self.pending.pop(0)
+            fn(*args)
+
+
+def _setup(monkeypatch, tmp_path, count=1):
+    state = {"count": count, "report_queries": 0}
+    executor = DeferredExecutor()
+    monkeypatch.setattr(Config, "EXPORT_SPOOL_DIR", str(tmp_path))
+    monkeypatch.setattr(export_jobs, "read_engine", FakeEngine(state))
+    monkeypatch.setattr(export_jobs, "_get_executor", lambda: executor)
+    return state, executor
+
+
+def test_identical_exports_share_one_job_and_download_with_token(monkeypatch, tmp_path):
+    state, executor = _setup(monkeypatch, tmp_path)
+    filters = {"year": 2024, "crop_id": None, "district_id": None, "season_id": None}
+
+    first = export_jobs.submit_export("all", filters, "csv")
+    second = export_jobs.submit_export("all", filters, "csv")
+    assert first["job_id"] == second["job_id"]
+    assert len(executor.pending) == 1
+
+    executor.run_all()
+    job = export_jobs.get_job(first["job_id"])
+    assert job["status"] == export_jobs.JOB_DONE
+    assert job["rows"] == 1
+    assert state["report_queries"] == 1
+
+    token = export_jobs.make_download_token(job)
+    assert export_jobs.open_download(token, "user:7") == (None, None)
+    path, _job = export_jobs.open_download(token, "all")
+    with open(path, encoding="utf-8") as exported:
+        assert exported.read().splitlines() == ["year,CropName,production", "2024,Rice,10"]
+
+    state["count"] = 2
+    changed = export_jobs.submit_export("all", filters, "csv")
+    assert changed["job_id"] != first["job_id"]
+
+
+def test_finished_exports_expire_by_ttl_and_lru(monkeypatch, tmp_path):
+    _state, executor = _setup(monkeypatch, tmp_path)
+    monkeypatch.setattr(Config, "EXPORT_SPOOL_MAX_FILES", 1)
+
+    jobs = [
+        export_jobs.submit_export("all", {"year": year, "crop_id": None, "district_id": None, "season_id": None}, "csv")
+        for year in (2022, 2023)
+    ]
+    executor.run_all()
+    export_jobs.expire_jobs(str(tmp_path))
+    assert export_jobs.get_job(jobs[0]["job_id"]) is None
+    assert export_jobs.get_job(jobs[1]["job_id"])["status"] == export_jobs.JOB_DONE
+
+    monkeypatch.setattr(Config, "EXPORT_JOB_TTL_SECONDS", 0)
+    time.sleep(0.01)
+    export_jobs.expire_jobs(str(tmp_path))
+    assert os.listdir(tmp_path) == []
+
+
+def test_fresh_lock_without_meta_is_not_taken_over_but_an_old_one_is(monkeypatch, tmp_path):
+    _state, executor = _setup(monkeypatch, tmp_path)
+    monkeypatch.setattr(Config, "EXPORT_LOCK_GRACE_SECONDS", 0.2)
+    filters = {"year": 2024, "crop_id": None, "district_id": None, "season_id": None}
+    job_id = export_jobs.make_job_id("all", filters, "csv", export_jobs.get_data_version())
+    lock_path = export_jobs._lock_path(str(tmp_path), job_id)
+
+    # Another process claimed the job and writes its meta while we wait.
+    open(lock_path, "w").close()
+    sleeps = []
+
+    def write_peer_meta(seconds):
+        sleeps.append(seconds)
+        export_jobs._write_meta(str(tmp_path), {"job_id": job_id, "status": export_jobs.JOB_QUEUED, "format": "csv"})
+
+    monkeypatch.setattr(export_jobs.time, "sleep", write_peer_meta)
+    joined = export_jobs.submit_export("all", filters, "csv")
+    assert sleeps and joined["job_id"] == job_id
+    assert executor.pending == []
+
+    # A lock left behind by a crashed process, with no meta, is taken over after the grace period.
+    os.remove(export_jobs._meta_path(str(tmp_path), job_id))
+    old = time.time() - 1
+    os.utime(lock_path, (old, old))
+    taken_over = export_jobs.submit_export("all", filters, "csv")
+    assert taken_over["status"] == export_jobs.JOB_QUEUED
+    assert len(executor.pending) == 1
+
+
+def test_job_outliving_the_timeout_is_shared_while_its_owner_refreshes_the_lock(monkeypatch, tmp_path):
+    _state, executor = _setup(monkeypatch, tmp_path)
+    monkeypatch.setattr(Config, "EXPORT_JOB_TIMEOUT_SECONDS", 0.3)
+    monkeypatch.setattr(Config, "EXPORT_HEARTBEAT_SECONDS", 0.05)
+    monkeypatch.setattr(export_jobs, "_heartbeat_thread", None)
+    filters = {"year": 2024, "crop_id": None, "district_id": None, "season_id": None}
+
+    first = export_jobs.submit_export("all", filters, "csv")
+    # Still queued behind the export workers well past the timeout.
+    time.sleep(0.6)
+    again = export_jobs.submit_export("all", filters, "csv")
+    assert again["job_id"] == first["job_id"] and again["created_at"] == first["created_at"]
+    assert export_jobs.get_job(first["job_id"])["status"] == export_jobs.JOB_QUEUED
+    assert len(executor.pending) == 1
+
+    # Once the owner is gone the lock goes stale and the job is started again.
+    export_jobs._owned_jobs.clear()
+    time.sleep(0.4)
+    assert export_jobs.get_job(first["job_id"])["status"] == export_jobs.JOB_FAILED
+    export_jobs.submit_export("all", filters, "csv")
+    assert len(executor.pending) == 2
+    executor.run_all()
+    assert export_jobs.get_job(first["job_id"])["status"] == export_jobs.JOB_DONE
+    assert export_jobs._owned_jobs == {}
+
+
+def test_farmer_report_and_exports_cover_all_rows_but_jobs_stay_private(monkeypatch):
+    built = []
+    submitted = []
+
+    def fake_query(*args, **kwargs):
+        built.append(kwargs)
+        raise RuntimeError("stop after building the query")
+
+    def fake_submit(scope, filters, file_format, owner_id=None):
+        submitted.append((scope, owner_id))
+        return {"job_id": "j", "status": export_jobs.JOB_QUEUED}
+
+    monkeypatch.setattr(routes, "build_full_report_query", fake_query)
+    monkeypatch.setattr(routes, "submit_export", fake_submit)
+    monkeypatch.setattr(routes, "read_engine", FakeEngine({}))
+    monkeypatch.setattr(security, "get_user_by_id", lambda user_id: {"id": user_id, "role": "Farmer"})
+    app = create_app()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = 5
+        session["role"] = "Farmer"
+        session["csrf_token"] = "token"
+
+    client.get("/yield/full_report")
+    client.get("/yield/full_report/export/csv")
+    client.post("/yield/full_report/export/csv/jobs", data={"csrf_token": "token"})
+
+    assert [kwargs.get("owner_id") for kwargs in built] == [None, None]
+    assert submitted == [("user:5", None)]
@@ -0,0 +1,75 @@
+import math
+
+from services import forecast_service
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class FakeConn:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, _query, *_args, **_kwargs):
+        return FakeResult(self.rows)
+
+
+class FakeCtx:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __enter__(self):
+        return FakeConn(self.rows)
+
+    def __exit__(self, *_args):
+        return False
+
+
+class FakeEngine:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def connect(self):
+        return FakeCtx(self.rows)
+
+
+def _rows():
+    # (cropid, districtid, year, production, area)
+    rows = [(1, 1, year, 100.0 + 10 * (year - 2018), 10.0) for year in (2018, 2019, 2020, 2022)]
+    # A second series with one gap year and too few points for a trend.
+    rows += [(2, 3, 2020, 50.0, 5.0), (2, 3, 2021, 54.0, 6.0)]
+    return rows
+
+
+def test_series_are_padded_and_fitted_in_one_batch(monkeypatch):
+    monkeypatch.setattr(forecast_service, "read_engine", FakeEngine(_rows()))
+    matrix = forecast_service.load_series_matrix()
+
+    assert matrix["years"].tolist() == [2018, 2019, 2020, 2021, 2022]
+    assert matrix["cropid"].tolist() == [1, 2] and matrix["districtid"].tolist() == [1, 3]
+    assert math.isnan(matrix["production"][0, 3]) and math.isnan(matrix["production"][1, 0])
+    assert matrix["yield"][1, 3] == 9.0
+
+    linear = forecast_service.fit_linear(matrix["production"], horizon=2)
+    assert linear["forecast"][0].round(6).tolist() == [150.0, 160.0]
+    assert linear["upper"][0].round(6).tolist() == [150.0, 160.0]
+    assert math.isnan(linear["forecast"][1, 0])
+
+    naive = forecast_service.fit_seasonal_naive(matrix["production"], horizon=1)
+    assert naive["forecast"][:, 0].tolist() == [140.0, 54.0]
+    assert naive["lower"][0, 0] < 140.0 < naive["upper"][0, 0]
+
+
+def test_build_forecasts_skips_unfitted_series_and_labels_rows(monkeypatch):
+    monkeypatch.setattr(forecast_service, "read_engine", FakeEngine(_rows()))
+    rows = forecast_service.build_forecasts(forecast_service.load_series_matrix())
+
+    linear = [row for row in rows if row["model"] == "linear" and row["metric"] == "production"]
+    assert [(row["cropid"], row["districtid"], row["target_year"]) for row in linear] == [(1, 1, 2023)]
+    naive = [row for row in rows if row["model"] == "seasonal_naive" and row["cropid"] == 2 and row["metric"] == "yield"]
+    assert naive[0]["forecast"] == 9.0 and naive[0]["observations"] == 2
@@ -0,0 +1,36 @@
+from jinja2 import Environment
+
+from utils.fragment_cache import FragmentCache, FragmentCacheExtension
+
+
+def test_cache_tag_reuses_fragment_until_reference_version_changes():
+    env = Environment(extensions=[FragmentCacheExtension])
+    env.fragment_cache = FragmentCache(max_entries=2)
+    template = env.from_string('{% cache "nav", role %}{{ items|join(",") }}{% endcache %}')
+
+    assert template.render(role="Admin", items=["a"]) == "a"
+    assert template.render(role="Admin", items=["b"]) == "a"
+    assert template.render(role="Farmer", items=["c"]) == "c"
+
+    env.fragment_cache.bump_version()
+    assert template.render(role="Admin", items=["d"]) == "d"
+
+
+def test_fragment_cache_evicts_least_recently_used():
+    cache = FragmentCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert len(cache) == 2
+
+
+def test_all_templates_compile_with_cache_tag():
+    from app import create_app
+
+    app = create_app()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
@@ -0,0 +1,52 @@
+import decimal
+import json
+from datetime import datetime
+
+import numpy as np
+import pytest
+from flask import Flask
+
+from utils import json_provider
+from utils.json_provider import FastJSONProvider, columnar
+
+
+@pytest.mark.parametrize("backend", ["auto", "stdlib"])
+def test_provider_serializes_numpy_and_decimal_on_both_backends(backend):
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app, backend)
+    payload = {
+        "values": np.array([1.5, 2.0]),
+        "count": np.int64(3),
+        "total": decimal.Decimal("12.25"),
+        "at": datetime(2024, 1, 2, 3, 4, 5),
+    }
+
+    with app.app_context():
+        response = app.json.response(payload)
+
+    assert app.json.use_orjson is (backend == "auto" and json_provider.orjson is not None)
+    assert json.loads(response.get_data()) == {
+        "at": "Tue, 02 Jan 2024 03:04:05 GMT",
+        "count": 3,
+        "total": 12.25,
+        "values": [1.5, 2.0],
+    }
+
+
+def test_columnar_rewrites_uniform_row_lists_recursively():
+    payload = {
+        "by_crop": [{"crop": "Rice", "total": 1.0}, {"crop": "Maize", "total": 2.0}],
+        "groups": [{"id": 1, "items": [{"rank": 1}]}, {"id": 2, "items": []}],
+        "mixed": [{"a": 1}, {"b": 2}],
+        "years": [2023, 2024],
+    }
+
+    assert columnar(payload) == {
+        "by_crop": {"columns": ["crop", "total"], "data": {"crop": ["Rice", "Maize"], "total": [1.0, 2.0]}},
+        "groups": {
+            "columns": ["id", "items"],
+            "data": {"id": [1, 2], "items": [{"columns": ["rank"], "data": {"rank": [1]}}, []]},
+        },
+        "mixed": [{"a": 1}, {"b": 2}],
+        "years": [2023, 2024],
+    }
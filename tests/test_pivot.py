@@ -0,0 +1,151 @@
+from sqlalchemy.dialects import postgresql
+
+from services import pivot_service
+from utils.fragment_cache import bump_reference_data_version
+
+
+def _row(r0, c0, production, row_rollup=0, column_rollup=0, labels=None):
+    return {
+        "r0_id": r0, "r0_label": (labels or {}).get(r0),
+        "c0_id": c0, "c0_label": c0,
+        "row_rollup": row_rollup, "column_rollup": column_rollup,
+        "m_production": production,
+    }
+
+
+def test_request_is_normalized_and_compiled_to_grouping_sets():
+    request = pivot_service.normalize_request(
+        ["province", "province"], ["year"], ["production", "records"], {"year_to": "2024", "crop_id": None}, totals=True
+    )
+    assert request == {
+        "rows": ["province"], "columns": ["year"], "measures": ["production", "records"],
+        "filters": {"year_to": 2024}, "totals": True,
+    }
+
+    sql = str(pivot_service.build_pivot_query(request).compile(dialect=postgresql.dialect()))
+    assert "GROUP BY GROUPING SETS((mastersetup.district.provinceid, mastersetup.province.provincename, yielddata.year" in sql
+    assert "()" in sql and "WHERE yielddata.year <= " in sql
+
+    for bad in ({"rows": ["farmer"]}, {"rows": ["year"], "columns": ["year"]}, {"measures": ["max"]}, {"filters": {"x": 1}}):
+        try:
+            pivot_service.normalize_request(**bad)
+        except ValueError:
+            continue
+        raise AssertionError(bad)
+
+
+def test_rows_are_shaped_into_dense_matrix_with_totals():
+    request = pivot_service.normalize_request(["province"], ["year"], ["production"], totals=True)
+    names = {1: "Koshi", 2: "Bagmati"}
+    rows = [
+        _row(1, 2023, 10.0, labels=names),
+        _row(2, 2024, 5.0, labels=names),
+        _row(1, 2024, 7.0, labels=names),
+        _row(1, None, 17.0, column_rollup=1, labels=names),
+        _row(2, None, 5.0, column_rollup=1, labels=names),
+        _row(None, 2023, 10.0, row_rollup=1),
+        _row(None, 2024, 12.0, row_rollup=1),
+        _row(None, None, 22.0, row_rollup=1, column_rollup=1),
+    ]
+
+    result = pivot_service.shape_pivot(request, rows)
+
+    assert result["rows"]["labels"] == {"province": ["Bagmati", "Koshi"]}
+    assert result["columns"]["ids"] == {"year": [2023, 2024]}
+    assert result["cells"]["production"] == [[None, 5.0], [10.0, 7.0]]
+    assert result["row_totals"]["production"] == [5.0, 17.0]
+    assert result["column_totals"]["production"] == [10.0, 12.0]
+    assert result["grand_total"] == {"production": 22.0}
+
+
+def test_pivot_is_cached_per_normalized_request_and_change_watermark(monkeypatch):
+    executed = []
+
+    class FakeResult:
+        def mappings(self):
+            return self
+
+        def all(self):
+            return [_row(1, 2024, 3.0, labels={1: "Koshi"})]
+
+    class FakeConn:
+        def execute(self, query):
+            executed.append(query)
+            return FakeResult()
+
+    class FakeCtx:
+        def __enter__(self):
+            return FakeConn()
+
+        def __exit__(self, *_args):
+            return False
+
+    class FakeEngine:
+        def connect(self):
+            return FakeCtx()
+
+    version = {"value": "v1"}
+    monkeypatch.setattr(pivot_service, "read_engine", FakeEngine())
+    monkeypatch.setattr(pivot_service, "get_change_watermark", lambda: version["value"])
+    monkeypatch.setattr(pivot_service, "pivot_cache", pivot_service.FragmentCache())
+
+    first = pivot_service.get_pivot(["province"], ["year"], filters={"crop_id": 1, "season_id": None})
+    again = pivot_service.get_pivot(["province", "province"], ["year"], ["production"], filters={"crop_id": "1"})
+    assert again == first and len(executed) == 1
+
+    version["value"] = "v2"
+    pivot_service.get_pivot(["province"], ["year"], filters={"crop_id": 1})
+    assert len(executed) == 2
+
+    # Writes in this worker and renamed reference data invalidate too.
+    pivot_service.invalidate_pivot_cache()
+    pivot_service.get_pivot(["province"], ["year"], filters={"crop_id": 1})
+    bump_reference_data_version()
+    pivot_service.get_pivot(["province"], ["year"], filters={"crop_id": 1})
+    assert len(executed) == 4
+    assert executed[-1]._limit == pivot_service.MAX_CELLS + 1
+
+
+def test_oversized_pivot_is_rejected_without_loading_every_group(monkeypatch):
+    loaded = []
+
+    class FakeResult:
+        def __init__(self, limit):
+            self.limit = limit
+
+        def mappings(self):
+            return self
+
+        def all(self):
+            rows = [_row(index, 2024, 1.0) for index in range(self.limit)]
+            loaded.append(len(rows))
+            return rows
+
+    class FakeConn:
+        def execute(self, query):
+            return FakeResult(query._limit)
+
+    class FakeCtx:
+        def __enter__(self):
+            return FakeConn()
+
+        def __exit__(self, *_args):
+            return False
+
+    class FakeEngine:
+        def connect(self):
+            return FakeCtx()
+
+    monkeypatch.setattr(pivot_service, "MAX_CELLS", 10)
+    monkeypatch.setattr(pivot_service, "read_engine", FakeEngine())
+    monkeypatch.setattr(pivot_service, "get_change_watermark", lambda: "v")
+    monkeypatch.setattr(pivot_service, "pivot_cache", pivot_service.FragmentCache())
+
+    for totals, expected in ((False, 11), (True, 23)):
+        try:
+            pivot_service.get_pivot(["district"], ["year"], totals=totals)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("oversized pivot was accepted")
+        assert loaded[-1] == expected
@@ -0,0 +1,135 @@
+import bisect
+import random
+
+from services import quantile_service
+from utils.quantile_sketch import KLLSketch
+
+
+def test_small_sketch_is_exact_and_round_trips():
+    sketch = KLLSketch()
+    for value in (5, 1, 3, 2, 4):
+        sketch.update(value)
+
+    assert sketch.quantiles((0, 0.5, 0.9, 1)) == [1.0, 3.0, 5.0, 5.0]
+    restored = KLLSketch.from_bytes(sketch.to_bytes())
+    assert restored.count == 5 and restored.quantiles((0.5,)) == [3.0]
+    assert KLLSketch().quantiles((0.5,)) == [None]
+
+
+def test_merged_sketches_stay_within_rank_error_and_compact():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(1, 0.5) for _ in range(50000)]
+    parts = [KLLSketch() for _ in range(8)]
+    for index, value in enumerate(values):
+        parts[index % 8].update(value)
+
+    merged = KLLSketch()
+    for part in parts:
+        merged.merge(KLLSketch.from_bytes(part.to_bytes()))
+
+    ordered = sorted(values)
+    assert merged.count == len(values)
+    for fraction, estimate in zip((0.1, 0.5, 0.9), merged.quantiles((0.1, 0.5, 0.9))):
+        assert abs(bisect.bisect_left(ordered, estimate) / len(values) - fraction) < 0.02
+    assert len(merged.to_bytes()) < 4000
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return self._rows
+
+    def __iter__(self):
+        return iter(self._rows)
+
+
+class FakeConn:
+    def __init__(self, rows, queries):
+        self.rows = rows
+        self.queries = queries
+
+    def execute(self, query, *_args, **_kwargs):
+        self.queries.append(str(query.compile()))
+        return FakeResult(self.rows)
+
+
+class FakeCtx:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, *_args):
+        return False
+
+
+class FakeEngine:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def connect(self):
+        return FakeCtx(FakeConn(self.rows, self.queries))
+
+
+def _sketch(values):
+    sketch = KLLSketch()
+    for value in values:
+        sketch.update(value)
+    return sketch.to_bytes()
+
+
+def test_quantiles_merge_stored_sketches_per_group(monkeypatch):
+    rows = [
+        {"sketch": _sketch([1, 2, 3]), "group_0": 1, "group_1": "Rice"},
+        {"sketch": _sketch([4, 5]), "group_0": 1, "group_1": "Rice"},
+        {"sketch": _sketch([10]), "group_0": 2, "group_1": "Maize"},
+    ]
+    fake_engine = FakeEngine(rows)
+    monkeypatch.setattr(quantile_service, "read_engine", fake_engine)
+
+    groups = quantile_service.get_yield_quantiles(group_by="crop", province_id=3, year_from=2020)
+
+    assert [(group["label"], group["count"]) for group in groups] == [("Maize", 1), ("Rice", 5)]
+    assert groups[1]["quantiles"] == {"0.1": 1.0, "0.5": 3.0, "0.9": 5.0}
+    assert "mastersetup.district.provinceid = :provinceid_1" in fake_engine.queries[0]
+    assert "FROM yielddata" not in fake_engine.queries[0]
+
+
+def test_edits_rebuild_groups_and_inserts_add_to_them():
+    class Conn:
+        def __init__(self):
+            self.statements = []
+
+        def execute(self, statement, *_args):
+            sql = str(statement.compile())
+            self.statements.append(sql)
+            if "FROM yielddata" in sql:
+                return FakeResult([{"cropid": 1, "districtid": 2, "year": 2024, "yieldamount": 4.0}])
+            if "FOR UPDATE" in sql:
+                self.locked = statement.compile().params["param_1"]
+                return FakeResult([{"cropid": 1, "districtid": 2, "year": 2023, "sketch": _sketch([1.0])}])
+            return None
+
+    before = {"cropid": 1, "districtid": 2, "year": 2024, "yieldamount": 3.0}
+    conn = Conn()
+    quantile_service.update_yield_sketches(
+        conn,
+        [(before, {**before, "yieldamount": 4.0}), (None, {**before, "year": 2023, "yieldamount": 2.0})],
+    )
+
+    assert sum("FROM yielddata" in sql for sql in conn.statements) == 1
+    assert sum("FOR UPDATE" in sql for sql in conn.statements) == 1
+    # Every touched group, rebuilt ones included, is locked before its rows are read.
+    lock = next(sql for sql in conn.statements if "FOR UPDATE" in sql)
+    assert conn.statements.index(lock) < next(
+        index for index, sql in enumerate(conn.statements) if "FROM yielddata" in sql
+    )
+    assert conn.locked == [(1, 2, 2023), (1, 2, 2024)]
+    assert conn.statements[-1].startswith("INSERT INTO yield_sketches")
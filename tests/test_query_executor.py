@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+from config import Config
+from services import query_executor
+
+
+def test_run_calls_runs_concurrently_when_enabled(monkeypatch):
+    monkeypatch.setattr(Config, "PARALLEL_QUERIES", True)
+    barrier = threading.Barrier(3, timeout=2)
+
+    def call(value):
+        def run():
+            barrier.wait()
+            return value
+
+        return run
+
+    results = query_executor.run_calls({"a": call(1), "b": call(2), "c": call(3)})
+
+    assert results == {"a": 1, "b": 2, "c": 3}
+
+
+def test_run_calls_propagates_errors_and_deadlines(monkeypatch):
+    monkeypatch.setattr(Config, "PARALLEL_QUERIES", True)
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        query_executor.run_calls({"ok": lambda: 1, "bad": fail})
+
+    with pytest.raises(query_executor.QueryDeadlineExceeded):
+        query_executor.run_calls({"slow": lambda: time.sleep(0.5), "fast": lambda: 1}, timeout=0.05)
+
+
+def test_run_queries_shares_one_connection_when_disabled(monkeypatch):
+    monkeypatch.setattr(Config, "PARALLEL_QUERIES", False)
+    opened = []
+
+    class FakeCtx:
+        def __enter__(self):
+            opened.append(self)
+            return "conn"
+
+        def __exit__(self, *_args):
+            return False
+
+    class FakeEngine:
+        def connect(self):
+            return FakeCtx()
+
+    results = query_executor.run_queries(FakeEngine(), {"a": lambda conn: conn, "b": lambda conn: conn})
+
+    assert results == {"a": "conn", "b": "conn"}
+    assert len(opened) == 1
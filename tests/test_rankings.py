@@ -0,0 +1,76 @@
+from sqlalchemy.dialects import postgresql
+
+from services import ranking_service
+
+
+def _sql(statement):
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_ranking_query_ranks_within_each_partition_in_one_statement():
+    sql = _sql(
+        ranking_service.build_ranking_query(
+            "municipality", "yield_per_hectare", partition="district", top_k=5, filters={"crop_id": 1, "year": None}
+        )
+    )
+
+    assert "rank() OVER (PARTITION BY totals.partition_id ORDER BY totals.value DESC NULLS LAST)" in sql
+    assert "GROUP BY yielddata.municipalityid, mastersetup.municipality.municipalityname, yielddata.districtid" in sql
+    assert "WHERE yielddata.cropid = " in sql and "yielddata.year =" not in sql
+    assert "WHERE ranked.rank <= " in sql
+
+
+def test_row_ties_break_by_id_and_province_filter_joins_district():
+    sql = _sql(ranking_service.build_ranking_query("farmer", ties="row", filters={"province_id": 2}))
+
+    assert "row_number() OVER (ORDER BY totals.value DESC NULLS LAST, totals.entity_id)" in sql
+    assert "LEFT OUTER JOIN users" in sql and "JOIN mastersetup.district" in sql
+
+    for bad in ({"entity": "season"}, {"entity": "crop", "partition": "crop"}, {"entity": "crop", "metric": "avg"}):
+        try:
+            ranking_service.build_ranking_query(**bad)
+        except ValueError:
+            continue
+        raise AssertionError(bad)
+
+
+def test_rankings_group_rows_per_partition(monkeypatch):
+    rows = [
+        {"partition_id": 1, "partition_name": "Kathmandu", "entity_id": 7, "entity_name": "A", "value": 9.0,
+         "total_production": 90.0, "total_area": 10.0, "records": 2, "rank": 1},
+        {"partition_id": 1, "partition_name": "Kathmandu", "entity_id": 8, "entity_name": "B", "value": 9.0,
+         "total_production": 45.0, "total_area": 5.0, "records": 1, "rank": 1},
+        {"partition_id": 2, "partition_name": "Lalitpur", "entity_id": 9, "entity_name": "C", "value": None,
+         "total_production": 0.0, "total_area": 0.0, "records": 1, "rank": 1},
+    ]
+
+    class FakeResult:
+        def mappings(self):
+            return self
+
+        def all(self):
+            return rows
+
+    class FakeConn:
+        def execute(self, _query):
+            return FakeResult()
+
+    class FakeCtx:
+        def __enter__(self):
+            return FakeConn()
+
+        def __exit__(self, *_args):
+            return False
+
+    class FakeEngine:
+        def connect(self):
+            return FakeCtx()
+
+    monkeypatch.setattr(ranking_service, "read_engine", FakeEngine())
+    result = ranking_service.get_rankings("municipality", "yield_per_hectare", partition="district", top_k=1)
+
+    assert [(group["name"], [item["id"] for item in group["items"]]) for group in result["groups"]] == [
+        ("Kathmandu", [7, 8]),
+        ("Lalitpur", [9]),
+    ]
+    assert result["groups"][1]["items"][0]["value"] is None
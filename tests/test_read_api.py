@@ -0,0 +1,80 @@
+import json
+
+import api_routes
+from app import create_app
+from services import auth_service
+from utils import security
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def mappings(self):
+        return iter(self._rows)
+
+
+class FakeConn:
+    def __init__(self, rows, queries):
+        self.rows = rows
+        self.queries = queries
+
+    def execution_options(self, **_options):
+        return self
+
+    def execute(self, query, params=None, *_args, **_kwargs):
+        compiled = query.compile()
+        params = {**compiled.params, **(params or {})}
+        self.queries.append((str(compiled), params))
+        after = params["after_id"]
+        limit = params["limit"]
+        return FakeResult([row for row in self.rows if row["yieldid"] > after][:limit])
+
+
+class FakeCtx:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, *_args):
+        return False
+
+
+class FakeEngine:
+    def __init__(self, rows):
+        self.queries = []
+        self.rows = rows
+
+    def connect(self):
+        return FakeCtx(FakeConn(self.rows, self.queries))
+
+
+def test_yield_feed_streams_sparse_ndjson_pages_with_keyset_cursor(monkeypatch):
+    app = create_app()
+    client = app.test_client()
+    rows = [{"yieldid": index, "year": 2020 + index, "production": float(index)} for index in range(1, 4)]
+    fake_engine = FakeEngine(rows)
+    monkeypatch.setattr(api_routes, "read_engine", fake_engine)
+    monkeypatch.setattr(security, "get_user_by_id", lambda user_id: {"id": user_id, "role": "Farmer"})
+    with app.app_context():
+        headers = {"Authorization": f"Bearer {auth_service.generate_api_token(5)}"}
+
+    first = client.get("/api/yields?fields=year,production&limit=2&crop_id=3", headers=headers)
+    assert first.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in first.get_data(as_text=True).splitlines()]
+    assert lines[:2] == [{"year": 2021, "production": 1.0}, {"year": 2022, "production": 2.0}]
+    cursor = lines[2]["_page"]["next_cursor"]
+
+    sql, params = fake_engine.queries[0]
+    assert sql.startswith("SELECT vw_yield_full_report.year, vw_yield_full_report.production, vw_yield_full_report.yieldid")
+    assert "ORDER BY vw_yield_full_report.yieldid" in sql
+    assert 3 in params.values() and 5 in params.values()
+
+    second = client.get(f"/api/yields?fields=year,production&limit=2&cursor={cursor}", headers=headers)
+    lines = [json.loads(line) for line in second.get_data(as_text=True).splitlines()]
+    assert lines == [{"year": 2023, "production": 3.0}, {"_page": {"count": 1, "next_cursor": None}}]
+
+    assert client.get("/api/yields?fields=password_hash", headers=headers).status_code == 400
+    assert client.get("/api/yields?cursor=not-a-cursor", headers=headers).status_code == 400
@@ -0,0 +1,37 @@
+import io
+
+from services.export_service import REPORT_DISPLAY_COLUMNS, report_records, write_csv
+from utils.row_records import record_type
+
+
+class FakeResult:
+    def __init__(self, keys, rows):
+        self._keys = keys
+        self._rows = rows
+
+    def keys(self):
+        return self._keys
+
+    def __iter__(self):
+        return iter(self._rows)
+
+
+def test_report_records_are_slotted_tuples_with_mapping_reads():
+    result = FakeResult(["year", "CropName", "production"], [(2023, "Rice", 12.5), (2024, "Maize", 7.0)])
+    records = report_records(result)
+
+    assert type(records[0]) is type(records[1]) is record_type("ReportRecord", ("year", "CropName", "production"))
+    assert not hasattr(records[0], "__dict__")
+    assert records[0]["CropName"] == "Rice"
+    assert records[1].production == 7.0
+    assert records[0].get("seasonname") is None
+    assert list(records[0].keys()) == ["year", "CropName", "production"]
+
+    target = io.BytesIO()
+    write_csv(records, ["CropName", "year"], target)
+    assert target.getvalue().decode("utf-8").splitlines() == ["CropName,year", "Rice,2023", "Maize,2024"]
+
+
+def test_report_projection_excludes_id_columns():
+    assert REPORT_DISPLAY_COLUMNS[:3] == ("year", "CropName", "croptypename")
+    assert not any(name.endswith("id") for name in REPORT_DISPLAY_COLUMNS)
@@ -0,0 +1,22 @@
+from services.search_service import NameIndex
+
+
+def test_name_index_ranks_prefix_before_trigram_and_filters_group():
+    index = NameIndex([
+        (1, "Pokhara Metropolitan City", 10),
+        (2, "Kathmandu Metropolitan City", 20),
+        (3, "Pokhariya Municipality", 30),
+        (4, "Lekhnath", 10),
+    ])
+
+    results = index.search("pokh")
+    assert [item["id"] for item in results] == [1, 3]
+
+    scoped = index.search("metro", group_id=10)
+    assert [item["id"] for item in scoped] == [1]
+
+    fuzzy = index.search("kathmadu")
+    assert fuzzy and fuzzy[0]["id"] == 2
+
+    listing = index.search("", group_id=10)
+    assert [item["name"] for item in listing] == ["Lekhnath", "Pokhara Metropolitan City"]
@@ -0,0 +1,162 @@
+import threading
+import time
+
+from config import Config
+from services import query_executor, yield_service
+from utils.metrics import metrics
+from utils.single_flight import SingleFlight, coalesced, single_flight
+
+
+def run_concurrently(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def wait_for_followers(function_name, count):
+    key = f"single_flight{{function={function_name},result=shared}}"
+    while metrics.snapshot()["counters"].get(key, 0) < count:
+        time.sleep(0.001)
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    metrics.reset()
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def slow_sum(values, scale=1):
+        calls.append(values)
+        started.set()
+        release.wait(5)
+        return {"total": sum(values["items"]) * scale}
+
+    def call():
+        results.append(flight.call(slow_sum, {"items": [1, 2]}, scale=2, scope="replica"))
+
+    threads = run_concurrently(1, call)
+    started.wait(5)
+    threads += run_concurrently(4, call)
+    wait_for_followers("test_concurrent_identical_calls_share_one_execution.<locals>.slow_sum", 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{"total": 6}] * 5
+    assert all(result is results[0] for result in results)
+    assert flight._calls == {}
+    assert flight.call(slow_sum, {"items": [1]}, scope="primary") == {"total": 1}
+    assert len(calls) == 2
+
+
+def test_followers_receive_the_leaders_exception():
+    metrics.reset()
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("database unavailable")
+
+    def call():
+        try:
+            flight.call(failing)
+        except RuntimeError as exc:
+            errors.append(str(exc))
+
+    threads = run_concurrently(1, call)
+    started.wait(5)
+    threads += run_concurrently(3, call)
+    wait_for_followers("test_followers_receive_the_leaders_exception.<locals>.failing", 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == ["database unavailable"] * 4
+
+
+def test_pool_workers_do_not_wait_on_a_leader_that_needs_the_pool(monkeypatch):
+    metrics.reset()
+    monkeypatch.setattr(Config, "PARALLEL_QUERIES", True)
+    monkeypatch.setattr(Config, "QUERY_FANOUT_WORKERS", 2)
+    monkeypatch.setattr(query_executor, "_executor", None)
+
+    class FakeCtx:
+        def __enter__(self):
+            return object()
+
+        def __exit__(self, *_args):
+            return False
+
+    class FakeEngine:
+        def connect(self):
+            return FakeCtx()
+
+    bind = FakeEngine()
+    leader_started = threading.Event()
+    tasks = {"a": lambda conn: 1, "b": lambda conn: 2}
+
+    @coalesced()
+    def dashboard():
+        if not leader_started.is_set():
+            leader_started.set()
+            # Both pool threads are now calling dashboard() too; the leader needs them for its own queries.
+            key = "single_flight{function=test_pool_workers_do_not_wait_on_a_leader_that_needs_the_pool.<locals>.dashboard,result=bypassed}"
+            deadline = time.monotonic() + 5
+            while metrics.snapshot()["counters"].get(key, 0) < 2 and time.monotonic() < deadline:
+                time.sleep(0.001)
+            return query_executor.run_queries(bind, tasks, timeout=2)
+        return "worker"
+
+    leader_results = []
+    [leader] = run_concurrently(1, lambda: leader_results.append(dashboard()))
+    leader_started.wait(5)
+    worker_results = query_executor.run_queries(bind, {"x": lambda conn: dashboard(), "y": lambda conn: dashboard()}, timeout=5)
+    leader.join(5)
+
+    assert worker_results == {"x": "worker", "y": "worker"}
+    assert leader_results == [{"a": 1, "b": 2}]
+
+
+def test_yield_aggregates_are_coalesced_per_arguments(monkeypatch):
+    keys = []
+    original_do = single_flight.do
+
+    def recording_do(key, function, *args, **kwargs):
+        keys.append(key)
+        return original_do(key, function, *args, **kwargs)
+
+    class FakeResult:
+        def mappings(self):
+            return self
+
+        def all(self):
+            return []
+
+    class FakeConn:
+        def execute(self, _query, *_args):
+            return FakeResult()
+
+    class FakeCtx:
+        def __enter__(self):
+            return FakeConn()
+
+        def __exit__(self, *_args):
+            return False
+
+    class FakeEngine:
+        def connect(self):
+            return FakeCtx()
+
+    monkeypatch.setattr(single_flight, "do", recording_do)
+    monkeypatch.setattr(yield_service, "read_engine", FakeEngine())
+    yield_service.get_trend_data(4, created_by=9)
+
+    assert keys == [("services.yield_service", "get_trend_data", (4,), (("created_by", 9),), "replica")]
@@ -0,0 +1,22 @@
+from utils.startup_profile import (
+    LAZY_MODULES,
+    STARTUP_IMPORT_BUDGET_MS,
+    format_report,
+    profile_startup,
+    total_import_ms,
+)
+
+
+def test_create_app_stays_within_import_budget():
+    report = profile_startup()
+
+    eager = [name for name in LAZY_MODULES if name in report["loaded_modules"]]
+    assert eager == []
+    assert total_import_ms(report["imports"]) < STARTUP_IMPORT_BUDGET_MS
+    assert "app:" in format_report(report["imports"])
+
+
+def test_importing_models_does_not_create_engine():
+    report = profile_startup("import models, services.yield_service")
+
+    assert "psycopg2" not in report["loaded_modules"]
@@ -74,6 +74,7 @@ def test_login_add_report_export_workflow(monkeypatch):
             return FakeCtx()
 
     monkeypatch.setattr(routes, "engine", FakeEngine())
+    monkeypatch.setattr(routes, "read_engine", FakeEngine())
 
     with app.test_client() as client:
         login_page = client.get("/login")
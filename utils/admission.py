@@ -0,0 +1,178 @@
+import threading
+import time
+
+from utils.metrics import metrics
+
+
+CLASS_EXPORT = "export"
+CLASS_ANALYSIS = "analysis"
+CLASS_OLTP = "oltp"
+ADMISSION_CLASSES = (CLASS_EXPORT, CLASS_ANALYSIS, CLASS_OLTP)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot get a slot; ``retry_after`` is in seconds."""
+
+    def __init__(self, admission_class, reason, retry_after):
+        super().__init__(f"{admission_class} capacity exhausted ({reason})")
+        self.admission_class = admission_class
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    __slots__ = ("_slots", "_released")
+
+    def __init__(self, slots):
+        self._slots = slots
+        self._released = False
+
+    def release(self):
+        # Safe to call from both the response close hook and teardown.
+        if not self._released:
+            self._released = True
+            self._slots.release()
+
+
+def _release_when_done(body, ticket):
+    try:
+        yield from body
+    finally:
+        ticket.release()
+
+
+def hold_until_sent(response, ticket):
+    """Keep ``ticket`` until a streamed body is sent; release it now otherwise.
+
+    The wrapped body releases when it is exhausted or closed; the close hook
+    covers bodies the server closes without iterating.
+    """
+    if not response.is_streamed:
+        ticket.release()
+        return response
+    if not response.direct_passthrough:
+        response.response = _release_when_done(response.response, ticket)
+    response.call_on_close(ticket.release)
+    return response
+
+
+class _ClassSlots:
+    """Concurrency limit plus a short bounded wait queue for one request class.
+
+    ``reserved`` slots can only be taken by priority acquisitions, so a burst of
+    low-priority requests never uses the last ``reserved`` slots.
+    """
+
+    def __init__(self, name, limit, queue_size, reserved=0):
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue_size = max(0, queue_size)
+        self.reserved = max(0, min(reserved, self.limit - 1))
+        self.active = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+
+    def _has_room(self, priority):
+        return self.active < (self.limit if priority else self.limit - self.reserved)
+
+    def _publish(self):
+        metrics.set_gauge("admission_active", self.active, request_class=self.name)
+        metrics.set_gauge("admission_queue_depth", self.waiting, request_class=self.name)
+
+    def acquire(self, timeout, retry_after, priority=False):
+        started = time.monotonic()
+        with self._condition:
+            if not self._has_room(priority):
+                if self.waiting >= self.queue_size:
+                    metrics.incr("admission_rejected", request_class=self.name, reason="queue_full")
+                    raise AdmissionRejected(self.name, "queue_full", retry_after)
+                self.waiting += 1
+                self._publish()
+                try:
+                    admitted = self._condition.wait_for(lambda: self._has_room(priority), timeout)
+                finally:
+                    self.waiting -= 1
+                if not admitted:
+                    self._publish()
+                    metrics.incr("admission_rejected", request_class=self.name, reason="timeout")
+                    raise AdmissionRejected(self.name, "timeout", retry_after)
+            self.active += 1
+            self._publish()
+        metrics.incr("admission_admitted", request_class=self.name)
+        metrics.incr("admission_wait_seconds", time.monotonic() - started, request_class=self.name)
+        return _Ticket(self)
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._publish()
+            self._condition.notify_all()
+
+
+class AdmissionController:
+    """Per-class concurrency limits for requests that hold database connections.
+
+    Exports, analysis and ordinary (OLTP) requests each have their own slots,
+    so a wave of report exports or unfiltered aggregates cannot take the
+    connections that form submissions need. Within the OLTP class
+    ``write_reserve`` slots are kept for writes.
+    """
+
+    def __init__(self, limits, queue_sizes, write_reserve=0, queue_timeout=2.0, retry_after=5):
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._slots = {
+            name: _ClassSlots(
+                name,
+                limits[name],
+                queue_sizes.get(name, 0),
+                reserved=write_reserve if name == CLASS_OLTP else 0,
+            )
+            for name in ADMISSION_CLASSES
+        }
+
+    def admit(self, admission_class, write=False):
+        """Wait briefly for a slot; returns a ticket to ``release()`` or raises :class:`AdmissionRejected`."""
+        return self._slots[admission_class].acquire(self.queue_timeout, self.retry_after, priority=write)
+
+    def stats(self):
+        return {name: {"active": slots.active, "waiting": slots.waiting} for name, slots in self._slots.items()}
+
+
+def pool_sized_limits(limits, pool_connections, background_connections=0, analysis_connections=1):
+    """Fill unset (``None``) class limits so admitted requests fit in the connection pool.
+
+    ``pool_connections`` is ``pool_size + max_overflow`` of the primary engine,
+    ``background_connections`` are kept for work outside requests (export
+    jobs), and an analysis request may hold ``analysis_connections`` at once
+    (1 plus the fan-out workers with ``PARALLEL_QUERIES``). Exports get about a
+    sixth of the rest, analysis a third and OLTP whatever is left, so with the
+    defaults (5 + 10 connections, 2 export workers) the limits are 2, 4 and 7.
+    """
+    available = max(pool_connections - background_connections, 3)
+    export = limits.get(CLASS_EXPORT) or max(1, available // 6)
+    analysis = limits.get(CLASS_ANALYSIS) or max(1, available // 3 // analysis_connections)
+    oltp = limits.get(CLASS_OLTP) or max(1, available - export - analysis * analysis_connections)
+    return {CLASS_EXPORT: export, CLASS_ANALYSIS: analysis, CLASS_OLTP: oltp}
+
+
+# Endpoints that read whole report result sets or start an export job.
+EXPORT_ENDPOINTS = {
+    "main.full_yield_report",
+    "main.export_full_report",
+    "main.submit_export_job",
+    "api.list_yield_records",
+}
+# Long-lived streams that hold no connection while idle.
+UNLIMITED_ENDPOINTS = {"main.yield_events"}
+
+
+def request_class(endpoint, blueprint):
+    """Admission class for a request, or ``None`` when it is not limited."""
+    if endpoint is None or endpoint in UNLIMITED_ENDPOINTS:
+        return None
+    if endpoint in EXPORT_ENDPOINTS:
+        return CLASS_EXPORT
+    if blueprint == "analysis":
+        return CLASS_ANALYSIS
+    return CLASS_OLTP
@@ -0,0 +1,43 @@
+import json
+import os
+
+from flask import current_app, url_for
+
+
+MANIFEST_NAME = "manifest.json"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# The manifest keeps its name across builds, so clients must revalidate it.
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+_manifest_cache = {}
+
+
+def dist_folder(app=None):
+    app = app or current_app
+    return os.path.join(app.static_folder, "dist")
+
+
+def load_manifest(app=None):
+    """Return the logical-name -> fingerprinted-file mapping written by ``build_assets.py``."""
+    path = os.path.join(dist_folder(app), MANIFEST_NAME)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+
+    cached = _manifest_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, encoding="utf-8") as manifest_file:
+        manifest = json.load(manifest_file)
+    _manifest_cache[path] = (mtime, manifest)
+    return manifest
+
+
+def asset_url(name):
+    """``url_for``-style helper for built assets; returns ``None`` when the asset has not been built."""
+    hashed_name = load_manifest().get(name)
+    if not hashed_name:
+        return None
+    return url_for("assets.built_asset", filename=hashed_name)
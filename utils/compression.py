@@ -0,0 +1,166 @@
+import zlib
+
+from werkzeug.http import parse_accept_header
+
+from utils.metrics import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+DEFAULT_LEVELS = {"gzip": 6, "br": 5, "zstd": 3}
+
+
+class _GzipCompressor:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class _ZstdCompressor:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+def available_encodings():
+    """Supported encodings in server preference order."""
+    encodings = []
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+    encodings.append("gzip")
+    return encodings
+
+
+_COMPRESSORS = {"gzip": _GzipCompressor, "br": _BrotliCompressor, "zstd": _ZstdCompressor}
+
+
+def negotiate_encoding(accept_encoding, encodings=None):
+    accepted = parse_accept_header(accept_encoding or "")
+    for encoding in encodings or available_encodings():
+        if accepted.quality(encoding) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """WSGI middleware compressing text responses with gzip, brotli or zstd.
+
+    Bodies with a known ``Content-Length`` below ``min_size``, responses that already
+    carry a ``Content-Encoding`` and content types without a configured level are
+    passed through. Responses without a length (streamed) are flushed per chunk so
+    clients still receive data incrementally.
+    """
+
+    def __init__(self, wsgi_app, levels, min_size=1024):
+        self.wsgi_app = wsgi_app
+        self.levels = levels
+        self.min_size = min_size
+
+    def _level_for(self, content_type, encoding):
+        mimetype = (content_type or "").split(";", 1)[0].strip().lower()
+        levels = self.levels.get(mimetype)
+        if levels is None:
+            return None
+        return levels.get(encoding, DEFAULT_LEVELS[encoding])
+
+    def _should_compress(self, status, headers):
+        if int(status.split(" ", 1)[0]) in (204, 206, 304):
+            return False
+        header_map = {key.lower(): value for key, value in headers}
+        if "content-encoding" in header_map:
+            return False
+        content_length = header_map.get("content-length")
+        if content_length is not None and int(content_length) < self.min_size:
+            return False
+        return True
+
+    def __call__(self, environ, start_response):
+        encoding = negotiate_encoding(environ.get("HTTP_ACCEPT_ENCODING"))
+        if encoding is None or environ.get("REQUEST_METHOD") == "HEAD":
+            return self.wsgi_app(environ, start_response)
+
+        state = {}
+
+        def compressing_start_response(status, headers, exc_info=None):
+            header_map = {key.lower(): value for key, value in headers}
+            level = self._level_for(header_map.get("content-type"), encoding)
+            if level is not None and self._should_compress(status, headers):
+                state["compressor"] = _COMPRESSORS[encoding](level)
+                state["streamed"] = "content-length" not in header_map
+                headers = [(key, value) for key, value in headers if key.lower() != "content-length"]
+                headers.append(("Content-Encoding", encoding))
+                vary = header_map.get("vary")
+                headers = [(key, value) for key, value in headers if key.lower() != "vary"]
+                headers.append(("Vary", f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"))
+            return start_response(status, headers, exc_info)
+
+        app_iter = self.wsgi_app(environ, compressing_start_response)
+        if "compressor" not in state:
+            return app_iter
+        return self._compress_iter(app_iter, state["compressor"], state["streamed"], encoding)
+
+    def _compress_iter(self, app_iter, compressor, streamed, encoding):
+        bytes_in = 0
+        bytes_out = 0
+        try:
+            for chunk in app_iter:
+                if not chunk:
+                    continue
+                bytes_in += len(chunk)
+                output = compressor.compress(chunk)
+                if streamed:
+                    output += compressor.flush()
+                if output:
+                    bytes_out += len(output)
+                    yield output
+            output = compressor.finish()
+            bytes_out += len(output)
+            yield output
+        finally:
+            close = getattr(app_iter, "close", None)
+            if close is not None:
+                close()
+            metrics.incr("compression_responses", encoding=encoding)
+            metrics.incr("compression_bytes_in", bytes_in, encoding=encoding)
+            metrics.incr("compression_bytes_out", bytes_out, encoding=encoding)
+            metrics.incr("compression_bytes_saved", bytes_in - bytes_out, encoding=encoding)
@@ -0,0 +1,16 @@
+import base64
+import binascii
+import json
+
+
+def encode_cursor(position):
+    """Opaque, URL-safe token for a JSON-serializable keyset position."""
+    return base64.urlsafe_b64encode(json.dumps(position, default=str).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        return json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid cursor.") from None
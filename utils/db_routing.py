@@ -0,0 +1,150 @@
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+
+from flask import g, has_request_context
+
+
+_prefer_primary = ContextVar("prefer_primary", default=False)
+
+PRIMARY_UNTIL_SESSION_KEY = "read_primary_until"
+_SCOPE_KEY = "_db_request_scope"
+
+
+class ScopedConnection:
+    """The request's shared connection, usable like a fresh ``engine.connect()``.
+
+    Leaving a ``with`` block keeps the connection (and its transaction) open for
+    the next service call; the request teardown closes it. A block that raises
+    rolls back so later reads are not stuck in an aborted transaction.
+    ``execution_options()`` applies per statement instead of changing the
+    shared connection for the rest of the request.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, _exc, _traceback):
+        if exc_type is not None and self.connection.in_transaction():
+            self.connection.rollback()
+        return False
+
+    def close(self):
+        """Closing is deferred to the end of the request."""
+
+    def execution_options(self, **options):
+        return _StatementOptions(self.connection, options)
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+
+class _StatementOptions:
+    def __init__(self, connection, options):
+        self._connection = connection
+        self._options = options
+
+    def execute(self, statement, parameters=None, *, execution_options=None):
+        options = {**self._options, **(execution_options or {})}
+        return self._connection.execute(statement, parameters, execution_options=options)
+
+
+def open_request_scope(isolation_level=None):
+    """Start sharing one connection per engine for the rest of this request.
+
+    ``isolation_level`` (e.g. ``"REPEATABLE READ"`` for read-only requests) is
+    applied to each connection as it is opened, so every read in the request
+    sees the same snapshot.
+    """
+    setattr(g, _SCOPE_KEY, {"thread": threading.get_ident(), "isolation_level": isolation_level, "connections": {}})
+
+
+def scoped_connect(key, open_connection):
+    """Return the request's connection for ``key``, opening it on first use.
+
+    Outside a request scope (CLI, tests, background threads, fanned-out query
+    workers) this is just ``open_connection()``.
+    """
+    scope = g.get(_SCOPE_KEY) if has_request_context() else None
+    if scope is None or scope["thread"] != threading.get_ident():
+        return open_connection()
+
+    connection = scope["connections"].get(key)
+    if connection is None:
+        connection = open_connection()
+        if not isinstance(connection, ScopedConnection):
+            if scope["isolation_level"] and getattr(connection.dialect, "name", None) == "postgresql":
+                connection.execution_options(isolation_level=scope["isolation_level"])
+            connection = ScopedConnection(connection)
+        scope["connections"][key] = connection
+    return connection
+
+
+def close_request_scope():
+    """Close the request's connections; anything not committed is rolled back."""
+    scope = g.pop(_SCOPE_KEY, None)
+    if scope is None:
+        return
+    connections = {id(scoped.connection): scoped.connection for scoped in scope["connections"].values()}
+    for connection in connections.values():
+        connection.close()
+
+
+class ReadReplicaRouter:
+    """Engine-like object that sends read-only connections to replicas.
+
+    Falls back to the primary when no replicas are configured or while the
+    current request is inside its read-your-writes window.
+    """
+
+    def __init__(self, primary, replicas=()):
+        self.primary = primary
+        self._lock = threading.Lock()
+        self.set_replicas(replicas)
+
+    def set_replicas(self, replicas):
+        with self._lock:
+            self.replicas = list(replicas)
+            self._cycle = itertools.cycle(self.replicas) if self.replicas else None
+
+    def resolve(self):
+        if not self.replicas or _prefer_primary.get():
+            return self.primary
+        with self._lock:
+            return next(self._cycle)
+
+    def connect(self):
+        # Keyed by the routing decision so a request that starts reading its own
+        # writes moves to the primary instead of reusing its replica connection.
+        return scoped_connect((id(self), _prefer_primary.get()), lambda: self.resolve().connect())
+
+
+def read_scope():
+    """Where reads in this context go (``"primary"`` or ``"replica"``), for keying shared results."""
+    return "primary" if _prefer_primary.get() else "replica"
+
+
+def prefer_primary_for_request(session):
+    """Pin reads to the primary if this session wrote recently."""
+    _prefer_primary.set(session.get(PRIMARY_UNTIL_SESSION_KEY, 0) > time.time())
+
+
+def note_committed_write():
+    """Mark that this request committed a user write; only those open the read-your-writes window."""
+    if has_request_context():
+        g._committed_write = True
+
+
+def committed_write():
+    return has_request_context() and g.get("_committed_write", False)
+
+
+def record_write(session, window_seconds):
+    """Start the read-your-writes window after a successful write."""
+    if window_seconds > 0:
+        session[PRIMARY_UNTIL_SESSION_KEY] = time.time() + window_seconds
+        _prefer_primary.set(True)
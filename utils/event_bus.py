@@ -0,0 +1,95 @@
+import queue
+import threading
+from collections import deque
+
+
+class Subscription:
+    """A subscriber's bounded mailbox.
+
+    ``owner_id`` limits delivery to events about that user's records; ``None``
+    receives everything. A subscriber that falls ``max_pending`` events behind is
+    marked ``overflowed`` so the stream can tell the client to reload instead of
+    silently dropping deltas.
+    """
+
+    def __init__(self, owner_id=None, max_pending=100):
+        self.owner_id = owner_id
+        self.overflowed = False
+        self._queue = queue.Queue(maxsize=max_pending)
+
+    def wants(self, event):
+        return self.owner_id is None or event["owner_id"] == self.owner_id
+
+    def offer(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """Publish/subscribe with a short replay buffer for reconnects.
+
+    Event ids are opaque: they are local counters when events are published
+    here, or the ids carried by notifications from other processes (see
+    ``services.event_channel``). Replay resumes after the position of
+    ``last_event_id`` in the history, which every process receives in the
+    same order.
+    """
+
+    def __init__(self, history=200):
+        self._subscribers = set()
+        self._history = deque(maxlen=history)
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, owner_id=None, max_pending=100, last_event_id=None):
+        subscription = Subscription(owner_id, max_pending)
+        with self._lock:
+            if last_event_id is not None:
+                ids = [str(event["id"]) for event in self._history]
+                if str(last_event_id) in ids:
+                    for event in list(self._history)[ids.index(str(last_event_id)) + 1:]:
+                        if subscription.wants(event):
+                            subscription.offer(event)
+                else:
+                    subscription.overflowed = True
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event_type, owner_id, data, event_id=None):
+        with self._lock:
+            if event_id is None:
+                self._last_id += 1
+                event_id = self._last_id
+            event = {"id": event_id, "type": event_type, "owner_id": owner_id, "data": data}
+            self._history.append(event)
+            subscribers = [subscriber for subscriber in self._subscribers if subscriber.wants(event)]
+        for subscriber in subscribers:
+            subscriber.offer(event)
+        return event
+
+    def interrupt(self):
+        """Forget the history and tell every subscriber to resync, e.g. after events may have been lost."""
+        with self._lock:
+            self._history.clear()
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.overflowed = True
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+event_bus = EventBus()
@@ -0,0 +1,88 @@
+import decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+JSON_BACKENDS = ("auto", "orjson", "stdlib")
+
+
+def _is_numpy(value):
+    # Checked by module name so NumPy is never imported just to serialize.
+    return type(value).__module__ == "numpy" and hasattr(value, "tolist")
+
+
+def _default(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if _is_numpy(value):
+        return value.tolist()
+    return DefaultJSONProvider.default(value)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that uses orjson when it is installed.
+
+    Decimals are written as numbers and NumPy arrays and scalars as lists and
+    numbers on both backends. Dates keep Flask's HTTP-date format. Pretty
+    printed (debug) responses and custom ``dumps`` arguments use the stdlib.
+    """
+
+    default = staticmethod(_default)
+
+    def __init__(self, app, backend="auto"):
+        super().__init__(app)
+        if backend not in JSON_BACKENDS:
+            raise ValueError(f"Unsupported JSON backend: {backend}")
+        if backend == "orjson" and orjson is None:
+            raise RuntimeError("JSON_BACKEND=orjson but orjson is not installed")
+        self.use_orjson = orjson is not None and backend != "stdlib"
+
+    def _orjson_options(self):
+        options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_options()).decode("utf-8")
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        if not self.use_orjson or pretty:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._orjson_options() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def columnar(payload):
+    """Rewrite every list of same-keyed dicts in ``payload`` as ``{"columns", "data"}``.
+
+    ``[{"crop": "Rice", "total": 1}, {"crop": "Maize", "total": 2}]`` becomes
+    ``{"columns": ["crop", "total"], "data": {"crop": ["Rice", "Maize"], "total": [1, 2]}}``,
+    so key names are sent once per list instead of once per row. Nested lists
+    are rewritten too; anything else is returned as is.
+    """
+    if isinstance(payload, dict):
+        return {key: columnar(value) for key, value in payload.items()}
+    if not isinstance(payload, list):
+        return payload
+    items = [columnar(item) for item in payload]
+    if not items or not all(isinstance(item, dict) for item in items):
+        return items
+    columns = list(items[0])
+    if any(len(item) != len(columns) or any(column not in item for column in columns) for item in items):
+        return items
+    return {"columns": columns, "data": {column: [item[column] for item in items] for column in columns}}
@@ -0,0 +1,39 @@
+import threading
+
+
+def _metric_key(name, labels):
+    if not labels:
+        return name
+    label_text = ",".join(f"{key}={value}" for key, value in sorted(labels.items()))
+    return f"{name}{{{label_text}}}"
+
+
+class Metrics:
+    """Process-local counters and gauges exposed through the admin metrics endpoint."""
+
+    def __init__(self):
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name, value=1, **labels):
+        key = _metric_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        key = _metric_key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def snapshot(self):
+        with self._lock:
+            return {"counters": dict(self._counters), "gauges": dict(self._gauges)}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+
+
+metrics = Metrics()
@@ -0,0 +1,121 @@
+import math
+import struct
+from array import array
+
+
+_HEADER = struct.Struct("<BHQddB")
+_VERSION = 1
+
+
+class KLLSketch:
+    """Mergeable KLL quantile sketch over floats.
+
+    Level ``h`` holds items that each stand for ``2**h`` inputs. When a level
+    outgrows its capacity it is sorted and every other item is promoted, so
+    memory stays around ``3 * k`` items and rank error around ``1.7 / k``
+    regardless of how many values are added. Until the first compaction the
+    sketch is exact. Sketches built separately merge into one for the union.
+    """
+
+    def __init__(self, k=200):
+        self.k = k
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.levels = [[]]
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(int(math.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _retained(self):
+        return sum(len(items) for items in self.levels)
+
+    def _compress(self):
+        while self._retained() > sum(self._capacity(level) for level in range(len(self.levels))):
+            for level, items in enumerate(self.levels):
+                if len(items) >= self._capacity(level):
+                    if level + 1 == len(self.levels):
+                        self.levels.append([])
+                    items.sort()
+                    # Keep one item back on odd sizes so weights stay exact; the
+                    # promoted half alternates with the size of the level above.
+                    leftover = [items.pop()] if len(items) % 2 else []
+                    offset = len(self.levels[level + 1]) % 2
+                    self.levels[level + 1].extend(items[offset::2])
+                    self.levels[level] = leftover
+                    break
+
+    def update(self, value):
+        value = float(value)
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.levels[0].append(value)
+        if len(self.levels[0]) >= self._capacity(0):
+            self._compress()
+
+    def merge(self, other):
+        """Fold ``other`` into this sketch; the result summarizes both inputs."""
+        if not other.count:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantiles(self, fractions):
+        """Approximate values at each fraction in ``fractions`` (``None`` when empty)."""
+        if not self.count:
+            return [None for _fraction in fractions]
+        weighted = sorted(
+            (value, 1 << level) for level, items in enumerate(self.levels) for value in items
+        )
+        total = sum(weight for _value, weight in weighted)
+        results = []
+        for fraction in fractions:
+            if fraction <= 0:
+                results.append(self.min)
+                continue
+            if fraction >= 1:
+                results.append(self.max)
+                continue
+            target = fraction * total
+            cumulative = 0
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    results.append(value)
+                    break
+        return results
+
+    def to_bytes(self):
+        """Compact encoding: a fixed header, per-level sizes and float32 items."""
+        values = array("f", (value for items in self.levels for value in items))
+        sizes = array("I", (len(items) for items in self.levels))
+        header = _HEADER.pack(_VERSION, self.k, self.count, self.min, self.max, len(self.levels))
+        return header + sizes.tobytes() + values.tobytes()
+
+    @classmethod
+    def from_bytes(cls, payload):
+        version, k, count, minimum, maximum, depth = _HEADER.unpack_from(payload)
+        if version != _VERSION:
+            raise ValueError(f"Unsupported sketch version: {version}")
+        sketch = cls(k)
+        sketch.count, sketch.min, sketch.max = count, minimum, maximum
+        sizes = array("I")
+        offset = _HEADER.size + depth * sizes.itemsize
+        sizes.frombytes(payload[_HEADER.size:offset])
+        values = array("f")
+        values.frombytes(payload[offset:])
+        sketch.levels = []
+        start = 0
+        for size in sizes:
+            sketch.levels.append(list(values[start:start + size]))
+            start += size
+        return sketch
@@ -0,0 +1,44 @@
+from collections import namedtuple
+from functools import lru_cache
+
+
+class _RecordAccess:
+    """Mapping-style reads for tuple records: ``row["name"]``, ``row.get``, ``row.keys()``.
+
+    Templates (``row[col]``) and the CSV/Excel writers keep working unchanged,
+    while each row is one tuple instead of a per-row dict.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                key = self._positions[key]
+            except KeyError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        position = self._positions.get(key)
+        return default if position is None else tuple.__getitem__(self, position)
+
+    def keys(self):
+        return self._fields
+
+
+@lru_cache(maxsize=128)
+def record_type(name, fields):
+    """Compact tuple class (no per-row ``__dict__``) for the column names in ``fields``."""
+    base = namedtuple(name, fields)
+    return type(
+        name,
+        (_RecordAccess, base),
+        {"__slots__": (), "_positions": {field: index for index, field in enumerate(fields)}},
+    )
+
+
+def records_from_result(result, name="Record"):
+    """Materialize a result as a list of :func:`record_type` rows named after its columns."""
+    make = record_type(name, tuple(result.keys()))._make
+    return [make(row) for row in result]
@@ -1,8 +1,8 @@
 import secrets
 from functools import wraps
-from flask import session, request, abort, flash, redirect, url_for
+from flask import g, jsonify, session, request, abort, flash, redirect, url_for
 
-from services.auth_service import get_user_by_id
+from services.auth_service import get_user_by_id, load_api_token
 
 
 SAFE_METHODS = {"GET", "HEAD", "OPTIONS", "TRACE"}
@@ -52,6 +52,28 @@ def role_required(*allowed_roles):
     return decorator
 
 
+def api_token_required(*allowed_roles):
+    """Authenticate JSON API calls with an ``Authorization: Bearer <token>`` header."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(*args, **kwargs):
+            scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+            user_id = load_api_token(token.strip()) if scheme.lower() == "bearer" else None
+            user = get_user_by_id(user_id) if user_id is not None else None
+            if user is None:
+                response = jsonify({"error": "Invalid or missing API token."})
+                response.headers["WWW-Authenticate"] = "Bearer"
+                return response, 401
+            if allowed_roles and user["role"] not in allowed_roles:
+                return jsonify({"error": "You are not authorized to use this endpoint."}), 403
+            g.api_user = user
+            return view_func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
 def get_current_user():
     user_id = session.get("user_id")
     if not user_id:
@@ -0,0 +1,106 @@
+import functools
+import threading
+from contextlib import contextmanager
+
+from utils.metrics import metrics
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = tuple(_freeze(item) for item in value)
+        return tuple(sorted(items, key=repr)) if isinstance(value, (set, frozenset)) else items
+    return value
+
+
+_thread_state = threading.local()
+
+
+@contextmanager
+def no_waiting():
+    """Within this block the thread never waits on another caller's flight.
+
+    It runs the call itself instead. Pool threads use this: a leader may need a
+    free pool thread to finish, so a pool thread waiting on it could deadlock.
+    """
+    previous = getattr(_thread_state, "no_wait", False)
+    _thread_state.no_wait = True
+    try:
+        yield
+    finally:
+        _thread_state.no_wait = previous
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its outcome.
+
+    There is no caching: the key is dropped as soon as the call finishes, so
+    the next call runs again. Callers that arrive while it is in flight wait
+    and receive the same result object (or exception), which they must not
+    mutate.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        name = key[1] if isinstance(key, tuple) and len(key) > 1 else "call"
+        if not leader and getattr(_thread_state, "no_wait", False):
+            metrics.incr("single_flight", function=name, result="bypassed")
+            return function(*args, **kwargs)
+        if not leader:
+            metrics.incr("single_flight", function=name, result="shared")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.incr("single_flight", function=name, result="leader")
+        try:
+            call.result = function(*args, **kwargs)
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def call(self, function, *args, scope=None, **kwargs):
+        """Coalesce ``function(*args, **kwargs)`` with identical in-flight calls in ``scope``."""
+        key = (function.__module__, function.__qualname__, _freeze(args), _freeze(kwargs), scope)
+        return self.do(key, function, *args, **kwargs)
+
+
+single_flight = SingleFlight()
+
+
+def coalesced(scope=None):
+    """Decorator form of :meth:`SingleFlight.call`; ``scope`` is called per call to extend the key."""
+
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            return single_flight.call(function, *args, scope=scope() if scope else None, **kwargs)
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,85 @@
+"""Profile the ``create_app`` import tree with ``python -X importtime``."""
+import os
+import subprocess
+import sys
+
+from config import BASE_DIR
+
+
+STARTUP_SNIPPET = "from app import create_app; create_app()"
+STARTUP_IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "1500"))
+LAZY_MODULES = ("openpyxl", "bcrypt", "numpy")
+
+
+def _parse_importtime(stderr):
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        self_us, cumulative_us, raw_name = fields[0], fields[1], fields[2]
+        depth = (len(raw_name) - len(raw_name.lstrip(" "))) // 2
+        entries.append(
+            {
+                "module": raw_name.strip(),
+                "depth": depth,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+            }
+        )
+    return entries
+
+
+def profile_startup(snippet=STARTUP_SNIPPET):
+    """Run ``snippet`` in a fresh interpreter and return its import-time entries.
+
+    Entries are in completion order (children before parents), as printed by
+    ``-X importtime``. The subprocess also reports which modules were loaded.
+    """
+    code = f"{snippet}\nimport sys\nprint('\\n'.join(sorted(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        check=True,
+    )
+    return {
+        "imports": _parse_importtime(result.stderr),
+        "loaded_modules": set(result.stdout.split()),
+    }
+
+
+def total_import_ms(entries):
+    return sum(entry["cumulative_ms"] for entry in entries if entry["depth"] == 0)
+
+
+def format_report(entries, top=25, min_ms=1.0):
+    """Render the import tree (parents first) and the modules with the most self time."""
+    lines = [f"Total top-level import time: {total_import_ms(entries):.1f} ms", ""]
+
+    pending = []
+    for entry in entries:
+        children = [child for child in pending if child["depth"] > entry["depth"]]
+        pending = [child for child in pending if child["depth"] <= entry["depth"]]
+        pending.append({**entry, "children": children})
+
+    def render(nodes, indent):
+        for node in sorted(nodes, key=lambda item: -item["cumulative_ms"]):
+            if node["cumulative_ms"] < min_ms:
+                continue
+            lines.append(f"{'  ' * indent}{node['module']}: {node['cumulative_ms']:.1f} ms (self {node['self_ms']:.1f} ms)")
+            render(node["children"], indent + 1)
+
+    render(pending, 0)
+
+    slowest = sorted(entries, key=lambda item: -item["self_ms"])[:top]
+    lines.append("")
+    lines.append(f"Top {len(slowest)} modules by self time:")
+    lines.extend(f"  {entry['module']}: {entry['self_ms']:.1f} ms" for entry in slowest)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(format_report(profile_startup()["imports"]))